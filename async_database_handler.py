@@ -0,0 +1,824 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+import pymongo
+from pymongo.errors import BulkWriteError
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from database_handler import (
+    PetAdoptionDatabase, DEFAULT_BATCH_SIZE, READY_FOR_ADOPTION_QUERY, STATS_FIELDS, ROLLUP_FIELDS,
+    PREPARE_FOR_ADOPTION_PIPELINE, adoption_pipeline, pet_update, changed_filter, applied_update, stats_period,
+    stats_matches, location_filter, location_stats_pipeline, timeseries_pipeline, timeseries_columns, adoption_statuses,
+    pet_specs, record_inserts, adopted_rollup_docs, pet_of_the_day_query, pet_of_the_day_cache_id,
+    pet_of_the_day_candidates, daily_cache_update, remember_pet_of_the_day, view_projection
+)
+from query_cache import QueryCache, make_key, query_fields, projected_fields, fields_overlap
+from readiness import READY_FIELD, READINESS_FIELDS, repair_batch_filter, repair_update
+from id_allocator import reservation, reserved_ids
+import connection
+from rollups import ROLLUP_COLLECTION, ROLLUP_INDEXES, STALE_MARKER, backfill_pipelines, rebuild_collection_name, \
+    rollup_changes, rollup_pipeline, rollup_result, stale_marker_update
+from text_search import DescriptionIndex, INDEX_PROJECTION
+
+
+class AsyncPetAdoptionDatabase:
+    """
+    asyncio version of PetAdoptionDatabase, on pymongo's AsyncMongoClient.
+
+    Every method is a coroutine with the same semantics as its PetAdoptionDatabase counterpart, except that methods
+    returning a list of pets return an async iterator (`async for pet in db.find_pets_for_adoption(...)`).
+    Without a usable client, or when the server cannot be reached, they print a message and return the same
+    defaults (see connection.requires_async_connection).
+    The queries, pipelines, description index, query cache and rollups are shared with PetAdoptionDatabase,
+    so both handlers can work on the same database.
+    """
+
+    # Query builders and checks without I/O are the same as in the synchronous handler
+    return_period = staticmethod(PetAdoptionDatabase.return_period)
+    adoption_search_query = staticmethod(PetAdoptionDatabase.adoption_search_query)
+    description_search_terms = staticmethod(PetAdoptionDatabase.description_search_terms)
+    is_ready = staticmethod(PetAdoptionDatabase.is_ready)
+    _build_pet_document = staticmethod(PetAdoptionDatabase._build_pet_document)
+    _encode_page_token = staticmethod(PetAdoptionDatabase._encode_page_token)
+    _decode_page_token = staticmethod(PetAdoptionDatabase._decode_page_token)
+
+    def __init__(self, uri: str, db_name: str = "petsDB", collection_name: str = "petsInformation",
+                 id_block_size: int = 20, cache: Optional[QueryCache] = None, use_rollups: bool = True,
+                 **client_options):
+        # client_options: pool size, timeouts, compression, ... (see connection.client_options)
+        self.uri = uri
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.cache = cache
+        self.use_rollups = use_rollups
+        self.id_block_size = id_block_size
+
+        # ids are reserved from the counter in blocks of id_block_size (see IdBlockAllocator)
+        self._id_lock = asyncio.Lock()
+        self._next_id = 1
+        self._last_id = 0
+        self._pets_of_the_day = {}
+        self._largest_pet_id = None
+        self._description_index = None
+        self._rollups_stale = False
+
+        try:
+            # Client shared by all async handlers with the same settings in this event loop, see get_async_client
+            self.client = connection.get_async_client(self.uri, **client_options)
+            self.db = self.client[self.db_name]
+            self.collection = self.db[self.collection_name]
+            self.rollups = self.db[ROLLUP_COLLECTION]
+        except Exception as e:
+            print("Failed to configure the MongoDB client:", e)
+            self.client = None
+            self.db = None
+            self.collection = None
+            self.rollups = None
+
+    def is_connected(self) -> bool:
+        """
+        Returns True if the handler has a usable client. Does not contact the server, see `ping`.
+        """
+        return self.client is not None
+
+    async def ping(self) -> bool:
+        """
+        Checks the connection with a round trip to the server.
+        """
+        if not self.is_connected():
+            return False
+        try:
+            await self.client.admin.command('ping')
+            print("Connected to MongoDB!\n")
+            return True
+        except Exception as e:
+            print("Failed to connect to MongoDB:", e)
+            return False
+
+    async def close(self):
+        """
+        Closes the client, together with the other async handlers sharing it (see connection.get_async_client).
+        """
+        if self.client is not None:
+            await connection.close_async_clients(self.client)
+
+    async def _reserve_ids(self, n: int) -> range:
+        # Same counter and reservations as the IdBlockAllocator of PetAdoptionDatabase
+        counter = await self.db.counters.find_one_and_update(
+            *reservation("petID", n),
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return reserved_ids(counter, n)
+
+    async def _get_next_sequence(self) -> int:
+        async with self._id_lock:
+            if self._next_id > self._last_id:
+                block = await self._reserve_ids(self.id_block_size)
+                self._next_id, self._last_id = block.start, block.stop - 1
+            pet_id = self._next_id
+            self._next_id += 1
+            return pet_id
+
+    async def _cached(self, key: str, compute, filter_fields, output_fields=(), by_pet: bool = True,
+                      query: Optional[dict] = None):
+        # Read-through, see PetAdoptionDatabase._cached; `compute` is a coroutine function
+        if self.cache is None:
+            return await compute()
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        value = await compute()
+        pet_ids = [pet["_id"] for pet in value if "_id" in pet] if by_pet else None
+        self.cache.put(key, value, filter_fields, output_fields, pet_ids, query)
+        return value
+
+    async def _find(self, method: str, query: dict, projection: Optional[dict] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, sort: Optional[list] = None,
+                    limit: int = 0, raw: bool = False) -> AsyncIterator[dict]:
+        # Streams a find; results of `method` go through the query cache (if there is one) as a whole.
+        # raw: RawBSONDocument results, never cached
+        if self.cache is None or method is None or raw:
+            collection = self.collection
+            if raw:
+                collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+            cursor = collection.find(query, projection, batch_size=batch_size, sort=sort, limit=limit)
+            async with cursor:
+                async for pet in cursor:
+                    yield pet
+            return
+
+        async def compute():
+            return await self.collection.find(query, projection, sort=sort, limit=limit).to_list()
+
+        pets = await self._cached(make_key(method, query, projection, sort, limit), compute,
+                                  query_fields(query), projected_fields(projection), query=query)
+        for pet in pets:
+            yield pet
+
+    def _invalidate(self, fields: Optional[Iterable[str]] = None, pet_ids: Optional[Iterable] = None,
+                    inserted: Optional[Iterable[dict]] = None):
+        if self.cache is not None:
+            if fields is not None and fields_overlap(fields, READINESS_FIELDS):
+                fields = [*fields, READY_FIELD]
+            self.cache.invalidate(fields, pet_ids, inserted)
+
+    def _index_descriptions(self, pets: Iterable[dict]):
+        if self._description_index is None:
+            return
+        for pet in pets:
+            self._description_index.add(pet["_id"], pet.get("description"),
+                                        not pet.get("adoption", {}).get("adopted"))
+
+    async def _update_rollups(self, added: Iterable[dict] = (), removed: Iterable[dict] = ()) -> bool:
+        # See PetAdoptionDatabase._update_rollups, also for the consistency of the rollups with the pets
+        updates = rollup_changes(added, removed)
+        if not updates:
+            return True
+        try:
+            await self.rollups.bulk_write(updates, ordered=False)
+            return True
+        except Exception as e:
+            print(f"Error updating adoption rollups, they will be rebuilt: {e}")
+            try:
+                await self.rollups.update_one(STALE_MARKER, stale_marker_update(e), upsert=True)
+            except Exception:
+                self._rollups_stale = True
+            return False
+
+    async def _ensure_current_rollups(self):
+        # See PetAdoptionDatabase._ensure_current_rollups
+        if self._rollups_stale or await self.rollups.find_one(STALE_MARKER, {"_id": 1}) is not None:
+            print("Adoption rollups missed a change, rebuilding them.")
+            await self._backfill_rollups()
+            self._rollups_stale = False
+
+    async def _backfill_rollups(self) -> int:
+        # rollups.backfill_rollups on the async client
+        building = rebuild_collection_name(ROLLUP_COLLECTION)
+        await self.db.drop_collection(building)
+        await self.db.create_collection(building)
+        for pipeline in backfill_pipelines(building):
+            await (await self.collection.aggregate(pipeline)).to_list()
+        await self.db[building].create_indexes(ROLLUP_INDEXES)
+        await self.db[building].rename(ROLLUP_COLLECTION, dropTarget=True)
+        return await self.rollups.estimated_document_count()
+
+    def cache_stats(self) -> Optional[dict]:
+        return self.cache.stats() if self.cache is not None else None
+
+    # CRUD - Create
+    @connection.requires_async_connection()
+    async def create_pet(
+            self,
+            name: str = None,
+            type: str = "Dog",
+            age: int = 0,
+            breed_primary: str = None,
+            breed_secondary: str = None,
+            gender: str = "Unknown",
+            colors: list = None,
+            maturity_size: str = "Unknown",
+            fur_length: str = "Unknown",
+            vaccinated: str = "Unknown",
+            dewormed: str = "Unknown",
+            sterilized: str = "Unknown",
+            health: str = "Unknown",
+            quantity: int = 1,
+            fee: int = 0,
+            rescuer_id: str = "",
+            rescue_date: Optional[datetime] = None,
+            description: str = None,
+            location: str = "Unknown",
+            adopted: bool = False,
+            adoption_date: Optional[datetime] = None,
+            adoption_period: str = "null",
+            days_in_shelter: Optional[int] = None
+    ) -> Optional[dict]:
+        """
+        Creates a new pet, see PetAdoptionDatabase.create_pet.
+
+        Returns the inserted document or None on failure.
+        """
+        try:
+            pet_data = self._build_pet_document(
+                await self._get_next_sequence(), name=name, type=type, age=age, breed_primary=breed_primary,
+                breed_secondary=breed_secondary, gender=gender, colors=colors, maturity_size=maturity_size,
+                fur_length=fur_length, vaccinated=vaccinated, dewormed=dewormed, sterilized=sterilized,
+                health=health, quantity=quantity, fee=fee, rescuer_id=rescuer_id, rescue_date=rescue_date,
+                description=description, location=location, adopted=adopted, adoption_date=adoption_date,
+                adoption_period=adoption_period, days_in_shelter=days_in_shelter
+            )
+            result = await self.collection.insert_one(pet_data)
+            if not result.inserted_id:
+                print("Failed to insert document.")
+                return None
+
+            self._index_descriptions([pet_data])
+            self._invalidate(inserted=[pet_data])
+            await self._update_rollups([pet_data])
+            print(f"Document created (id: {pet_data['_id']}).")
+            return pet_data
+
+        except Exception as e:
+            print(f"Error creating pet: {e}")
+            return None
+
+    @connection.requires_async_connection(list)
+    async def create_pets(self, pets: Iterable, batch_size: int = 500) -> List[dict]:
+        """
+        Creates many pets at once, see PetAdoptionDatabase.create_pets. The insert_many batches run concurrently.
+        """
+        specs = pet_specs(pets)
+        results = [{"_id": None, "inserted": False, "error": None} for _ in specs]
+        if not specs:
+            return results
+
+        try:
+            ids = await self._reserve_ids(len(specs))
+        except Exception as e:
+            print(f"Error creating pets: {e}")
+            for result in results:
+                result["error"] = str(e)
+            return results
+
+        documents = []
+        for position, (spec, pet_id) in enumerate(zip(specs, ids)):
+            results[position]["_id"] = pet_id
+            try:
+                documents.append((position, self._build_pet_document(pet_id, **spec)))
+            except TypeError as e:
+                results[position]["error"] = str(e)
+
+        async def insert(batch):
+            failed = {}
+            try:
+                await self.collection.insert_many([doc for _, doc in batch], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+            except Exception as e:
+                failed = {index: str(e) for index in range(len(batch))}
+            record_inserts(results, batch, failed)
+
+        await asyncio.gather(*(insert(documents[start:start + batch_size])
+                               for start in range(0, len(documents), batch_size)))
+
+        created_docs = [doc for position, doc in documents if results[position]["inserted"]]
+        if created_docs:
+            self._index_descriptions(created_docs)
+            self._invalidate(inserted=created_docs)
+            await self._update_rollups(created_docs)
+        print(f"Created {len(created_docs)} of {len(results)} pet(s).")
+        return results
+
+    # CRUD - Read
+    @connection.requires_async_connection()
+    def read_pets(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE, sort: Optional[list] = None, view: Optional[str] = None,
+                  raw: bool = False) -> AsyncIterator[dict]:
+        """
+        Streams the pet documents matching the given query (all pets if omitted), `batch_size` per round trip.
+        `view` and `raw` as in PetAdoptionDatabase.iter_pets.
+        """
+        return self._find(None, query or {}, view_projection(view, projection), batch_size, sort, raw=raw)
+
+    iter_pets = read_pets
+
+    @connection.requires_async_connection()
+    async def raw_batches(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                          batch_size: int = DEFAULT_BATCH_SIZE, sort: Optional[list] = None,
+                          view: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Streams the matching pets as undecoded BSON batches, see PetAdoptionDatabase.raw_batches.
+        """
+        cursor = self.collection.find_raw_batches(query or {}, view_projection(view, projection),
+                                                  batch_size=batch_size, sort=sort)
+        async with cursor:
+            async for batch in cursor:
+                yield batch
+
+    @connection.requires_async_connection(lambda: ([], None))
+    async def page_pets(self, query: Optional[dict] = None, limit: int = 50, page_token: Optional[str] = None,
+                        projection: Optional[dict] = None,
+                        view: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Returns one page of pets ordered by _id and the token of the next page, see PetAdoptionDatabase.page_pets.
+        """
+        query = query or {}
+        if page_token is not None:
+            query = {"$and": [query, {"_id": {"$gt": self._decode_page_token(page_token)}}]}
+
+        cursor = self.collection.find(query, view_projection(view, projection)).sort("_id", pymongo.ASCENDING)
+        pets = await cursor.limit(limit).to_list()
+        next_token = self._encode_page_token(pets[-1]["_id"]) if len(pets) == limit else None
+        return pets, next_token
+
+    # CRUD - Update
+    @connection.requires_async_connection()
+    async def update_pet(self, query: dict, new_values: dict) -> Optional[dict]:
+        """
+        Updates a single pet matching the query; returns the updated document or None if nothing was updated.
+        """
+        if not new_values:
+            print("No document updated.")
+            return None
+
+        update = pet_update(new_values)
+        query = changed_filter(query, new_values)
+        if any(field.split(".")[0] in ROLLUP_FIELDS for field in new_values):
+            old_doc = await self.collection.find_one_and_update(query, update)
+            updated_doc = applied_update(old_doc, new_values) if old_doc else None
+            if updated_doc:
+                await self._update_rollups([updated_doc], removed=[old_doc])
+        else:
+            updated_doc = await self.collection.find_one_and_update(
+                query,
+                update,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+
+        if updated_doc:
+            self._index_descriptions([updated_doc])
+            self._invalidate(new_values, [updated_doc["_id"]])
+            print(f"Document updated (id: {updated_doc['_id']}).")
+            return updated_doc
+        print("No document updated.")
+        return None
+
+    # CRUD - Delete
+    @connection.requires_async_connection()
+    async def delete_pet(self, query: dict) -> Optional[dict]:
+        """
+        Deletes a single pet matching the query; returns the deleted document or None if no match was found.
+        """
+        deleted_doc = await self.collection.find_one_and_delete(query)
+        if deleted_doc:
+            if self._description_index is not None:
+                self._description_index.remove(deleted_doc["_id"])
+            self._invalidate(pet_ids=[deleted_doc["_id"]])
+            await self._update_rollups(removed=[deleted_doc])
+            print(f"Document deleted (id: {deleted_doc['_id']}).")
+            return deleted_doc
+        print("No matching document found to delete.")
+        return None
+
+    @connection.requires_async_connection()
+    def find_pets_for_adoption(self, pet_type: str = "any", max_age: int = -1, max_fee: int = -1,
+                               location: str = 'any', maturity_size: str = 'any', fur_length: str = 'any',
+                               projection: Optional[dict] = None,
+                               batch_size: int = DEFAULT_BATCH_SIZE, view: Optional[str] = None,
+                               raw: bool = False) -> AsyncIterator[dict]:
+        """
+        Streams the pets available for adoption, filtered like PetAdoptionDatabase.find_pets_for_adoption.
+        """
+        query = self.adoption_search_query(pet_type, max_age, max_fee, location, maturity_size, fur_length)
+        return self._find("find_pets_for_adoption", query, view_projection(view, projection), batch_size, raw=raw)
+
+    iter_pets_for_adoption = find_pets_for_adoption
+
+    @connection.requires_async_connection()
+    async def description_index(self, rebuild: bool = False) -> Optional[DescriptionIndex]:
+        """
+        Returns the full-text index of pet descriptions, see PetAdoptionDatabase.description_index.
+        """
+        return await self._refreshed_description_index(rebuild)
+
+    async def _refreshed_description_index(self, rebuild: bool = False) -> DescriptionIndex:
+        # See PetAdoptionDatabase._refreshed_description_index
+        if self._description_index is None or rebuild:
+            index = DescriptionIndex()
+            cursor = self.collection.find({}, INDEX_PROJECTION, batch_size=5000)
+            async with cursor:
+                async for pet in cursor:
+                    index.add_pets([pet])
+            self._description_index = index
+            print(f"Indexed descriptions of {len(index)} pets.")
+        else:
+            index = self._description_index
+            index.add_pets(await self.collection.find(index.refresh_filter(), INDEX_PROJECTION).to_list())
+        return self._description_index
+
+    async def _ranked_pets(self, ranked_ids: list, projection: Optional[dict] = None,
+                           batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[dict]:
+        # See PetAdoptionDatabase._ranked_pets
+        projection = dict(projection) if projection else None
+        hide_id = projection is not None and projection.pop("_id", 1) in (0, False)
+        for start in range(0, len(ranked_ids), batch_size):
+            ids = ranked_ids[start:start + batch_size]
+            found = {pet["_id"]: pet async for pet in self.collection.find(
+                {"_id": {"$in": ids}, "adoption.adopted": False}, projection or None)}
+            for pet_id in ids:
+                pet = found.get(pet_id)
+                if pet is None:
+                    if self._description_index is not None:
+                        self._description_index.set_available(pet_id, False)
+                    continue
+                if hide_id:
+                    del pet["_id"]
+                yield pet
+
+    @connection.requires_async_connection()
+    async def find_pets_by_description(self, keywords: list[str], projection: Optional[dict] = None,
+                                       limit: Optional[int] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                                       view: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Streams the pets available for adoption whose descriptions contain any of the keywords, best matches first
+        (see PetAdoptionDatabase.find_pets_by_description).
+        """
+        index = await self._refreshed_description_index()
+        ranked = index.search(self.description_search_terms(keywords), limit)
+        projection = view_projection(view, projection)
+        async for pet in self._ranked_pets([pet_id for pet_id, _ in ranked], projection, batch_size):
+            yield pet
+
+    iter_pets_by_description = find_pets_by_description
+
+    @connection.requires_async_connection()
+    async def search_pets(self, query: str, limit: int = 20, projection: Optional[dict] = None,
+                          view: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Full-text search with relevance in 'score', see PetAdoptionDatabase.search_pets.
+        """
+        index = await self._refreshed_description_index()
+        scores = dict(index.search(query, limit))
+        projection = view_projection(view, projection)
+        async for pet in self._ranked_pets(list(scores), projection, batch_size=len(scores) or 1):
+            if "_id" in pet:
+                pet["score"] = round(scores[pet["_id"]], 4)
+            yield pet
+
+    @connection.requires_async_connection()
+    def get_pets_by_age(self, order: str, n: int = 1, adopted: Optional[bool] = None,
+                        projection: Optional[dict] = None, view: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Streams the n youngest / oldest pets, see PetAdoptionDatabase.get_pets_by_age.
+        """
+        allowed_orders = ["youngest", "oldest"]
+        if order not in allowed_orders:
+            raise ValueError(f"The 'order' argument must be one of: {allowed_orders}")
+
+        query = {} if adopted is None else {"adoption.adopted": adopted}
+        return self._find(None, query, view_projection(view, projection),
+                          sort=[("age", 1 if order == "youngest" else -1)], limit=n)
+
+    @connection.requires_async_connection()
+    def get_pets_by_shelter_stay(self, stay_type: str, n: int = 1, threshold_months: Optional[int] = None,
+                                 comparison: Optional[str] = None, projection: Optional[dict] = None,
+                                 view: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Streams pets sorted by their stay in the shelter, see PetAdoptionDatabase.get_pets_by_shelter_stay.
+        """
+        allowed_stay_types = ["longest", "shortest"]
+        allowed_comparisons = ["longer", "shorter", None]
+
+        if stay_type not in allowed_stay_types:
+            raise ValueError(f"'stay_type' must be one of {allowed_stay_types}")
+        if comparison not in allowed_comparisons:
+            raise ValueError(f"'comparison' must be one of {allowed_comparisons}")
+
+        query = {"adoption.daysInShelter": {"$exists": True, "$ne": None}}
+        if comparison is not None and threshold_months is not None:
+            operator = "$gt" if comparison == "longer" else "$lt"
+            query["adoption.daysInShelter"][operator] = threshold_months * 30  # approx. days
+
+        sort_order = -1 if stay_type == "longest" else 1
+        return self._find(None, query, view_projection(view, projection),
+                          sort=[("adoption.daysInShelter", sort_order)], limit=n)
+
+    @connection.requires_async_connection()
+    def pets_ready_for_adoption(self, projection: Optional[dict] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                                view: Optional[str] = None, raw: bool = False) -> AsyncIterator[dict]:
+        """
+        Streams the pets ready for adoption, see PetAdoptionDatabase.pets_ready_for_adoption.
+        """
+        return self._find("pets_ready_for_adoption", READY_FOR_ADOPTION_QUERY, view_projection(view, projection),
+                          batch_size, raw=raw)
+
+    iter_pets_ready_for_adoption = pets_ready_for_adoption
+
+    @connection.requires_async_connection()
+    async def is_ready_for_adoption(self, pet_id: int) -> Optional[bool]:
+        """
+        Checks if the pet with the given ID is ready for adoption; None if not found or on error.
+        """
+        try:
+            ready_pet = await self.collection.find_one({**READY_FOR_ADOPTION_QUERY, "_id": pet_id}, {"_id": 1})
+            is_ready = ready_pet is not None
+            if not is_ready and await self.collection.find_one({"_id": pet_id}, {"_id": 1}) is None:
+                print(f"No pet found with id {pet_id}")
+                return None
+            return is_ready
+        except Exception as e:
+            print(f"Error checking adoption readiness: {e}")
+            return None
+
+    @connection.requires_async_connection()
+    async def prepare_pet_for_adoption(self, pet_id: int) -> Optional[dict]:
+        """
+        Prepares a pet for adoption in a single atomic update, see PetAdoptionDatabase.prepare_pet_for_adoption.
+        """
+        try:
+            updated_pet = await self.collection.find_one_and_update(
+                {"_id": pet_id},
+                PREPARE_FOR_ADOPTION_PIPELINE,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            if updated_pet is None:
+                print(f"No pet found with id {pet_id}")
+                return None
+
+            self._invalidate(["medical"], [pet_id])
+            return updated_pet
+        except Exception as e:
+            print(f"Error preparing pet for adoption: {e}")
+            return None
+
+    @connection.requires_async_connection(dict)
+    async def adopt_pet(self, pet_id: int) -> dict:
+        """
+        Adopts a pet that is not adopted yet, see PetAdoptionDatabase.adopt_pet. Returns {} on failure.
+        """
+        try:
+            adopted_pet = await self.collection.find_one_and_update(
+                {"_id": pet_id, "adoption.adopted": False},
+                adoption_pipeline(datetime.today()),
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+
+            if adopted_pet is None:
+                if await self.collection.find_one({"_id": pet_id}, {"_id": 1}) is None:
+                    print(f"No pet found with id {pet_id}")
+                else:
+                    print(f"Pet with id {pet_id} is already adopted.")
+                return {}
+
+            if self._description_index is not None:
+                self._description_index.set_available(pet_id, False)
+            self._invalidate(["adoption"], [pet_id])
+            await self._update_rollups([adopted_pet], removed=[{**adopted_pet, "adoption": {"adopted": False}}])
+            return adopted_pet
+
+        except Exception as e:
+            print(f"Error during adoption process: {e}")
+            return {}
+
+    async def _adoption_states(self, pet_ids: list, projection: dict = None) -> dict:
+        projection = {"adoption.adopted": 1, **(projection or {})}
+        return {pet["_id"]: pet async for pet in self.collection.find({"_id": {"$in": pet_ids}}, projection)}
+
+    @connection.requires_async_connection(dict)
+    async def adopt_pets(self, pet_ids: Iterable[int]) -> dict:
+        """
+        Adopts many pets at once, see PetAdoptionDatabase.adopt_pets.
+        """
+        pet_ids = list(dict.fromkeys(pet_ids))
+        pets = await self._adoption_states(pet_ids, {"location": 1})
+        results = adoption_statuses(pet_ids, pets, "adopted")
+
+        eligible = [pet_id for pet_id, status in results.items() if status == "adopted"]
+        if eligible:
+            now = datetime.today()
+            now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            update = await self.collection.update_many(
+                {"_id": {"$in": eligible}, "adoption.adopted": False},
+                adoption_pipeline(now)
+            )
+            if update.modified_count < len(eligible):
+                ours = {pet["_id"] async for pet in self.collection.find(
+                    {"_id": {"$in": eligible}, "adoption.adoptionDate": now}, {"_id": 1})}
+                for pet_id in eligible:
+                    if pet_id not in ours:
+                        results[pet_id] = "already_adopted"
+
+        if self._description_index is not None:
+            for pet_id, status in results.items():
+                if status != "missing":
+                    self._description_index.set_available(pet_id, False)
+
+        adopted = [pet_id for pet_id, status in results.items() if status == "adopted"]
+        if adopted:
+            self._invalidate(["adoption"], adopted)
+            await self._update_rollups(adopted_rollup_docs(pets, adopted, now))
+        print(f"Adopted {len(adopted)} of {len(results)} pet(s).")
+        return results
+
+    @connection.requires_async_connection(dict)
+    async def prepare_pets_for_adoption(self, pet_ids: Iterable[int]) -> dict:
+        """
+        Prepares many pets for adoption at once, see PetAdoptionDatabase.prepare_pets_for_adoption.
+        """
+        pet_ids = list(dict.fromkeys(pet_ids))
+        results = adoption_statuses(pet_ids, await self._adoption_states(pet_ids), "prepared")
+
+        eligible = [pet_id for pet_id, status in results.items() if status == "prepared"]
+        if eligible:
+            result = await self.collection.update_many(
+                {"_id": {"$in": eligible}, "adoption.adopted": False},
+                PREPARE_FOR_ADOPTION_PIPELINE
+            )
+            self._invalidate(["medical"], eligible)
+            if result.matched_count < len(eligible):
+                results.update(adoption_statuses(eligible, await self._adoption_states(eligible), "prepared"))
+
+        prepared = sum(status == "prepared" for status in results.values())
+        print(f"Prepared {prepared} of {len(results)} pet(s) for adoption.")
+        return results
+
+    @connection.requires_async_connection(dict)
+    async def readiness_of(self, pet_ids: Iterable[int]) -> dict:
+        """
+        Checks many pets at once, see PetAdoptionDatabase.readiness_of.
+        """
+        pet_ids = list(dict.fromkeys(pet_ids))
+        cursor = self.collection.find({**READY_FOR_ADOPTION_QUERY, "_id": {"$in": pet_ids}}, {"_id": 1})
+        ready_ids = {pet["_id"] async for pet in cursor}
+        pets = await self._adoption_states([pet_id for pet_id in pet_ids if pet_id not in ready_ids])
+        results = adoption_statuses(pet_ids, pets, "not_ready")
+        for pet_id in ready_ids:
+            results[pet_id] = "ready"
+        return results
+
+    @connection.requires_async_connection()
+    async def get_pet_of_the_day(self, unadopted_only: bool = False, shared_cache: bool = False) -> Optional[dict]:
+        """
+        Returns the "Pet of the Day", see PetAdoptionDatabase.get_pet_of_the_day.
+        """
+        today = datetime.now().date().isoformat()
+        key = (today, unadopted_only)
+        pet_of_the_day = self._pets_of_the_day.get(key)
+        if pet_of_the_day is None:
+            pet_of_the_day = await self._choose_pet_of_the_day(today, unadopted_only, shared_cache)
+            if pet_of_the_day is not None:
+                self._pets_of_the_day = remember_pet_of_the_day(self._pets_of_the_day, key, pet_of_the_day)
+        return pet_of_the_day
+
+    async def _choose_pet_of_the_day(self, today: str, unadopted_only: bool, shared_cache: bool) -> Optional[dict]:
+        cache_id = pet_of_the_day_cache_id(today, unadopted_only)
+
+        if shared_cache:
+            cached = await self.db.dailyCache.find_one({"_id": cache_id})
+            if cached:
+                pet = await self.collection.find_one({**pet_of_the_day_query(unadopted_only), "_id": cached["petId"]})
+                if pet is not None:
+                    return pet
+
+        if self._largest_pet_id is None or self._largest_pet_id[0] != today:
+            last_pet = await self.collection.find_one({}, {"_id": 1}, sort=[("_id", pymongo.DESCENDING)])
+            if last_pet is None:
+                print("No pets available.")
+                return None
+            self._largest_pet_id = (today, last_pet["_id"])
+
+        pet = None
+        for query in pet_of_the_day_candidates(today, unadopted_only, self._largest_pet_id[1]):
+            pet = await self.collection.find_one(query, sort=[("_id", pymongo.ASCENDING)])
+            if pet is not None:
+                break
+        if pet is None:
+            print("No pets available.")
+            return None
+
+        if shared_cache:
+            cached = await self.db.dailyCache.find_one_and_update(
+                {"_id": cache_id},
+                daily_cache_update(today, pet["_id"]),
+                upsert=True,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            if cached["petId"] != pet["_id"]:
+                pet = await self.collection.find_one({"_id": cached["petId"]}) or pet
+
+        return pet
+
+    @connection.requires_async_connection()
+    async def adoption_rescue_stats(self, adopted: bool = True, rescued: bool = False, city='all', month: int = 0,
+                                    year: int = 0, mode: str = "groupby", limit: int = 0,
+                                    order: int = -1) -> Optional[dict]:
+        """
+        Returns statistics about adopted and/or rescued pets, see PetAdoptionDatabase.adoption_rescue_stats.
+        The adopted and rescued counts are queried concurrently.
+        """
+        period = stats_period(month, year)
+        if period is None:
+            print("When month specified, year should be also specified!")
+            return None
+        start, end = period
+        city_filter = location_filter(city)
+        matches = stats_matches(adopted, rescued, city_filter, start, end)
+
+        async def count(field: str, match: dict):
+            if self.use_rollups:
+                cities = None if not city_filter else [city] if isinstance(city, str) else list(city)
+                cursor = await self.rollups.aggregate(rollup_pipeline(field, start, end, cities, mode, limit, order))
+                return rollup_result(await cursor.to_list(), mode)
+            if mode == "sum":
+                return await self.collection.count_documents(match)
+            cursor = await self.collection.aggregate(location_stats_pipeline(match, order, limit))
+            return {doc["_id"]: doc["count"] async for doc in cursor}
+
+        async def compute():
+            if self.use_rollups:
+                await self._ensure_current_rollups()
+            counts = await asyncio.gather(*(count(field, match) for field, match in matches.items()))
+            return dict(zip(matches, counts))
+
+        cities = sorted(city) if isinstance(city, list) else city_filter
+        key = make_key("adoption_rescue_stats", adopted, rescued, cities, start, end, mode, limit, order)
+        return await self._cached(key, compute, STATS_FIELDS, by_pet=False, query={"$or": list(matches.values())})
+
+    @connection.requires_async_connection()
+    async def adoption_rescue_timeseries(self, start: datetime, end: datetime, granularity: str = "month",
+                                         city='all') -> Optional[dict]:
+        """
+        Adoption and rescue statistics per period and location in one aggregation,
+        see PetAdoptionDatabase.adoption_rescue_timeseries.
+        """
+        allowed_granularities = ["day", "week", "month"]
+        if granularity not in allowed_granularities:
+            raise ValueError(f"'granularity' must be one of {allowed_granularities}")
+
+        city_filter = location_filter(city)
+        pipeline = timeseries_pipeline(start, end, granularity, city_filter)
+
+        async def compute():
+            cursor = await self.collection.aggregate(pipeline)
+            return timeseries_columns(await cursor.next())
+
+        cities = sorted(city) if isinstance(city, list) else city_filter
+        key = make_key("adoption_rescue_timeseries", start, end, granularity, cities)
+        return await self._cached(key, compute, STATS_FIELDS + ["adoption"], by_pet=False,
+                                  query=pipeline[0]["$match"])
+
+    @connection.requires_async_connection()
+    async def rebuild_rollups(self) -> Optional[int]:
+        """
+        Rebuilds the daily adoption / rescue rollups from the pets collection, see rollups.backfill_rollups.
+        """
+        count = await self._backfill_rollups()
+        self._invalidate(ROLLUP_FIELDS)
+        print(f"Rebuilt {count} adoption rollup(s).")
+        return count
+
+    @connection.requires_async_connection()
+    async def repair_readiness(self, batch_size: int = 1000) -> Optional[int]:
+        """
+        Recomputes the 'readyForAdoption' flag of all pets in batches, see readiness.repair_readiness.
+        """
+        fixed = 0
+        last_id = None
+        while True:
+            cursor = self.collection.find(repair_batch_filter(last_id), {"_id": 1}).sort("_id", 1).limit(batch_size)
+            ids = [pet["_id"] async for pet in cursor]
+            if not ids:
+                break
+            result = await self.collection.update_many(*repair_update(ids))
+            fixed += result.modified_count
+            last_id = ids[-1]
+
+        if fixed:
+            self._invalidate([READY_FIELD])
+        print(f"Fixed the readiness of {fixed} pet(s).")
+        return fixed
+
@@ -0,0 +1,89 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# Column layout of pets.csv
+COLUMNS = ["Type", "Name", "Age", "Breed1", "Breed2", "Gender", "Color1", "Color2", "Color3", "MaturitySize",
+           "FurLength", "Vaccinated", "Dewormed", "Sterilized", "Health", "Quantity", "Fee", "City", "RescuerID",
+           "RescueDate", "Description", "AdoptionSpeed"]
+
+TYPES = ["Dog", "Cat"]
+NAMES = ["Luna", "Burek", "Max", "Mila", "Reksio", "Kitty", "Bella", "Filemon", "Tola", "Azor", None]
+BREEDS = ["Mixed Breed", "Domestic Short Hair", "Labrador Retriever", "German Shepherd Dog", "Persian", "Beagle",
+          "Siamese", "Poodle", "Terrier", None]
+GENDERS = ["Male", "Female", "Mixed"]
+COLORS = ["Black", "Brown", "Golden", "Yellow", "Cream", "Gray", "White", None]
+SIZES = ["Small", "Medium", "Large", "Extra Large", "Unknown"]
+FUR = ["Short", "Medium", "Long", "Unknown"]
+ANSWERS = ["Yes", "No", "Not sure"]
+HEALTH = ["Healthy", "Minor Injury", "Serious Injury"]
+CITIES = ["Gdańsk", "Gdynia", "Sopot", "Lębork", "Warszawa", "Kraków", "Łódź", "Wrocław", "Poznań", "Szczecin"]
+DESCRIPTIONS = [
+    "Przyjazna i energiczna suczka, idealna dla rodziny z dziećmi.",
+    "Spokojny kocur, lubi wylegiwać się na słońcu.",
+    "Very friendly and playful, gets along with children and other dogs.",
+    "Shy at first but loving once she trusts you. Needs a quiet home.",
+    "Znaleziony przy drodze, po leczeniu czuje się świetnie.",
+    None,
+]
+ADOPTION_SPEEDS = ["Same Day", "1-7 Days", "8-30 Days", "31-90 Days", "Over 90 Days"]
+ADOPTION_SPEED_WEIGHTS = [0.03, 0.2, 0.27, 0.22, 0.28]
+
+
+def generate_frame(rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Returns `rows` synthetic pets with the same columns and value domains as pets.csv.
+    """
+    def pick(values, p=None):
+        return rng.choice(np.array(values, dtype=object), size=rows, p=p)
+
+    rescue_dates = (pd.Timestamp("2019-01-01")
+                    + pd.to_timedelta(rng.integers(0, 6 * 365, rows), unit="D")
+                    + pd.to_timedelta(rng.integers(0, 24 * 3600, rows), unit="s"))
+
+    return pd.DataFrame({
+        "Type": pick(TYPES),
+        "Name": pick(NAMES),
+        "Age": rng.integers(0, 120, rows),
+        "Breed1": pick(BREEDS),
+        "Breed2": pick(BREEDS),
+        "Gender": pick(GENDERS),
+        "Color1": pick(COLORS[:-1]),
+        "Color2": pick(COLORS),
+        "Color3": pick(COLORS),
+        "MaturitySize": pick(SIZES),
+        "FurLength": pick(FUR),
+        "Vaccinated": pick(ANSWERS),
+        "Dewormed": pick(ANSWERS),
+        "Sterilized": pick(ANSWERS),
+        "Health": pick(HEALTH),
+        "Quantity": rng.integers(1, 5, rows),
+        "Fee": rng.integers(0, 40, rows) * 10,
+        "City": pick(CITIES),
+        "RescuerID": [format(value, "016x") for value in rng.integers(0, 2 ** 62, rows)],
+        "RescueDate": rescue_dates.strftime("%Y-%m-%d %H:%M:%S"),
+        "Description": pick(DESCRIPTIONS),
+        "AdoptionSpeed": pick(ADOPTION_SPEEDS, ADOPTION_SPEED_WEIGHTS),
+    }, columns=COLUMNS)
+
+
+def generate_csv(path: str, rows: int, seed: int = 0, chunk_size: int = 500_000):
+    """
+    Writes a synthetic pets.csv with `rows` rows, generated in chunks so that large files fit in memory.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_size):
+        generate_frame(min(chunk_size, rows - start), rng).to_csv(path, mode="w" if start == 0 else "a",
+                                                                  header=start == 0, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic pets.csv")
+    parser.add_argument("rows", type=int, help="number of rows, e.g. 10000 or 10000000")
+    parser.add_argument("--output", default="pets_synthetic.csv")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_csv(args.output, args.rows, args.seed)
+    print(f"✅ Wrote {args.rows} rows to '{args.output}'.")
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+
+from create_database import create_database, return_schema
+from database_handler import PetAdoptionDatabase
+from query_cache import QueryCache
+from benchmarks.generate_pets import generate_csv
+from benchmarks.ingest import current_commit
+
+DATABASE_NAME = "petsBenchmark"
+COLLECTION_NAME = "petsInformation"
+
+NEW_PET = {
+    "name": "Luna", "type": "Dog", "age": 4, "breed_primary": "Labrador Retriever", "gender": "Female",
+    "colors": ["Black", "White"], "maturity_size": "Medium", "fur_length": "Short", "vaccinated": "Yes",
+    "dewormed": "Yes", "sterilized": "Yes", "health": "Healthy", "fee": 0, "location": "Lębork",
+    "rescuer_id": "rescuer123", "description": "Przyjazna i energiczna suczka, idealna dla rodziny z dziećmi.",
+}
+
+
+class BenchmarkState:
+    """
+    Data shared by the measured calls of one scale: random existing ids, pets created by the benchmark
+    (deleted later by delete_pet) and not adopted pets (adopted by adopt_pet / adopt_pets).
+    """
+
+    def __init__(self, db: PetAdoptionDatabase, rows: int, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.rows = rows
+        self.created = []
+        self.unadopted = [pet["_id"] for pet in db.collection.find({"adoption.adopted": False}, {"_id": 1})]
+        self.rng.shuffle(self.unadopted)
+
+    def pet_id(self) -> int:
+        return int(self.rng.integers(1, self.rows + 1))
+
+    def pet_ids(self, n: int) -> list:
+        return [self.pet_id() for _ in range(n)]
+
+    def take_unadopted(self, n: int = 1) -> list:
+        taken, self.unadopted = self.unadopted[:n], self.unadopted[n:]
+        return taken or [self.pet_id()]
+
+    def take_created(self) -> int:
+        return self.created.pop() if self.created else self.pet_id()
+
+
+def _create_pet(db, state):
+    pet = db.create_pet(**NEW_PET)
+    if pet:
+        state.created.append(pet["_id"])
+
+
+def _create_pets(db, state):
+    results = db.create_pets([NEW_PET] * 100)
+    state.created.extend(result["_id"] for result in results if result["inserted"])
+
+
+# Measured calls, in the order of main.py: method name -> call(db, state)
+OPERATIONS = {
+    "create_pet": _create_pet,
+    "create_pets": _create_pets,
+    "read_pets": lambda db, state: db.read_pets({"_id": state.pet_id()}),
+    "iter_pets": lambda db, state: sum(1 for _ in db.iter_pets({"type": "Dog", "age": {"$lte": 12}}, view="card")),
+    "page_pets": lambda db, state: db.page_pets({"type": "Cat"}, limit=50),
+    "update_pet": lambda db, state: db.update_pet({"_id": state.pet_id()},
+                                                  {"fee": int(state.rng.integers(0, 40)) * 10}),
+    "delete_pet": lambda db, state: db.delete_pet({"_id": state.take_created()}),
+    "find_pets_for_adoption": lambda db, state: db.find_pets_for_adoption(
+        pet_type="Dog", max_age=24, max_fee=50, location="Lębork", maturity_size="Medium", fur_length="Long",
+        view="card"),
+    "find_pets_by_description": lambda db, state: db.find_pets_by_description(["child", "children"], limit=100),
+    "search_pets": lambda db, state: db.search_pets('"good with children" playful', limit=20),
+    "get_pets_by_age": lambda db, state: db.get_pets_by_age(order="oldest", n=5, adopted=False),
+    "get_pets_by_shelter_stay": lambda db, state: db.get_pets_by_shelter_stay(
+        stay_type="longest", n=2, threshold_months=5, comparison="longer"),
+    "pets_ready_for_adoption": lambda db, state: db.pets_ready_for_adoption(view="card"),
+    "is_ready_for_adoption": lambda db, state: db.is_ready_for_adoption(state.pet_id()),
+    "readiness_of": lambda db, state: db.readiness_of(state.pet_ids(50)),
+    "prepare_pet_for_adoption": lambda db, state: db.prepare_pet_for_adoption(state.pet_id()),
+    "prepare_pets_for_adoption": lambda db, state: db.prepare_pets_for_adoption(state.pet_ids(20)),
+    "adopt_pet": lambda db, state: db.adopt_pet(state.take_unadopted()[0]),
+    "adopt_pets": lambda db, state: db.adopt_pets(state.take_unadopted(20)),
+    "get_pet_of_the_day": lambda db, state: db.get_pet_of_the_day(),
+    "adoption_rescue_stats": lambda db, state: db.adoption_rescue_stats(
+        month=5, year=2024, adopted=True, rescued=True, limit=5),
+}
+
+
+def seed_database(rows: int, database_uri: str, directory: str, seed: int = 0):
+    """
+    Loads `rows` synthetic pets into the benchmark database (replacing its previous content).
+    """
+    csv_path = generate_csv(os.path.join(directory, f"pets_{rows}.csv"), rows, seed)
+    report = create_database(csv_path=csv_path, database_uri=database_uri, database_name=DATABASE_NAME,
+                             collection_name=COLLECTION_NAME, schema=return_schema(), chunk_size=50_000, seed=seed,
+                             report_path=os.path.join(directory, "rejected_rows.csv"))
+    if report is None:
+        raise SystemExit(f"Load of {rows} rows failed.")
+
+
+def latency_summary(seconds: list) -> dict:
+    milliseconds = np.array(seconds) * 1000
+    return {
+        "n": len(seconds),
+        "mean_ms": round(float(milliseconds.mean()), 3),
+        "p50_ms": round(float(np.percentile(milliseconds, 50)), 3),
+        "p95_ms": round(float(np.percentile(milliseconds, 95)), 3),
+        "p99_ms": round(float(np.percentile(milliseconds, 99)), 3),
+    }
+
+
+def _timed(call, db, state) -> float:
+    start = perf_counter()
+    call(db, state)
+    return perf_counter() - start
+
+
+def measure_operation(name: str, database_uri: str, state: BenchmarkState, cold_runs: int, warm_runs: int,
+                      allocation_runs: int, cache: bool = False) -> dict:
+    """
+    Measures one method:
+    - cold: the first call on a new handler (empty description index, query cache, id block and pet of the day;
+      the connection pool is shared, see connection.get_client), `cold_runs` handlers,
+    - warm: `warm_runs` calls on one handler after a warm-up call,
+    - allocations: Python memory allocated by a warm call (tracemalloc), median of `allocation_runs` calls.
+    """
+    call = OPERATIONS[name]
+
+    def handler():
+        return PetAdoptionDatabase(database_uri, DATABASE_NAME, COLLECTION_NAME,
+                                   cache=QueryCache() if cache else None)
+
+    cold = [_timed(call, handler(), state) for _ in range(cold_runs)]
+
+    db = handler()
+    call(db, state)
+    warm = [_timed(call, db, state) for _ in range(warm_runs)]
+
+    peaks, retained = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(allocation_runs):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            call(db, state)
+            current, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            retained.append(current - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "cold": latency_summary(cold),
+        "warm": latency_summary(warm),
+        "allocations": {
+            "peak_kb": round(float(np.median(peaks)) / 1024, 1),
+            "retained_kb": round(float(np.median(retained)) / 1024, 1),
+        },
+    }
+
+
+def run_benchmark(sizes, operations, database_uri, cold_runs=5, warm_runs=50, allocation_runs=5, cache=False,
+                  seed=0):
+    """
+    Seeds the benchmark database with every size and measures every operation on it.
+    The output of the methods is discarded while they are measured.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            print(f"\n===== {rows} rows =====")
+            seed_database(rows, database_uri, directory, seed)
+            state = BenchmarkState(PetAdoptionDatabase(database_uri, DATABASE_NAME, COLLECTION_NAME), rows, seed)
+            for name in operations:
+                with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                    measured = measure_operation(name, database_uri, state, cold_runs, warm_runs, allocation_runs,
+                                                 cache)
+                results.append({"rows": rows, "method": name, **measured})
+                print(f"{name:<28} cold p50 {measured['cold']['p50_ms']:>9.2f} ms   "
+                      f"warm p50 {measured['warm']['p50_ms']:>9.2f} ms  p95 {measured['warm']['p95_ms']:>9.2f} ms  "
+                      f"p99 {measured['warm']['p99_ms']:>9.2f} ms   peak {measured['allocations']['peak_kb']:>9.1f} kB")
+    return results
+
+
+def compare(results, baseline, threshold=0.2, min_ms=0.5):
+    """
+    Compares the results with the baseline run: cold / warm p50 and p95 and the allocation peak of every
+    size and method. A value counts as a regression when it is more than `threshold` (relative) above the
+    baseline, and for latencies also more than `min_ms` above it (noise of sub-millisecond calls).
+
+    Returns:
+        list: Descriptions of the regressions.
+    """
+    previous = {(result["rows"], result["method"]): result for result in baseline["results"]}
+    print(f"\nComparison with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    regressions = []
+    for result in results:
+        old = previous.get((result["rows"], result["method"]))
+        if old is None:
+            continue
+        checks = [(f"{kind} {percentile}", old[kind][f"{percentile}_ms"], result[kind][f"{percentile}_ms"], min_ms)
+                  for kind in ("cold", "warm") for percentile in ("p50", "p95")]
+        checks.append(("peak kB", old["allocations"]["peak_kb"], result["allocations"]["peak_kb"], 0))
+        for label, old_value, new_value, noise in checks:
+            regressed = new_value > old_value * (1 + threshold) and new_value - old_value > noise
+            if regressed:
+                regressions.append(f"{result['rows']} rows, {result['method']}, {label}: {old_value} -> {new_value}")
+            ratio = f"{new_value / old_value:.2f}x" if old_value else "-"
+            print(f"{'❌' if regressed else '  '} {result['rows']:>10} {result['method']:<28} {label:<9} "
+                  f"{old_value:>10} -> {new_value:>10} ({ratio})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the PetAdoptionDatabase methods on synthetic data sets")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--methods", nargs="+", choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--cold-runs", type=int, default=5)
+    parser.add_argument("--warm-runs", type=int, default=50)
+    parser.add_argument("--allocation-runs", type=int, default=5)
+    parser.add_argument("--cache", action="store_true", help="measure handlers with a QueryCache")
+    parser.add_argument("--output", default="handler_benchmark.json")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown, e.g. 0.2 = 20%%")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.methods, args.uri, args.cold_runs, args.warm_runs,
+                            args.allocation_runs, args.cache)
+    with open(args.output, "w") as f:
+        json.dump({"commit": current_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+                   "cache": args.cache, "results": results}, f, indent=2)
+    print(f"\n✅ Results written to '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) above {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            raise SystemExit(1)
+        print("\n✅ No regressions.")
@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+from datetime import datetime
+
+from create_database import create_database, return_schema
+from benchmarks.generate_pets import generate_csv
+
+# Loader configurations measured for every size (keyword arguments of create_database)
+MODES = {
+    "default": {},
+    "stream": {"chunk_size": 50_000},
+    "bulk": {"chunk_size": 50_000, "bulk_load": True},
+    "parallel": {"chunk_size": 50_000, "workers": os.cpu_count() or 2},
+}
+
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes, modes, database_uri, database_name="petsBenchmark", seed=0):
+    """
+    Loads a synthetic CSV of every size with every mode and returns the per-stage results of each load.
+    peak_rss_mb is the peak of the whole benchmark process so far - run one size per process for exact values.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            csv_path = generate_csv(os.path.join(directory, f"pets_{rows}.csv"), rows, seed)
+            for mode in modes:
+                print(f"\n===== {rows} rows, mode '{mode}' =====")
+                report = create_database(
+                    csv_path=csv_path,
+                    database_uri=database_uri,
+                    database_name=database_name,
+                    collection_name="petsInformation",
+                    schema=return_schema(),
+                    seed=seed,
+                    report_path=os.path.join(directory, "rejected_rows.csv"),
+                    **MODES[mode]
+                )
+                if report is None:
+                    raise SystemExit(f"Load of {rows} rows in mode '{mode}' failed.")
+                report["rows_per_second"] = round(rows / report["total_seconds"], 1)
+                results.append({"rows": rows, "mode": mode, **report})
+    return results
+
+
+def compare(results, baseline):
+    """
+    Prints the time of every stage relative to the same size / mode / stage in the baseline results.
+    """
+    previous = {(result["rows"], result["mode"]): result for result in baseline["results"]}
+    print(f"\nComparison with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for result in results:
+        old = previous.get((result["rows"], result["mode"]))
+        if old is None:
+            continue
+        print(f"{result['rows']:>10} {result['mode']:<10} total  "
+              f"{old['total_seconds']:>9.2f}s -> {result['total_seconds']:>9.2f}s "
+              f"({result['total_seconds'] / old['total_seconds']:.2f}x)")
+        for stage, values in result["stages"].items():
+            old_stage = old["stages"].get(stage)
+            if old_stage and old_stage["seconds"] > 0:
+                print(f"{'':>21} {stage:<6} {old_stage['seconds']:>9.2f}s -> {values['seconds']:>9.2f}s "
+                      f"({values['seconds'] / old_stage['seconds']:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark create_database on synthetic data sets")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--output", default="ingest_benchmark.json")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.modes, args.uri)
+    with open(args.output, "w") as f:
+        json.dump({"commit": current_commit(), "timestamp": datetime.now().isoformat(timespec="seconds"),
+                   "results": results}, f, indent=2)
+    print(f"\n✅ Results written to '{args.output}'.")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,190 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+from pymongo import AsyncMongoClient, MongoClient
+from pymongo.errors import ConnectionFailure
+from pymongo.server_api import ServerApi
+
+# Client settings used unless given otherwise (see get_client)
+DEFAULT_CLIENT_OPTIONS = {
+    "maxPoolSize": 100,
+    "minPoolSize": 0,
+    "connectTimeoutMS": 5000,
+    "serverSelectionTimeoutMS": 10000,
+}
+
+_clients = {}
+_async_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client_options(max_pool_size: int = None, min_pool_size: int = None, max_idle_time_ms: int = None,
+                   connect_timeout_ms: int = None, server_selection_timeout_ms: int = None,
+                   socket_timeout_ms: int = None, timeout_ms: int = None, compressors: str = None,
+                   **other_options) -> dict:
+    """
+    Returns MongoClient options from Python-style arguments; options left as None get the defaults.
+
+    Args:
+        max_pool_size / min_pool_size (int): Limits of the connection pool per server.
+        max_idle_time_ms (int): Idle connections are closed after this time.
+        connect_timeout_ms / server_selection_timeout_ms / socket_timeout_ms (int): Timeouts of connecting,
+            finding a suitable server and waiting for a reply.
+        timeout_ms (int): Overall timeout of every operation (client-side operation timeout).
+        compressors (str): Wire compression, e.g. "zstd,zlib" (zstd needs the zstandard package).
+        other_options: Any other MongoClient option, passed on unchanged.
+    """
+    options = dict(DEFAULT_CLIENT_OPTIONS)
+    given = {
+        "maxPoolSize": max_pool_size,
+        "minPoolSize": min_pool_size,
+        "maxIdleTimeMS": max_idle_time_ms,
+        "connectTimeoutMS": connect_timeout_ms,
+        "serverSelectionTimeoutMS": server_selection_timeout_ms,
+        "socketTimeoutMS": socket_timeout_ms,
+        "timeoutMS": timeout_ms,
+        "compressors": compressors,
+    }
+    options.update({name: value for name, value in given.items() if value is not None})
+    options.update(other_options)
+    return options
+
+
+def _client_key(uri: str, options: dict) -> tuple:
+    # Clients must not be shared with forked processes (e.g. the workers of a parallel load)
+    return os.getpid(), uri, tuple(sorted((name, str(value)) for name, value in options.items()))
+
+
+def get_client(uri: str, **options) -> MongoClient:
+    """
+    Returns the process-wide MongoClient for the URI and options (see client_options), creating it on first use.
+
+    The client is created with connect=False: no connection is opened and the topology is not discovered
+    until the first operation, and all handlers with the same settings share one connection pool.
+    """
+    options = client_options(**options)
+    key = _client_key(uri, options)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = MongoClient(uri, server_api=ServerApi('1'), connect=False, **options)
+            _clients[key] = client
+        return client
+
+
+def get_async_client(uri: str, **options) -> AsyncMongoClient:
+    """
+    Returns the AsyncMongoClient for the URI and options (see client_options), the asyncio version of get_client.
+
+    An AsyncMongoClient works only in the event loop it first ran in, so there is one client per event loop
+    (and one created outside of any loop), shared by all async handlers with the same settings.
+    """
+    options = client_options(**options)
+    try:
+        loop = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop = None
+    key = (loop, *_client_key(uri, options))
+    with _clients_lock:
+        client = _async_clients.get(key)
+        if client is None:
+            client = AsyncMongoClient(uri, server_api=ServerApi('1'), connect=False, **options)
+            _async_clients[key] = client
+        return client
+
+
+def close_clients():
+    """
+    Closes all registered clients, e.g. at the end of a script.
+    """
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+async def close_async_clients(*clients: AsyncMongoClient):
+    """
+    Closes the given clients of get_async_client (all of them if none is given) and removes them from the registry.
+    """
+    with _clients_lock:
+        keys = [key for key, client in _async_clients.items() if not clients or any(client is c for c in clients)]
+        closing = [_async_clients.pop(key) for key in keys]
+    for client in closing:
+        await client.close()
+
+
+def requires_connection(default=None):
+    """
+    Decorator of handler methods: without a usable client, or when the server cannot be reached
+    (ConnectionFailure, e.g. a server selection timeout of a client created with connect=False),
+    the method prints a message and returns `default()` (if callable, so that every call gets a new
+    empty list / dict) or `default`. Generator methods stop yielding instead.
+    """
+    def empty():
+        return default() if callable(default) else default
+
+    def decorator(method):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(self, *args, **kwargs):
+                if not self.is_connected():
+                    print("No connection to the collection.")
+                    return
+                try:
+                    yield from method(self, *args, **kwargs)
+                except ConnectionFailure as e:
+                    print(f"No connection to the database: {e}")
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self.is_connected():
+                print("No connection to the collection.")
+                return empty()
+            try:
+                return method(self, *args, **kwargs)
+            except ConnectionFailure as e:
+                print(f"No connection to the database: {e}")
+                return empty()
+        return wrapper
+    return decorator
+
+
+def requires_async_connection(default=None):
+    """
+    asyncio version of requires_connection, for the methods of AsyncPetAdoptionDatabase: coroutine methods
+    return `default()` / `default`, methods streaming pets (async generators and methods returning an async
+    iterator) stop yielding.
+    """
+    def empty():
+        return default() if callable(default) else default
+
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def wrapper(self, *args, **kwargs):
+                if not self.is_connected():
+                    print("No connection to the collection.")
+                    return empty()
+                try:
+                    return await method(self, *args, **kwargs)
+                except ConnectionFailure as e:
+                    print(f"No connection to the database: {e}")
+                    return empty()
+            return wrapper
+
+        @functools.wraps(method)
+        async def iterator_wrapper(self, *args, **kwargs):
+            if not self.is_connected():
+                print("No connection to the collection.")
+                return
+            try:
+                async for item in method(self, *args, **kwargs):
+                    yield item
+            except ConnectionFailure as e:
+                print(f"No connection to the database: {e}")
+        return iterator_wrapper
+    return decorator
@@ -1,94 +1,769 @@
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 import pymongo
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError
+import numpy as np
 import pandas as pd
-import random
-from datetime import datetime, timedelta
-from time import time
-
-
-def adoption_check(rescue_date, adoption_period):
-    today = datetime(2025, 6, 6, 12, 30)
-    if adoption_period == 'Same Day':
-        days = 0
-    elif adoption_period == '1-7 Days':
-        days = random.randint(1, 7)
-    elif adoption_period == '8-30 Days':
-        days = random.randint(8, 30)
-    elif adoption_period == '31-90 Days':
-        days = random.randint(31, 90)
-    else:
-        days = random.choices(
-            [
-                random.randint(91, 150),
-                random.randint(151, 250),
-                random.randint(251, 365),
-                random.randint(366, 700)
-            ],
-            [0.6, 0.3, 0.17, 0.03],
-            k=1
-        )[0]
-
-    adoption_date = rescue_date + timedelta(days=days)
-    random_hour = random.randint(8, 17)
-    random_minute = random.randint(0, 59)
-    random_second = random.randint(0, 59)
-
-    adoption_date = adoption_date.replace(
-        hour=random_hour,
-        minute=random_minute,
-        second=random_second
-    )
+import io
+import os
+import sys
+import multiprocessing
+import queue
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import compress, count
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from time import time, perf_counter
+from schema_validator import compile_validator
+from indexes import PET_INDEXES, ensure_indexes
+from rollups import ROLLUP_COLLECTION, ROLLUP_PROJECTION, backfill_rollups, rollup_deltas, apply_rollup_deltas
+from connection import get_client
+from readiness import READY_FIELD, readiness_column
+from id_allocator import IdBlockAllocator
+from document_cache import (csv_fingerprint, schema_fingerprint, cache_path, iter_cached_batches, write_through,
+                            restore_report, evict)
 
-    if adoption_date <= today:
-        return {
-            "adopted": True,
-            "adoptionDate": adoption_date,
-            "adoptionPeriod": adoption_period,
-            "daysInShelter": (adoption_date.date() - rescue_date.date()).days
-        }
-    else:
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class IngestStats:
+    """
+    Collects per-stage timings of a load: seconds spent and rows processed in every stage
+    (parse, transform, validate, insert, ...). Stages running in worker processes are summed over all workers.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.rows = defaultdict(int)
+
+    @contextmanager
+    def stage(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += perf_counter() - start
+
+    def count(self, name, rows):
+        self.rows[name] += rows
+
+    def merge(self, seconds, rows):
+        for name, value in seconds.items():
+            self.seconds[name] += value
+        for name, value in rows.items():
+            self.rows[name] += value
+
+    def report(self, total_seconds):
         return {
-            "adopted": False
+            "total_seconds": round(total_seconds, 4),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": {
+                name: {
+                    "seconds": round(seconds, 4),
+                    "rows": self.rows[name],
+                    "rows_per_second": round(self.rows[name] / seconds, 1) if seconds > 0 else None
+                }
+                for name, seconds in self.seconds.items()
+            }
         }
 
 
-def row_to_document(row):
+def peak_rss_mb():
+    # Peak resident memory of this process and its finished children (not available on Windows)
+    if resource is None:
+        return None
+    peak = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Version of the CSV -> document transformation, part of the document cache key
+TRANSFORM_VERSION = 3
+
+# "Today" of the simulated adoption history
+SIMULATION_DATE = datetime(2025, 6, 6, 12, 30)
+
+# Days to adoption drawn for each AdoptionSpeed label: (low, high) inclusive
+ADOPTION_DAY_RANGES = {
+    "Same Day": (0, 0),
+    "1-7 Days": (1, 7),
+    "8-30 Days": (8, 30),
+    "31-90 Days": (31, 90),
+}
+
+# Ranges and weights used for every other (slower) AdoptionSpeed label
+LONG_STAY_RANGES = np.array([(91, 150), (151, 250), (251, 365), (366, 700)])
+LONG_STAY_WEIGHTS = np.array([0.6, 0.3, 0.17, 0.03])
+
+# Source columns identifying an animal; a row keeps its document (and _id) across syncs while they do not change
+SOURCE_KEY_COLUMNS = ["Type", "Name", "Breed1", "Breed2", "Gender", "Color1", "Color2", "Color3", "RescuerID",
+                      "RescueDate"]
+# Id column of exports that have one, used as the only source key column
+SOURCE_ID_COLUMN = "PetID"
+
+# Random numbers drawn per row by simulate_adoption
+ADOPTION_DRAWS = 5
+
+
+def _nullable(series):
+    # Missing values and the literal "None" both become None
+    values = series.astype(object)
+    return values.where(values.notna() & (values != "None"), None).tolist()
+
+
+def _required(series):
+    # Missing values are kept as the "None" string, like fillna('None') did before
+    return series.astype(object).fillna("None").tolist()
+
+
+def source_fingerprints(df):
+    """
+    Returns a content hash (16 hex digits) of every source row of the frame.
+    Rows are read as strings, so the hash of a row does not depend on the other rows of its chunk.
+    """
+    hashes = pd.util.hash_pandas_object(df.drop(columns=["petIndex", "sourceKey"], errors="ignore"), index=False)
+    return [format(h, "016x") for h in hashes.tolist()]
+
+
+def _splitmix64(values):
+    # Mixes 64-bit integers into well distributed 64-bit hashes (vectorized SplitMix64 finalizer)
+    values = np.atleast_1d(np.asarray(values, dtype=np.uint64)) + np.uint64(0x9E3779B97F4A7C15)
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def key_hashes(df):
+    # Hash of the SOURCE_ID_COLUMN of every row, or of the SOURCE_KEY_COLUMNS when the export has no id column
+    columns = [SOURCE_ID_COLUMN] if SOURCE_ID_COLUMN in df.columns else SOURCE_KEY_COLUMNS
+    return pd.util.hash_pandas_object(df[columns], index=False).tolist()
+
+
+def source_keys(df, occurrences):
+    """
+    Returns the stable key (16 hex digits) of every source row: a hash of its SOURCE_ID_COLUMN, or of the
+    SOURCE_KEY_COLUMNS when the export has no id column. Identical rows are told apart by the number of earlier
+    rows with the same hash, counted across chunks in `occurrences` (hash -> rows seen so far).
+    """
+    keys = []
+    for value in key_hashes(df):
+        seen = occurrences.get(value, 0)
+        occurrences[value] = seen + 1
+        keys.append(value if seen == 0 else int(_splitmix64(value ^ seen)[0]))
+    return [format(key, "016x") for key in keys]
+
+
+def number_rows(df, first_index, occurrences):
+    """
+    Adds the 'petIndex' (position in the CSV, the _id given by a full load) and 'sourceKey' (see source_keys)
+    columns to a chunk of the CSV.
+    """
+    df["petIndex"] = range(first_index, first_index + len(df))
+    df["sourceKey"] = source_keys(df, occurrences)
+
+
+def row_draws(keys, seed, draws=ADOPTION_DRAWS):
+    """
+    Returns `draws` uniform numbers in [0, 1) for every row (an array of shape (rows, draws)).
+
+    With a seed they depend only on the seed and the source key of the row, so a row gets the same simulated
+    history in a full, a parallel and a partial (sync) load. Without a seed they are random.
+    """
+    if seed is None:
+        return np.random.default_rng().random((len(keys), draws))
+    base = _splitmix64(np.array([int(key, 16) for key in keys], dtype=np.uint64) ^ _splitmix64(seed)[0])
+    bits = _splitmix64(base[:, None] + np.arange(draws, dtype=np.uint64)[None, :])
+    # The top 53 bits give an exactly representable double in [0, 1)
+    return (bits >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+
+def _integers(series):
+    # Missing, non-numeric and fractional values become None, so the validator rejects the row
+    values = pd.to_numeric(series, errors="coerce")
+    values = values.where(values == values.round())
+    return [None if pd.isna(value) else int(value) for value in values]
+
+
+def _dates(dates):
+    # Unparsed dates (NaT) become None, so the validator rejects the row
+    return [None if pd.isna(date) else date for date in pd.DatetimeIndex(dates).to_pydatetime()]
+
+
+def _parse_dates(series):
+    try:
+        return pd.to_datetime(series)
+    except ValueError:
+        # Mixed formats or bad values: parsed one by one, unparseable dates become NaT
+        return pd.to_datetime(series, format="mixed", errors="coerce")
+
+
+def simulate_adoption(rescue_dates, adoption_speeds, draws):
+    """
+    Simulates the adoption of every pet at once, from the ADOPTION_DRAWS uniform numbers of every row
+    (see row_draws).
+
+    For each row the number of days to adoption is drawn from the range of its AdoptionSpeed label
+    (or from the weighted long-stay ranges), and the adoption time is set to a random moment between 8:00 and 17:59.
+    Pets whose simulated adoption date is after SIMULATION_DATE are not adopted.
+
+    Returns a dict of numpy arrays: adopted, adoptionDate, daysInShelter.
+    """
+    speeds = np.asarray(adoption_speeds, dtype=object)
+
+    def uniform_integers(draw, low, high):
+        # Integers in [low, high) from column `draw` of the draws
+        return low + np.floor(draws[:, draw] * (high - low)).astype(np.int64)
+
+    # Long stays first pick a bucket, then a day inside it
+    cumulative = np.cumsum(LONG_STAY_WEIGHTS / LONG_STAY_WEIGHTS.sum())
+    bucket = np.minimum(np.searchsorted(cumulative, draws[:, 0], side="right"), len(LONG_STAY_WEIGHTS) - 1)
+    low, high = LONG_STAY_RANGES[bucket, 0], LONG_STAY_RANGES[bucket, 1]
+    for label, (label_low, label_high) in ADOPTION_DAY_RANGES.items():
+        mask = speeds == label
+        low = np.where(mask, label_low, low)
+        high = np.where(mask, label_high, high)
+    days = uniform_integers(1, low, high + 1)
+
+    seconds = uniform_integers(2, 8, 18) * 3600 + uniform_integers(3, 0, 60) * 60 + uniform_integers(4, 0, 60)
+    adoption_dates = (rescue_dates.dt.normalize()
+                      + pd.to_timedelta(days, unit="D")
+                      + pd.to_timedelta(seconds, unit="s")
+                      + (rescue_dates - rescue_dates.dt.floor("s")))
+
     return {
-        "_id": row["petIndex"],
-        "name": row["Name"] if row["Name"] != "None" else None,
-        "type": row["Type"],
-        "age": int(row["Age"]),
-        "breed": {
-            "primary": row["Breed1"] if pd.notna(row["Breed1"]) and row["Breed1"] != "None" else None,
-            "secondary": row["Breed2"] if pd.notna(row["Breed2"]) and row["Breed2"] != "None" else None,
-        },
-        "gender": row["Gender"],
-        "colors": list(filter(lambda x: x != "None" and pd.notna(x), [row["Color1"], row["Color2"], row["Color3"]])),
-        "maturitySize": row["MaturitySize"],
-        "furLength": row["FurLength"],
-        "medical": {
-            "vaccinated": row["Vaccinated"],
-            "dewormed": row["Dewormed"],
-            "sterilized": row["Sterilized"],
-            "health": row["Health"]
-        },
-        "quantity": int(row["Quantity"]),
-        "fee": int(row["Fee"]),
-        "location": row["City"],
-        "rescuerId": row["RescuerID"],
-        "rescueDate": pd.to_datetime(row['RescueDate']),
-        "description": row["Description"] if row["Description"] != "None" else None,
-        "adoption": adoption_check(pd.to_datetime(row['RescueDate']), row['AdoptionSpeed']),
+        "adopted": (adoption_dates <= SIMULATION_DATE).to_numpy(),
+        "adoptionDate": pd.DatetimeIndex(adoption_dates).to_pydatetime(),
+        "daysInShelter": days,
     }
 
 
-def documents_from_csv(csv_path):
-    df = pd.read_csv(csv_path)
-    df.fillna('None', inplace=True)
-    df['petIndex'] = range(1, len(df) + 1)
-    documents = df.apply(row_to_document, axis=1).tolist()
-    return documents
+def frame_to_columns(df, seed=None):
+    """
+    Transforms a chunk of the CSV into document columns keyed by their dotted path (e.g. "medical.health").
+    The frame must already contain the 'petIndex' and 'sourceKey' columns (see number_rows).
+    """
+    rescue_dates = _parse_dates(df["RescueDate"])
+    adoption = simulate_adoption(rescue_dates, df["AdoptionSpeed"], row_draws(df["sourceKey"].tolist(), seed))
+    adopted = adoption["adopted"]
+
+    colors = [[c for c in trio if c is not None] for trio in zip(
+        _nullable(df["Color1"]), _nullable(df["Color2"]), _nullable(df["Color3"]))]
+
+    columns = {
+        "_id": df["petIndex"].astype("int64").tolist(),
+        "name": _nullable(df["Name"]),
+        "type": _required(df["Type"]),
+        "age": _integers(df["Age"]),
+        "breed.primary": _nullable(df["Breed1"]),
+        "breed.secondary": _nullable(df["Breed2"]),
+        "gender": _required(df["Gender"]),
+        "colors": colors,
+        "maturitySize": _required(df["MaturitySize"]),
+        "furLength": _required(df["FurLength"]),
+        "medical.vaccinated": _required(df["Vaccinated"]),
+        "medical.dewormed": _required(df["Dewormed"]),
+        "medical.sterilized": _required(df["Sterilized"]),
+        "medical.health": _required(df["Health"]),
+        "quantity": _integers(df["Quantity"]),
+        "fee": _integers(df["Fee"]),
+        "location": _required(df["City"]),
+        "rescuerId": _required(df["RescuerID"]),
+        "rescueDate": _dates(rescue_dates),
+        "description": _nullable(df["Description"]),
+        "adoption.adopted": adopted.tolist(),
+        "adoption.adoptionDate": np.where(adopted, adoption["adoptionDate"], None).tolist(),
+        "adoption.adoptionPeriod": np.where(adopted, _required(df["AdoptionSpeed"]), None).tolist(),
+        "adoption.daysInShelter": np.where(adopted, adoption["daysInShelter"], None).tolist(),
+        "sourceHash": source_fingerprints(df),
+        "sourceKey": df["sourceKey"].tolist(),
+    }
+    columns[READY_FIELD] = readiness_column(columns)
+    return columns
+
+
+def columns_to_documents(columns):
+    docs = []
+    for (_id, name, type_, age, breed_primary, breed_secondary, gender, colors, maturity_size, fur_length,
+         vaccinated, dewormed, sterilized, health, quantity, fee, location, rescuer_id, rescue_date, description,
+         adopted, adoption_date, adoption_period, days_in_shelter, source_hash, source_key,
+         ready) in zip(*columns.values()):
+        docs.append({
+            "_id": _id,
+            "name": name,
+            "type": type_,
+            "age": age,
+            "breed": {
+                "primary": breed_primary,
+                "secondary": breed_secondary,
+            },
+            "gender": gender,
+            "colors": colors,
+            "maturitySize": maturity_size,
+            "furLength": fur_length,
+            "medical": {
+                "vaccinated": vaccinated,
+                "dewormed": dewormed,
+                "sterilized": sterilized,
+                "health": health
+            },
+            "quantity": quantity,
+            "fee": fee,
+            "location": location,
+            "rescuerId": rescuer_id,
+            "rescueDate": rescue_date,
+            "description": description,
+            "adoption": {
+                "adopted": True,
+                "adoptionDate": adoption_date,
+                "adoptionPeriod": adoption_period,
+                "daysInShelter": days_in_shelter
+            } if adopted else {
+                "adopted": False
+            },
+            "sourceHash": source_hash,
+            "sourceKey": source_key,
+            "readyForAdoption": ready,
+        })
+    return docs
+
+
+def frame_to_documents(df, seed=None):
+    return columns_to_documents(frame_to_columns(df, seed))
+
+
+def documents_from_csv(csv_path, seed=None, stats=None):
+    stats = stats or IngestStats()
+    with stats.stage("parse"):
+        df = pd.read_csv(csv_path, dtype=str)
+        number_rows(df, 1, {})
+    with stats.stage("transform"):
+        docs = frame_to_documents(df, seed)
+    stats.count("parse", len(df))
+    stats.count("transform", len(docs))
+    return docs
+
+
+def iter_csv_partitions(csv_path, chunk_size=10000, stats=None):
+    """
+    Reads the CSV in chunks of `chunk_size` rows and yields (partition number, chunk) pairs.
+    Every chunk gets its 'petIndex' and 'sourceKey' columns, counted across chunks like `documents_from_csv` does.
+    """
+    stats = stats or IngestStats()
+    next_index = 1
+    occurrences = {}
+    with pd.read_csv(csv_path, dtype=str, chunksize=chunk_size) as reader:
+        for partition in count():
+            with stats.stage("parse"):
+                chunk = next(reader, None)
+            if chunk is None:
+                return
+            stats.count("parse", len(chunk))
+            number_rows(chunk, next_index, occurrences)
+            next_index += len(chunk)
+            yield partition, chunk
+
+
+def _csv_blocks(csv_file, block_size):
+    # Blocks of the file; a last row without a line break gets one, so every row ends with a line break
+    last = b"\n"
+    while block := csv_file.read(block_size):
+        last = block[-1:]
+        yield block
+    if last not in (b"\n", b"\r"):
+        yield b"\n"
+
+
+def csv_byte_ranges(csv_path, chunk_size=10000, block_size=2 ** 24):
+    """
+    Splits the CSV into byte ranges of `chunk_size` rows, the partitions of `iter_csv_partitions`, without parsing it.
+
+    Like in pd.read_csv, a newline or carriage return ends a row unless it is quoted (follows an odd number of quote
+    characters) and empty rows are skipped, so a CRLF ends a row and an empty one. The file is scanned in blocks of
+    `block_size` bytes.
+
+    Returns (the header line, list of (petIndex of the first row, start offset, end offset) per partition).
+    """
+    size = os.path.getsize(csv_path)
+    header_end = None
+    chunk_starts = []
+    quotes = 0  # quote characters before the current block
+    rows = 0  # non-blank rows before the current block, the header included
+    row_start = 0
+    offset = 0
+    with open(csv_path, "rb") as csv_file:
+        for block in _csv_blocks(csv_file, block_size):
+            data = np.frombuffer(block, dtype=np.uint8)
+            is_quote = data == ord('"')
+            unquoted = (quotes + np.cumsum(is_quote)) % 2 == 0
+            quotes += int(is_quote.sum())
+            ends = np.flatnonzero(((data == ord("\n")) | (data == ord("\r"))) & unquoted) + offset
+            if ends.size:
+                starts = np.concatenate(([row_start], ends[:-1] + 1))
+                kept = ends > starts
+                starts, row_ends = starts[kept], ends[kept]
+                if header_end is None and row_ends.size:
+                    header_end = int(row_ends[0]) + 1
+                # Number of every row among the data rows (the header is -1)
+                numbers = np.arange(rows - 1, rows - 1 + starts.size)
+                chunk_starts.extend(starts[(numbers >= 0) & (numbers % chunk_size == 0)].tolist())
+                rows += int(starts.size)
+                row_start = int(ends[-1]) + 1
+            offset += len(block)
+
+        csv_file.seek(0)
+        header = csv_file.read(header_end or 0)
+
+    bounds = chunk_starts + [size]
+    ranges = [(1 + number * chunk_size, bounds[number], bounds[number + 1]) for number in range(len(chunk_starts))]
+    return header, ranges
+
+
+def read_csv_range(csv_path, header, start, end, **read_options):
+    # Parses the rows between the `start` and `end` byte offsets of the CSV, `header` being its header line
+    with open(csv_path, "rb") as csv_file:
+        csv_file.seek(start)
+        data = csv_file.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), dtype=str, **read_options)
+
+
+def partition_documents(chunk, seed=None, validator=None, stats=None):
+    """
+    Transforms one partition of the CSV into documents.
+
+    With a `validator` (see `schema_validator.compile_validator`) invalid rows are left out;
+    they are returned as a frame of the source rows with a 'rejectReason' column (None when all rows are valid).
+    """
+    stats = stats or IngestStats()
+    with stats.stage("transform"):
+        columns = frame_to_columns(chunk, seed)
+    stats.count("transform", len(chunk))
+
+    rejected = {}
+    if validator:
+        with stats.stage("validate"):
+            rejected = validator(columns)
+        stats.count("validate", len(chunk))
+
+    rejected_rows = None
+    if rejected:
+        keep = [position not in rejected for position in range(len(chunk))]
+        columns = {path: list(compress(values, keep)) for path, values in columns.items()}
+        rejected_rows = chunk.iloc[sorted(rejected)].assign(
+            rejectReason=["; ".join(reasons) for _, reasons in sorted(rejected.items())]
+        )
+
+    with stats.stage("transform"):
+        docs = columns_to_documents(columns)
+    return docs, rejected_rows
+
+
+def write_rejected(report_path, rejected_rows):
+    # Appends rejected rows to the CSV report, writing the header only for a new file
+    rejected_rows.to_csv(report_path, mode="a", index=False, header=not os.path.exists(report_path))
+    print(f"⚠️ Rejected {len(rejected_rows)} invalid row(s), see '{report_path}'.")
+
+
+def iter_documents_from_csv(csv_path, chunk_size=10000, seed=None, validator=None, report_path=None, stats=None):
+    """
+    Yields one list of documents per chunk of `chunk_size` CSV rows.
+    With a `validator`, invalid rows are left out and written to the `report_path` CSV.
+    """
+    for _, chunk in iter_csv_partitions(csv_path, chunk_size, stats):
+        docs, rejected_rows = partition_documents(chunk, seed, validator, stats)
+        if rejected_rows is not None:
+            write_rejected(report_path, rejected_rows)
+        yield docs
+
+
+def insert_batches(collection, batches, prefetch=2, bypass_document_validation=False, stats=None):
+    """
+    Inserts every batch produced by `batches` with an unordered insert_many.
+
+    Batches are produced on a background thread and handed over through a queue holding at most
+    `prefetch` of them, so the next chunk is parsed while the current one is being inserted
+    and memory stays bounded. When an insert fails, the producer is stopped and `batches` closed
+    (e.g. so `document_cache.write_through` removes its partial file) before the error is raised.
+    Returns the number of inserted documents.
+    """
+    stats = stats or IngestStats()
+    handoff = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def hand_over(item):
+        # Waits for room in the queue; gives up once the consumer has stopped
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not hand_over(batch):
+                    return
+        except Exception as e:
+            hand_over(e)
+        finally:
+            hand_over(done)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    inserted = 0
+    try:
+        while True:
+            batch = handoff.get()
+            if batch is done:
+                break
+            if isinstance(batch, Exception):
+                raise batch
+            if batch:
+                with stats.stage("insert"):
+                    collection.insert_many(batch, ordered=False,
+                                           bypass_document_validation=bypass_document_validation)
+                stats.count("insert", len(batch))
+                inserted += len(batch)
+                print(f"  ↳ inserted {inserted} documents so far...")
+    finally:
+        stop.set()
+        # Unblocks a producer waiting for room, then closes the generator once it is no longer running
+        while True:
+            try:
+                handoff.get_nowait()
+            except queue.Empty:
+                break
+        producer.join()
+        if hasattr(batches, "close"):
+            batches.close()
+
+    return inserted
+
+
+_worker_collection = None
+_worker_validator = None
+
+
+def _init_worker(database_uri, database_name, collection_name, schema=None):
+    # Every worker process inserts over its own connection
+    global _worker_collection, _worker_validator
+    client = get_client(database_uri)
+    _worker_collection = client[database_name][collection_name]
+    _worker_validator = compile_validator(schema) if schema else None
+
+
+def _partition_hashes(csv_path, header, start, end):
+    # Key hashes of the rows of a partition (see key_hashes); only the key columns are parsed
+    stats = IngestStats()
+    with stats.stage("parse_keys"):
+        keys = read_csv_range(csv_path, header, start, end,
+                              usecols=lambda column: column in (SOURCE_ID_COLUMN, *SOURCE_KEY_COLUMNS))
+        hashes = key_hashes(keys)
+    stats.count("parse_keys", len(hashes))
+    return hashes, (stats.seconds, stats.rows)
+
+
+def read_partition(csv_path, header, start, end, first_index, occurrences, stats=None):
+    """
+    Reads the partition of the CSV between the `start` and `end` byte offsets (see csv_byte_ranges) and adds
+    the columns `iter_csv_partitions` adds. `occurrences` counts the key hashes of the partition in the earlier
+    partitions (see source_keys).
+    """
+    stats = stats or IngestStats()
+    with stats.stage("parse"):
+        chunk = read_csv_range(csv_path, header, start, end)
+    stats.count("parse", len(chunk))
+    number_rows(chunk, first_index, occurrences)
+    return chunk
+
+
+def _load_partition(csv_path, header, start, end, first_index, occurrences, seed):
+    stats = IngestStats()
+    chunk = read_partition(csv_path, header, start, end, first_index, occurrences, stats)
+    docs, rejected_rows = partition_documents(chunk, seed, _worker_validator, stats)
+    if docs:
+        with stats.stage("insert"):
+            _worker_collection.insert_many(docs, ordered=False,
+                                           bypass_document_validation=_worker_validator is not None)
+        stats.count("insert", len(docs))
+    return len(docs), max((doc["_id"] for doc in docs), default=0), rejected_rows, (stats.seconds, stats.rows)
+
+
+def parallel_load(csv_path, database_uri, database_name, collection_name, workers, chunk_size=10000, seed=None,
+                  schema=None, report_path=None, stats=None):
+    """
+    Loads the CSV with a pool of `workers` processes.
+
+    The CSV is split into byte ranges of `chunk_size` rows (see csv_byte_ranges) which the workers parse
+    themselves. Every partition keeps the ids and source keys it would get in a sequential load: the workers
+    first hash the key columns of their partitions, so rows repeated in an earlier partition are counted
+    (see source_keys), then transform and insert the partitions over their own connection.
+    At most two partitions per worker are in flight at a time.
+    With a `schema`, workers validate the rows client-side and insert bypassing server validation;
+    rejected rows are written to the `report_path` CSV.
+
+    Workers are spawned, not forked: a forked worker would inherit the MongoClient of the parent,
+    which is not fork-safe.
+
+    Returns (number of inserted documents, highest inserted id).
+    """
+    stats = stats or IngestStats()
+    with stats.stage("split"):
+        header, ranges = csv_byte_ranges(csv_path, chunk_size)
+    inserted, max_id = 0, 0
+    occurrences = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(database_uri, database_name, collection_name, schema)) as pool:
+        hashes = [pool.submit(_partition_hashes, csv_path, header, start, end) for _, start, end in ranges]
+        pending = set()
+
+        def collect(futures):
+            nonlocal inserted, max_id
+            for future in futures:
+                partition_inserted, partition_max, rejected_rows, worker_stats = future.result()
+                stats.merge(*worker_stats)
+                inserted += partition_inserted
+                max_id = max(max_id, partition_max)
+                if rejected_rows is not None:
+                    write_rejected(report_path, rejected_rows)
+            print(f"  ↳ inserted {inserted} documents so far...")
+
+        for (first_index, start, end), partition_hashes in zip(ranges, hashes):
+            partition_hashes, worker_stats = partition_hashes.result()
+            stats.merge(*worker_stats)
+            earlier = {value: occurrences[value] for value in set(partition_hashes) if value in occurrences}
+            for value in partition_hashes:
+                occurrences[value] = occurrences.get(value, 0) + 1
+
+            pending.add(pool.submit(_load_partition, csv_path, header, start, end, first_index, earlier, seed))
+            if len(pending) >= 2 * workers:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(pending)
+
+    return inserted, max_id
+
+
+def _delete_unseen(collection, seen, rollups=None, batch_size=10000):
+    # Deletes the loaded documents whose source key is not among the `seen` keys (taking them out of the
+    # `rollups` counts); returns their number
+    seen = np.unique(np.concatenate(seen)) if seen else np.array([], dtype=np.uint64)
+    unseen, keys, ids = [], [], []
+
+    def collect():
+        missing = ~np.isin(np.array(keys, dtype=np.uint64), seen)
+        unseen.extend(compress(ids, missing.tolist()))
+        keys.clear()
+        ids.clear()
+
+    with collection.find({"sourceKey": {"$exists": True}}, {"sourceKey": 1}, batch_size=batch_size) as cursor:
+        for doc in cursor:
+            keys.append(int(doc["sourceKey"], 16))
+            ids.append(doc["_id"])
+            if len(keys) == batch_size:
+                collect()
+    collect()
+
+    deleted = 0
+    for start in range(0, len(unseen), batch_size):
+        batch = {"_id": {"$in": unseen[start:start + batch_size]}}
+        removed = list(collection.find(batch, ROLLUP_PROJECTION)) if rollups is not None else []
+        deleted += collection.delete_many(batch).deleted_count
+        if removed:
+            apply_rollup_deltas(rollups, rollup_deltas(removed, -1))
+    return deleted
+
+
+def sync_collection(collection, csv_path, chunk_size=10000, seed=None, stats=None, rollups=None):
+    """
+    Brings the collection in line with the CSV without reloading it.
+
+    Rows are matched with documents by their 'sourceKey' (see source_keys), not by their position, so inserting
+    or removing rows does not move the other rows onto different pets. For every chunk the fingerprints of the
+    rows are compared with the 'sourceHash' of their documents; only new and changed rows are transformed and
+    written (one unordered bulk_write per chunk). Changed rows keep the _id of their document, new rows get ids
+    from the counter. Loaded documents whose source key was not seen in this pass are deleted at the end.
+    Documents created through the application (without 'sourceKey') are never replaced or deleted.
+    The daily counts in `rollups` (see rollups.py) are moved along with every insert, replacement and delete.
+
+    Collections loaded before source keys were stored have to be reloaded once without sync.
+
+    Returns (dict of inserted/replaced/deleted/conflicts counts, highest _id in the collection).
+    """
+    stats = stats or IngestStats()
+    counts = {"inserted": 0, "replaced": 0, "deleted": 0, "conflicts": 0}
+    if collection.find_one({"sourceHash": {"$exists": True}, "sourceKey": {"$exists": False}}, {"_id": 1}):
+        raise ValueError(f"'{collection.name}' was loaded without source keys, reload it once without sync.")
+    collection.create_indexes(PET_INDEXES["sync_collection"])
+    allocator = IdBlockAllocator(collection.database.counters)
+    seen = []
+
+    for _, chunk in iter_csv_partitions(csv_path, chunk_size, stats):
+        keys = chunk["sourceKey"].tolist()
+        seen.append(np.array([int(key, 16) for key in keys], dtype=np.uint64))
+        with stats.stage("diff"):
+            existing = {
+                doc["sourceKey"]: doc
+                for doc in collection.find({"sourceKey": {"$in": keys}},
+                                           {"sourceKey": 1, "sourceHash": 1, **ROLLUP_PROJECTION})
+            }
+            changed = [key not in existing or existing[key].get("sourceHash") != fingerprint
+                       for key, fingerprint in zip(keys, source_fingerprints(chunk))]
+        stats.count("diff", len(chunk))
+        if not any(changed):
+            continue
+
+        rows = chunk[changed].copy()
+        new = sum(key not in existing for key in rows["sourceKey"])
+        new_ids = iter(allocator.reserve(new) if new else ())
+        rows["petIndex"] = [existing[key]["_id"] if key in existing else next(new_ids) for key in rows["sourceKey"]]
+        with stats.stage("transform"):
+            docs = frame_to_documents(rows, seed)
+            # Lets readers that refresh incrementally (e.g. PetSnapshot) see the synchronized rows
+            modified = datetime.now(timezone.utc)
+            for doc in docs:
+                doc["lastModified"] = modified
+        stats.count("transform", len(docs))
+        requests = [
+            ReplaceOne({"_id": doc["_id"], "sourceKey": doc["sourceKey"]}, doc)
+            if doc["sourceKey"] in existing else InsertOne(doc)
+            for doc in docs
+        ]
+
+        try:
+            with stats.stage("insert"):
+                result = collection.bulk_write(requests, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            counts["conflicts"] += len(result["writeErrors"])
+        stats.count("insert", len(requests))
+        counts["inserted"] += result["nInserted"]
+        counts["replaced"] += result["nModified"]
+
+        if rollups is not None:
+            failed = {error["index"] for error in result.get("writeErrors", [])}
+            written = [doc for position, doc in enumerate(docs) if position not in failed]
+            deltas = rollup_deltas(written)
+            # update() keeps negative counts, + would drop them
+            deltas.update(rollup_deltas((existing[doc["sourceKey"]] for doc in written if doc["sourceKey"] in existing),
+                                        -1))
+            with stats.stage("rollups"):
+                apply_rollup_deltas(rollups, deltas)
+
+    with stats.stage("delete"):
+        counts["deleted"] = _delete_unseen(collection, seen, rollups)
+
+    max_id_doc = collection.find_one({}, {"_id": 1}, sort=[("_id", pymongo.DESCENDING)])
+    return counts, max_id_doc["_id"] if max_id_doc else 0
 
 
 def return_schema():
@@ -205,6 +880,22 @@ def return_schema():
                         "bsonType": ["string", "null"],
                         "description": "Description of the animal"
                     },
+                    "lastModified": {
+                        "bsonType": "date",
+                        "description": "Time of the last change made by the application or a sync (UTC)"
+                    },
+                    "readyForAdoption": {
+                        "bsonType": "bool",
+                        "description": "Derived from the adoption and medical fields (see readiness.READINESS_RULE)"
+                    },
+                    "sourceHash": {
+                        "bsonType": "string",
+                        "description": "Fingerprint of the source CSV row (set by the loader)"
+                    },
+                    "sourceKey": {
+                        "bsonType": "string",
+                        "description": "Stable key of the source CSV row, matches rows and documents in a sync"
+                    },
                     "adoption": {
                         "bsonType": "object",
                         "required": ["adopted"],
@@ -239,9 +930,20 @@ def return_schema():
     return schema
 
 
-def create_database(csv_path: str, database_uri: str, database_name: str, collection_name: str, schema: dict):
-    # Create a new client and connect to the server
-    client = MongoClient(database_uri, server_api=ServerApi('1'))
+def create_database(csv_path: str, database_uri: str, database_name: str, collection_name: str, schema: dict,
+                    chunk_size: int = 0, seed: int = None, workers: int = 1, sync: bool = False,
+                    bulk_load: bool = False, report_path: str = "rejected_rows.csv", cache_dir: str = None,
+                    cache_max_bytes: int = 2 * 1024 ** 3):
+    # chunk_size > 0 streams the CSV in chunks of that many rows instead of loading it at once
+    # workers > 1 transforms and inserts the chunks in that many processes
+    # bulk_load = True validates rows client-side (rejects go to report_path) and attaches the validator afterwards
+    # seed makes the simulated adoption history reproducible
+    # sync = True updates the existing collection with the rows that changed instead of reloading it
+    # cache_dir keeps the transformed documents of seeded loads, repeated loads of the same CSV skip parsing
+    # Returns the per-stage timings of the load (see IngestStats.report), or None on error
+    # Shared client, the first command connects it
+    client = get_client(database_uri)
+    stats = IngestStats()
 
     try:
         # Start stoper
@@ -253,38 +955,122 @@ def create_database(csv_path: str, database_uri: str, database_name: str, collec
 
         # Access the database
         db = client[database_name]
+        collection = db[collection_name]
 
-        # Drop existing collection if it exists (optional but recommended for development)
-        if "petsInformation" in db.list_collection_names():
-            db.drop_collection("petsInformation")
-            print("🔁 Dropped existing 'petsInformation' collection.")
-
-        # Create new collection with schema validation
-        db.create_collection(collection_name, **schema)
-        print("📦 Created 'petsInformation' collection with schema validation.")
-
-        # Load data from CSV and insert
-        docs = documents_from_csv(csv_path)
-        collection = db[collection_name]  # Get the newly created collection
-        collection.insert_many(docs)
-        print(f"✅ Inserted {len(docs)} documents into MongoDB.")
-
-        # Creating id counter collection
-        max_id_doc = collection.find_one(sort=[("_id", pymongo.DESCENDING)])
-        max_id = max_id_doc["_id"] if max_id_doc else 0
-        db.counters.update_one(
-            {"_id": "petID"},
-            {"$set": {"seq": max_id}},
-            upsert=True
-        )
-        print(f"🔢 Initialized counter to {max_id}")
+        # Rollups moved along with the changes of a sync; None when they have to be built from all pets
+        rollups = None
+        if sync:
+            if collection_name not in db.list_collection_names():
+                db.create_collection(collection_name, **schema)
+                print(f"📦 Created '{collection_name}' collection with schema validation.")
+            elif ROLLUP_COLLECTION in db.list_collection_names():
+                rollups = db[ROLLUP_COLLECTION]
+
+            counts, max_id = sync_collection(collection, csv_path, chunk_size or 10000, seed, stats, rollups)
+            print(f"🔄 Synchronized with CSV: {counts['inserted']} inserted, {counts['replaced']} replaced, "
+                  f"{counts['deleted']} deleted, {counts['conflicts']} conflicts.")
+
+            # Never move the counter back - ids above the CSV may belong to pets created in the application
+            db.counters.update_one(
+                {"_id": "petID"},
+                {"$max": {"seq": max_id}},
+                upsert=True
+            )
+            print(f"🔢 Counter is at least {max_id}")
+        else:
+            # Drop existing collection if it exists (optional but recommended for development)
+            if "petsInformation" in db.list_collection_names():
+                db.drop_collection("petsInformation")
+                print("🔁 Dropped existing 'petsInformation' collection.")
+
+            if bulk_load:
+                # Schema validation is attached after the load
+                db.create_collection(collection_name)
+                print("📦 Created 'petsInformation' collection (validation deferred).")
+                if os.path.exists(report_path):
+                    os.remove(report_path)
+            else:
+                # Create new collection with schema validation
+                db.create_collection(collection_name, **schema)
+                print("📦 Created 'petsInformation' collection with schema validation.")
+
+            # Documents of a seeded load depend only on the CSV, the transformation, the schema they were
+            # validated against and the loader settings
+            cached = None
+            if cache_dir and seed is not None:
+                cached = cache_path(cache_dir, csv_fingerprint(
+                    csv_path, TRANSFORM_VERSION, seed, chunk_size or 10000, bulk_load, schema_fingerprint(schema)))
+
+            # Load data from CSV and insert
+            if cached and os.path.exists(cached):
+                print(f"📂 Loading documents from cache '{cached}'.")
+                if bulk_load and restore_report(cached, report_path):
+                    print(f"⚠️ Rows rejected by the cached load are listed in '{report_path}'.")
+                batches = iter_cached_batches(cached, chunk_size or 10000)
+                inserted = insert_batches(collection, batches, bypass_document_validation=bulk_load, stats=stats)
+                max_id_doc = collection.find_one(sort=[("_id", pymongo.DESCENDING)])
+                max_id = max_id_doc["_id"] if max_id_doc else 0
+            elif workers > 1:
+                inserted, max_id = parallel_load(csv_path, database_uri, database_name, collection_name,
+                                                 workers, chunk_size or 10000, seed,
+                                                 schema if bulk_load else None, report_path, stats)
+            else:
+                if bulk_load or chunk_size > 0 or cached:
+                    validator = compile_validator(schema) if bulk_load else None
+                    batches = iter_documents_from_csv(csv_path, chunk_size or 10000, seed,
+                                                      validator, report_path, stats)
+                    if cached:
+                        batches = write_through(batches, cached, report_path if bulk_load else None)
+                    inserted = insert_batches(collection, batches, bypass_document_validation=bulk_load, stats=stats)
+                    if cached:
+                        evict(cache_dir, cache_max_bytes)
+                else:
+                    docs = documents_from_csv(csv_path, seed, stats)
+                    with stats.stage("insert"):
+                        collection.insert_many(docs)
+                    stats.count("insert", len(docs))
+                    inserted = len(docs)
+                max_id_doc = collection.find_one(sort=[("_id", pymongo.DESCENDING)])
+                max_id = max_id_doc["_id"] if max_id_doc else 0
+            print(f"✅ Inserted {inserted} documents into MongoDB.")
+
+            if bulk_load:
+                with stats.stage("attach_validator"):
+                    db.command("collMod", collection_name, **schema)
+                print("🛡️ Attached schema validation to the collection.")
+
+            # Creating id counter collection
+            db.counters.update_one(
+                {"_id": "petID"},
+                {"$set": {"seq": max_id}},
+                upsert=True
+            )
+            print(f"🔢 Initialized counter to {max_id}")
+
+        # Secondary indexes are built after the load, so inserts do not have to maintain them
+        with stats.stage("indexes"):
+            # A full load has just written every readiness flag; a sync keeps pets created in the application
+            ensure_indexes(collection, repair=sync)
+
+        # Daily adopted / rescued counts per location, kept up to date by the handler afterwards
+        if rollups is None:
+            with stats.stage("rollups"):
+                built = backfill_rollups(collection)
+            print(f"📊 Built {built} daily adoption rollups.")
+        else:
+            print("📊 Updated the daily adoption rollups with the synchronized rows.")
 
         # Stop stoper
         stop = time()
         print(f"⌚️ The database creation process took: {round(stop - start, 2)} sec")
+        for name, seconds in sorted(stats.seconds.items(), key=lambda item: -item[1]):
+            print(f"   {name:<16} {round(seconds, 2)} sec")
+
+        return stats.report(stop - start)
 
     except Exception as e:
         print("❌ Error occurred:", e)
+        return None
 
 
 if __name__ == "__main__":
@@ -294,6 +1080,12 @@ if __name__ == "__main__":
     csv_path = "pets.csv"
     database_name = "petsDB"
     collection_name = "petsInformation"
+    chunk_size = 0  # e.g. 50_000 to stream large exports in chunks
+    workers = 1  # e.g. os.cpu_count() for a parallel load
+    sync = False  # True to apply only the rows that changed since the last load
+    bulk_load = False  # True to validate client-side and attach the schema validator after the load
+    seed = None  # e.g. 42 for a reproducible adoption history (required by the document cache)
+    cache_dir = None  # e.g. ".pets_cache" to reuse transformed documents between seeded loads
     schema = return_schema()
 
     create_database(
@@ -301,5 +1093,11 @@ if __name__ == "__main__":
         database_uri=database_uri,
         database_name=database_name,
         collection_name=collection_name,
-        schema=schema
+        schema=schema,
+        chunk_size=chunk_size,
+        workers=workers,
+        sync=sync,
+        bulk_load=bulk_load,
+        seed=seed,
+        cache_dir=cache_dir
     )
@@ -1,33 +1,420 @@
+import copy
 import hashlib
-import random
-from pymongo import MongoClient
-from pymongo.server_api import ServerApi
 from typing import Optional
 import pymongo
 from bson import ObjectId
 import pprint
-from typing import List
-from datetime import datetime
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from typing import List, Iterable, Iterator, Tuple
+import base64
+import json
+from dataclasses import asdict, is_dataclass
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timezone
+from id_allocator import IdBlockAllocator
+from text_search import DescriptionIndex, INDEX_PROJECTION, tokenize
+from query_cache import QueryCache, make_key, query_fields, projected_fields, fields_overlap
+from readiness import (READY_FIELD, READY_FOR_ADOPTION_QUERY, READINESS_FIELDS, SET_READINESS_STAGE,
+                       is_ready, repair_readiness)
+from rollups import (ROLLUP_COLLECTION, ROLLUP_FIELDS, STALE_MARKER, backfill_rollups, rollup_changes, rollup_counts,
+                     stale_marker_update)
+from connection import get_client, requires_connection
+
+
+# Documents fetched per round trip by the streaming (iter_*) methods
+DEFAULT_BATCH_SIZE = 500
+
+# Named projections for the view= argument of the query methods
+PET_VIEWS = {
+    # Tiles and short lists
+    "card": {"_id": 1, "name": 1, "type": 1, "age": 1, "fee": 1, "location": 1},
+    # Listings with filters, everything but the free text and the medical / adoption details
+    "list": {"_id": 1, "name": 1, "type": 1, "age": 1, "fee": 1, "location": 1, "gender": 1, "breed.primary": 1,
+             "maturitySize": 1, "furLength": 1, "colors": 1, "adoption.adopted": 1},
+    # The whole document
+    "full": None,
+}
+
+# Fields adoption_rescue_stats counts by
+STATS_FIELDS = ["location", "adoption.adopted", "adoption.adoptionDate", "rescueDate"]
+
+# adoptionPeriod values, in order (columns of adoption_rescue_timeseries)
+ADOPTION_PERIODS = ["Same Day", "1-7 Days", "8-30 Days", "31-90 Days", "Over 90 Days"]
+
+
+def stats_period(month: int = 0, year: int = 0) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Returns the [start, end) range of the given month of a year, of the whole year when month is 0,
+    or of the current month when both are 0. Returns None for a month without a year.
+    """
+    if month == 0 and year == 0:
+        today = datetime.today()
+        year, month = today.year, today.month
+    elif month == 0:
+        return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    elif year == 0:
+        return None
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def stats_matches(adopted: bool, rescued: bool, city_filter: dict, start: datetime, end: datetime) -> dict:
+    # Filters of the pets counted by adoption_rescue_stats: "adopted" / "rescued" -> filter
+    matches = {}
+    if adopted:
+        matches["adopted"] = {**city_filter, "adoption.adopted": True,
+                              "adoption.adoptionDate": {"$gte": start, "$lt": end}}
+    if rescued:
+        matches["rescued"] = {**city_filter, "rescueDate": {"$gte": start, "$lt": end}}
+    return matches
+
+
+def view_projection(view: Optional[str] = None, projection: Optional[dict] = None) -> Optional[dict]:
+    """
+    Returns the projection of a named view from PET_VIEWS, or `projection` when no view is given.
+    """
+    if view is None:
+        return projection
+    if view not in PET_VIEWS:
+        raise ValueError(f"'view' must be one of {list(PET_VIEWS)}")
+    if projection is not None:
+        raise ValueError("Give either 'view' or 'projection', not both.")
+    return PET_VIEWS[view]
+
+
+def location_filter(city) -> dict:
+    # City name(s) or 'all' -> filter on location
+    if isinstance(city, str) and city.lower() == 'all':
+        return {}
+    elif isinstance(city, list):
+        return {"location": {"$in": city}}
+    else:
+        return {"location": city}
+
+
+def location_stats_pipeline(match: dict, order: int = -1, limit: int = 0) -> list:
+    # Number of matching pets per location, sorted by the count
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$location", "count": {"$sum": 1}}},
+        {"$sort": {"count": order}}
+    ]
+    if limit > 0:
+        pipeline.append({"$limit": limit})
+    return pipeline
+
+
+def timeseries_pipeline(start: datetime, end: datetime, granularity: str, city_filter: dict) -> list:
+    """
+    Returns the single-pass aggregation of adoption_rescue_timeseries: adopted (with the median daysInShelter),
+    rescued and adoptionPeriod counts per period and location, in three $facet branches.
+    """
+    date_range = {"$gte": start, "$lt": end}
+    adopted_match = {"adoption.adopted": True, "adoption.adoptionDate": date_range}
+    rescued_match = {"rescueDate": date_range}
+
+    def period_of(field):
+        truncate = {"date": field, "unit": granularity}
+        if granularity == "week":
+            truncate["startOfWeek"] = "monday"
+        return {"period": {"$dateTrunc": truncate}, "location": "$location"}
+
+    return [
+        {"$match": {**city_filter, "$or": [adopted_match, rescued_match]}},
+        {"$facet": {
+            "adopted": [
+                {"$match": adopted_match},
+                {"$group": {
+                    "_id": period_of("$adoption.adoptionDate"),
+                    "count": {"$sum": 1},
+                    "medianDays": {"$median": {"input": "$adoption.daysInShelter", "method": "approximate"}}
+                }}
+            ],
+            "adoptionPeriods": [
+                {"$match": adopted_match},
+                {"$group": {
+                    "_id": {**period_of("$adoption.adoptionDate"), "adoptionPeriod": "$adoption.adoptionPeriod"},
+                    "count": {"$sum": 1}
+                }}
+            ],
+            "rescued": [
+                {"$match": rescued_match},
+                {"$group": {"_id": period_of("$rescueDate"), "count": {"$sum": 1}}}
+            ]
+        }}
+    ]
+
+
+def timeseries_columns(facets: dict) -> dict:
+    # Joins the $facet branches of timeseries_pipeline into columns, one row per (period, location)
+    rows = {}  # (period, location) -> row
+
+    def row(group):
+        key = (group["period"], group["location"])
+        if key not in rows:
+            rows[key] = {"adopted": 0, "rescued": 0, "medianDaysInShelter": None,
+                         **{period: 0 for period in ADOPTION_PERIODS}}
+        return rows[key]
+
+    for doc in facets["adopted"]:
+        row(doc["_id"]).update(adopted=doc["count"], medianDaysInShelter=doc["medianDays"])
+    for doc in facets["rescued"]:
+        row(doc["_id"])["rescued"] = doc["count"]
+    for doc in facets["adoptionPeriods"]:
+        if doc["_id"].get("adoptionPeriod") in ADOPTION_PERIODS:
+            row(doc["_id"])[doc["_id"]["adoptionPeriod"]] = doc["count"]
+
+    keys = sorted(rows, key=lambda key: (key[0], key[1] or ""))
+    columns = {"period": [key[0] for key in keys], "location": [key[1] for key in keys]}
+    for column in ["adopted", "rescued", "medianDaysInShelter", *ADOPTION_PERIODS]:
+        columns[column] = [rows[key][column] for key in keys]
+    return columns
+
+
+def adoption_statuses(pet_ids: list, pets: dict, status: str) -> dict:
+    # Pet id -> "missing", "already_adopted" or `status` for pets that are not adopted yet
+    return {
+        pet_id: "missing" if pet_id not in pets else
+        "already_adopted" if pets[pet_id].get("adoption", {}).get("adopted") else status
+        for pet_id in pet_ids
+    }
+
+
+def pet_specs(pets: Iterable) -> list:
+    # create_pets input (dicts, NamedTuples or dataclasses) as dicts of create_pet keyword arguments
+    specs = []
+    for pet in pets:
+        if is_dataclass(pet):
+            pet = asdict(pet)
+        elif hasattr(pet, "_asdict"):
+            pet = pet._asdict()
+        specs.append(dict(pet))
+    return specs
+
+
+def record_inserts(results: list, batch: list, failed: dict):
+    # Marks the (position, document) pairs of an insert_many batch in the create_pets results;
+    # failed: index in the batch -> error message
+    for index, (position, _) in enumerate(batch):
+        if index in failed:
+            results[position]["error"] = failed[index]
+        else:
+            results[position]["inserted"] = True
+
+
+def adopted_rollup_docs(pets: dict, pet_ids: list, adoption_date: datetime) -> list:
+    # What the rollups need of the pets adopt_pets adopted (pets: id -> document with the location)
+    return [{"location": pets[pet_id].get("location"), "adoption": {"adopted": True, "adoptionDate": adoption_date}}
+            for pet_id in pet_ids]
+
+
+def pet_of_the_day_target(today: str, max_id: int) -> int:
+    # Id between 1 and max_id picked by the hash of the date
+    hash_value = int(hashlib.sha256(today.encode()).hexdigest(), 16)
+    return hash_value % max_id + 1
+
+
+def pet_of_the_day_query(unadopted_only: bool) -> dict:
+    return {"adoption.adopted": False} if unadopted_only else {}
+
+
+def pet_of_the_day_cache_id(today: str, unadopted_only: bool) -> str:
+    # _id of the day's choice in the 'dailyCache' collection
+    return f"petOfTheDay|{today}|{'unadopted' if unadopted_only else 'all'}"
+
+
+def pet_of_the_day_candidates(today: str, unadopted_only: bool, largest_id: int) -> list:
+    # Queries tried in order, taking the pet with the lowest _id: the first pet at or above the id picked
+    # for the day, then (when the pets above it were deleted) the first pet at all
+    base_query = pet_of_the_day_query(unadopted_only)
+    return [{**base_query, "_id": {"$gte": pet_of_the_day_target(today, largest_id)}}, base_query]
+
+
+def daily_cache_update(today: str, pet_id: int) -> dict:
+    # Upsert of the shared choice: the first handler to store it wins
+    return {"$setOnInsert": {"petId": pet_id, "date": today}}
+
+
+def remember_pet_of_the_day(chosen: dict, key: tuple, pet: dict) -> dict:
+    # Adds the choice for key = (date, unadopted_only); only the choices of that date are kept
+    chosen = {cached_key: cached for cached_key, cached in chosen.items() if cached_key[0] == key[0]}
+    chosen[key] = pet
+    return chosen
+
+
+# adoptionPeriod computed on the server from daysInShelter, same periods as PetAdoptionDatabase.return_period
+ADOPTION_PERIOD_EXPRESSION = {
+    "$switch": {
+        "branches": [
+            {"case": {"$lt": ["$adoption.daysInShelter", 0]}, "then": None},
+            {"case": {"$eq": ["$adoption.daysInShelter", 0]}, "then": "Same Day"},
+            {"case": {"$lte": ["$adoption.daysInShelter", 7]}, "then": "1-7 Days"},
+            {"case": {"$lte": ["$adoption.daysInShelter", 30]}, "then": "8-30 Days"},
+            {"case": {"$lte": ["$adoption.daysInShelter", 90]}, "then": "31-90 Days"},
+        ],
+        "default": "Over 90 Days"
+    }
+}
+
+# Every write stamps 'lastModified' (UTC), so readers such as PetSnapshot can pick up the changed pets:
+# inserts with the client clock, updates with the server clock ($$NOW).
+# Every write also recomputes 'readyForAdoption' (see readiness.READINESS_RULE): update pipelines end with
+# SET_READINESS_STAGE
+
+# Medical preparation: everything done, and a 60% chance that an injured or unknown pet becomes healthy
+# (otherwise it ends up with a minor injury)
+PREPARE_FOR_ADOPTION_PIPELINE = [
+    {"$set": {
+        "medical.vaccinated": "Yes",
+        "medical.dewormed": "Yes",
+        "medical.sterilized": "Yes",
+        "medical.health": {
+            "$cond": [
+                {"$in": ["$medical.health", ["Minor Injury", "Unknown", "Serious Injury"]]},
+                {"$cond": [{"$lt": [{"$rand": {}}, 0.6]}, "Healthy", "Minor Injury"]},
+                "$medical.health"
+            ]
+        },
+        "lastModified": "$$NOW"
+    }},
+    SET_READINESS_STAGE
+]
+
+
+def adoption_pipeline(adoption_date: datetime) -> list:
+    """
+    Returns the update pipeline adopting a pet on `adoption_date`; daysInShelter (in calendar days since rescueDate)
+    and adoptionPeriod are computed on the server.
+    """
+    return [
+        {"$set": {
+            "adoption.adopted": True,
+            "adoption.adoptionDate": adoption_date,
+            "adoption.daysInShelter": {
+                "$dateDiff": {"startDate": "$rescueDate", "endDate": adoption_date, "unit": "day"}
+            },
+            "lastModified": "$$NOW"
+        }},
+        {"$set": {"adoption.adoptionPeriod": ADOPTION_PERIOD_EXPRESSION}},
+        SET_READINESS_STAGE
+    ]
+
+
+def pet_update(new_values: dict):
+    """
+    Returns the update setting `new_values` (dotted paths allowed) and stamping 'lastModified'.
+
+    A classic {"$set": ...} update, unless one of READINESS_FIELDS changes: then an update pipeline that also
+    recomputes the readiness flag, with the values taken literally (strings starting with "$" stay strings).
+    Pipelines do not support array index paths (e.g. "colors.0"), so they are refused together with those fields.
+    """
+    if not fields_overlap(new_values, READINESS_FIELDS):
+        return {"$set": new_values, "$currentDate": {"lastModified": True}}
+
+    indexed = [field for field in new_values if any(part.isdigit() for part in field.split("."))]
+    if indexed:
+        raise ValueError(f"Array index paths ({', '.join(indexed)}) cannot be updated together with the "
+                         f"readiness fields, update them separately.")
+    return [
+        {"$set": {**{field: {"$literal": value} for field, value in new_values.items()}, "lastModified": "$$NOW"}},
+        SET_READINESS_STAGE
+    ]
+
+
+def changed_filter(query: dict, new_values: dict) -> dict:
+    # Narrows `query` to pets on which `new_values` changes something, so a no-op update writes nothing.
+    # Whole values are compared in $expr: {field: {"$ne": value}} would compare the elements of an array field.
+    # Paths with an array index cannot be compared that way, updates with them are always applied
+    if any(key.isdigit() for path in new_values for key in path.split(".")):
+        return query
+    return {"$and": [query, {"$expr": {"$or": [{"$ne": [f"${field}", {"$literal": value}]}
+                                               for field, value in new_values.items()]}}]}
+
+
+def applied_update(doc: dict, new_values: dict) -> dict:
+    """
+    Returns a copy of the pet document with the pet_update of `new_values` applied, as the server applies it:
+    dotted paths (array indexes included), the readiness flag and 'lastModified' (from the client clock here).
+    """
+    doc = copy.deepcopy(doc)
+    for path, value in new_values.items():
+        *parents, last = path.split(".")
+        target = doc
+        for key in parents:
+            if isinstance(target, list):
+                target = target[int(key)]
+            else:
+                target = target.setdefault(key, {})
+        if isinstance(target, list):
+            target[int(last)] = value
+        else:
+            target[last] = value
+    if fields_overlap(new_values, READINESS_FIELDS):
+        doc[READY_FIELD] = is_ready(doc)
+    doc["lastModified"] = datetime.now(timezone.utc)
+    return doc
 
 
 class PetAdoptionDatabase:
-    def __init__(self, uri: str, db_name: str = "petsDB", collection_name: str = "petsInformation"):
+    def __init__(self, uri: str, db_name: str = "petsDB", collection_name: str = "petsInformation",
+                 id_block_size: int = 20, cache: Optional[QueryCache] = None, use_rollups: bool = True,
+                 **client_options):
+        # client_options: pool size, timeouts, compression, ... (see connection.client_options)
         self.uri = uri
         self.db_name = db_name
         self.collection_name = collection_name
+        # results of find_pets_for_adoption, pets_ready_for_adoption and adoption_rescue_stats; None = no caching
+        self.cache = cache
+        # adoption_rescue_stats answers from the daily rollups (see rollups.py) instead of scanning the pets
+        self.use_rollups = use_rollups
+        # an update of the rollups failed and the server could not be told (see _update_rollups)
+        self._rollups_stale = False
+
+        # (date, unadopted_only) -> pet of the day
+        self._pets_of_the_day = {}
+        # (date, largest pet _id on that date), the range the pet of the day is drawn from
+        self._largest_pet_id = None
+        # full-text index of descriptions, built on the first search
+        self._description_index = None
 
         try:
-            self.client = MongoClient(self.uri, server_api=ServerApi('1'))
+            # Client shared by all handlers with the same settings; it connects on the first operation
+            self.client = get_client(self.uri, **client_options)
             self.db = self.client[self.db_name]
             self.collection = self.db[self.collection_name]
-            # test connection
-            self.client.admin.command('ping')
-            print("Connected to MongoDB!\n")
+            self.rollups = self.db[ROLLUP_COLLECTION]
+            # ids are reserved from the counter in blocks of id_block_size
+            self.id_allocator = IdBlockAllocator(self.db.counters, "petID", id_block_size)
         except Exception as e:
-            print("Failed to connect to MongoDB:", e)
+            # Invalid URI or options
+            print("Failed to configure the MongoDB client:", e)
             self.client = None
             self.db = None
             self.collection = None
+            self.rollups = None
+            self.id_allocator = None
+
+    def is_connected(self) -> bool:
+        """
+        Returns True if the handler has a usable client. Does not contact the server, see `ping`.
+        """
+        return self.client is not None
+
+    def ping(self) -> bool:
+        """
+        Checks the connection with a round trip to the server.
+        """
+        if not self.is_connected():
+            return False
+        try:
+            self.client.admin.command('ping')
+            print("Connected to MongoDB!\n")
+            return True
+        except Exception as e:
+            print("Failed to connect to MongoDB:", e)
+            return False
 
     @staticmethod
     def return_period(days_passed: int):
@@ -45,15 +432,176 @@ class PetAdoptionDatabase:
             return None
 
     def _get_next_sequence(self):
-        counter = self.db.counters.find_one_and_update(
-            {"_id": "petID"},
-            {"$inc": {"seq": 1}},
-            upsert=True,
-            return_document=pymongo.ReturnDocument.AFTER
-        )
-        return counter["seq"]
+        return self.id_allocator.next_id()
+
+    def _cached(self, key: str, compute, filter_fields, output_fields=(), by_pet: bool = True,
+                query: Optional[dict] = None):
+        # Read-through: returns the cached result of `key` or computes and stores it.
+        # by_pet: the result is a list of pet documents (so a change of one of them makes it stale).
+        # query: filter of the pets in the result, lets a new pet drop only the entries it can join
+        if self.cache is None:
+            return compute()
+        hit, value = self.cache.get(key)
+        if hit:
+            return value
+        value = compute()
+        pet_ids = [pet["_id"] for pet in value if "_id" in pet] if by_pet else None
+        self.cache.put(key, value, filter_fields, output_fields, pet_ids, query)
+        return value
+
+    def _invalidate(self, fields: Optional[Iterable[str]] = None, pet_ids: Optional[Iterable] = None,
+                    inserted: Optional[Iterable[dict]] = None):
+        # Called by every write, see QueryCache.invalidate
+        if self.cache is not None:
+            if fields is not None and fields_overlap(fields, READINESS_FIELDS):
+                # The readiness flag was recomputed along with the fields it is derived from
+                fields = [*fields, READY_FIELD]
+            self.cache.invalidate(fields, pet_ids, inserted)
+
+    def _update_rollups(self, added: Iterable[dict] = (), removed: Iterable[dict] = ()) -> bool:
+        """
+        Moves the daily adopted / rescued counts along with a write of the pets: documents after it (`added`)
+        and before it (`removed`). Returns False if the rollups could not be updated.
+
+        The rollups are written after the pets, not in the same transaction. A failed update marks them stale
+        (rollups.STALE_MARKER, or only in this handler when even that fails), and the next adoption_rescue_stats
+        rebuilds them before reading. A process stopping between the two writes leaves no mark: the counts stay
+        off until `rebuild_rollups` is run.
+        """
+        updates = rollup_changes(added, removed)
+        if not updates:
+            return True
+        try:
+            self.rollups.bulk_write(updates, ordered=False)
+            return True
+        except Exception as e:
+            print(f"Error updating adoption rollups, they will be rebuilt: {e}")
+            try:
+                self.rollups.update_one(STALE_MARKER, stale_marker_update(e), upsert=True)
+            except Exception:
+                self._rollups_stale = True
+            return False
+
+    def _ensure_current_rollups(self):
+        # Rebuilds the rollups before they are read when an update of them failed (in any handler)
+        if self._rollups_stale or self.rollups.find_one(STALE_MARKER, {"_id": 1}) is not None:
+            print("Adoption rollups missed a change, rebuilding them.")
+            backfill_rollups(self.collection)
+            self._rollups_stale = False
+
+    @requires_connection()
+    def rebuild_rollups(self) -> Optional[int]:
+        """
+        Rebuilds the daily adoption / rescue rollups from the pets collection, e.g. after changes made outside
+        this handler. The old rollups keep answering until the rebuilt ones replace them (see
+        rollups.backfill_rollups). Returns the number of rollup documents.
+        """
+        count = backfill_rollups(self.collection)
+        self._invalidate(ROLLUP_FIELDS)
+        print(f"Rebuilt {count} adoption rollup(s).")
+        return count
+
+    @requires_connection()
+    def repair_readiness(self, batch_size: int = 1000) -> Optional[int]:
+        """
+        Recomputes the 'readyForAdoption' flag of all pets in batches of `batch_size`, e.g. after changes made
+        outside this handler or on data loaded before the flag existed. Returns the number of pets fixed.
+        """
+        fixed = repair_readiness(self.collection, batch_size)
+        if fixed:
+            self._invalidate([READY_FIELD])
+        print(f"Fixed the readiness of {fixed} pet(s).")
+        return fixed
+
+    def cache_stats(self) -> Optional[dict]:
+        """
+        Returns the counters of the query cache (entries, bytes, hits, misses, ...), or None without a cache.
+        """
+        return self.cache.stats() if self.cache is not None else None
+
+    @requires_connection()
+    def snapshot(self, batch_size: int = 10000):
+        """
+        Loads an in-memory columnar snapshot of the pets for local analytics (see snapshot.PetSnapshot);
+        call its `refresh()` later to fetch only the changes.
+
+        Args:
+            batch_size (int): Number of documents converted to columns at a time.
+
+        Returns:
+            PetSnapshot: The loaded snapshot.
+        """
+        from snapshot import PetSnapshot  # snapshot imports this module
+
+        pet_snapshot = PetSnapshot(self.collection, batch_size=batch_size).load()
+        print(f"Loaded a snapshot of {len(pet_snapshot)} pet(s) ({pet_snapshot.memory_usage() / 1024 ** 2:.1f} MB).")
+        return pet_snapshot
+
+    @staticmethod
+    def _build_pet_document(
+            pet_id: int,
+            name: str = None,
+            type: str = "Dog",
+            age: int = 0,
+            breed_primary: str = None,
+            breed_secondary: str = None,
+            gender: str = "Unknown",
+            colors: list = None,
+            maturity_size: str = "Unknown",
+            fur_length: str = "Unknown",
+            vaccinated: str = "Unknown",
+            dewormed: str = "Unknown",
+            sterilized: str = "Unknown",
+            health: str = "Unknown",
+            quantity: int = 1,
+            fee: int = 0,
+            rescuer_id: str = "",
+            rescue_date: Optional[datetime] = None,
+            description: str = None,
+            location: str = "Unknown",
+            adopted: bool = False,
+            adoption_date: Optional[datetime] = None,
+            adoption_period: str = "null",
+            days_in_shelter: Optional[int] = None
+    ) -> dict:
+        pet = {
+            "_id": pet_id,
+            "name": name,
+            "type": type,
+            "age": age,
+            "breed": {
+                "primary": breed_primary,
+                "secondary": breed_secondary
+            },
+            "gender": gender,
+            "colors": colors if colors else [],
+            "maturitySize": maturity_size,
+            "furLength": fur_length,
+            "medical": {
+                "vaccinated": vaccinated,
+                "dewormed": dewormed,
+                "sterilized": sterilized,
+                "health": health
+            },
+            "quantity": quantity,
+            "fee": fee,
+            "rescuerId": rescuer_id,
+            "rescueDate": rescue_date or datetime.today(),
+            "description": description,
+            "location": location,
+            "adoption": {"adopted": adopted} if adopted is False else {
+                "adopted": adopted,
+                "adoptionDate": adoption_date,
+                "adoptionPeriod": adoption_period,
+                "daysInShelter": days_in_shelter
+            },
+            "lastModified": datetime.now(timezone.utc)
+        }
+        pet[READY_FIELD] = is_ready(pet)
+        return pet
 
     # CRUD - Create
+    @requires_connection()
     def create_pet(
             self,
             name: str = None,
@@ -85,50 +633,25 @@ class PetAdoptionDatabase:
 
         Returns the inserted document or None on failure.
         """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return None
-
         try:
-            pet_data = {
-                "_id": self._get_next_sequence(),
-                "name": name,
-                "type": type,
-                "age": age,
-                "breed": {
-                    "primary": breed_primary,
-                    "secondary": breed_secondary
-                },
-                "gender": gender,
-                "colors": colors if colors else [],
-                "maturitySize": maturity_size,
-                "furLength": fur_length,
-                "medical": {
-                    "vaccinated": vaccinated,
-                    "dewormed": dewormed,
-                    "sterilized": sterilized,
-                    "health": health
-                },
-                "quantity": quantity,
-                "fee": fee,
-                "rescuerId": rescuer_id,
-                "rescueDate": rescue_date or datetime.today(),
-                "description": description,
-                "location": location,
-                "adoption": {"adopted": adopted} if adopted is False else {
-                    "adopted": adopted,
-                    "adoptionDate": adoption_date,
-                    "adoptionPeriod": adoption_period,
-                    "daysInShelter": days_in_shelter
-                }
-            }
+            pet_data = self._build_pet_document(
+                self._get_next_sequence(), name=name, type=type, age=age, breed_primary=breed_primary,
+                breed_secondary=breed_secondary, gender=gender, colors=colors, maturity_size=maturity_size,
+                fur_length=fur_length, vaccinated=vaccinated, dewormed=dewormed, sterilized=sterilized,
+                health=health, quantity=quantity, fee=fee, rescuer_id=rescuer_id, rescue_date=rescue_date,
+                description=description, location=location, adopted=adopted, adoption_date=adoption_date,
+                adoption_period=adoption_period, days_in_shelter=days_in_shelter
+            )
 
             result = self.collection.insert_one(pet_data)
             if result.inserted_id:
-                new_doc = self.collection.find_one({"_id": result.inserted_id})
+                self._index_descriptions([pet_data])
+                self._invalidate(inserted=[pet_data])
+                self._update_rollups([pet_data])
+                # The inserted document is exactly pet_data, no need to read it back
                 print("Document created:")
-                pprint.pprint(new_doc)
-                return new_doc
+                pprint.pprint(pet_data)
+                return pet_data
             else:
                 print("Failed to insert document.")
                 return None
@@ -137,17 +660,74 @@ class PetAdoptionDatabase:
             print(f"Error creating pet: {e}")
             return None
 
+    @requires_connection(list)
+    def create_pets(self, pets: Iterable, batch_size: int = 500) -> List[dict]:
+        """
+        Creates many pets at once.
+
+        Every pet is given as a dict (or a NamedTuple / dataclass) with the keyword arguments of `create_pet`;
+        missing attributes get the same defaults. Ids for all pets are reserved with a single counter update
+        and the documents are written with unordered insert_many calls of `batch_size` documents.
+        Documents are not read back.
+
+        Args:
+            pets (Iterable): Pet specifications.
+            batch_size (int): Number of documents per insert_many call.
+
+        Returns:
+            List[dict]: One result per given pet, in order: {"_id": int or None, "inserted": bool, "error": str or None}.
+        """
+        specs = pet_specs(pets)
+        results = [{"_id": None, "inserted": False, "error": None} for _ in specs]
+        if not specs:
+            return results
+
+        try:
+            ids = iter(self.id_allocator.reserve(len(specs)))
+        except Exception as e:
+            print(f"Error creating pets: {e}")
+            for result in results:
+                result["error"] = str(e)
+            return results
+
+        # (position in the input, document)
+        documents = []
+        for position, (spec, pet_id) in enumerate(zip(specs, ids)):
+            results[position]["_id"] = pet_id
+            try:
+                documents.append((position, self._build_pet_document(pet_id, **spec)))
+            except TypeError as e:
+                results[position]["error"] = str(e)
+
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            failed = {}
+            try:
+                self.collection.insert_many([doc for _, doc in batch], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+            except Exception as e:
+                failed = {index: str(e) for index in range(len(batch))}
+            record_inserts(results, batch, failed)
+
+        created_docs = [doc for position, doc in documents if results[position]["inserted"]]
+        self._index_descriptions(created_docs)
+        if created_docs:
+            self._invalidate(inserted=created_docs)
+            self._update_rollups(created_docs)
+        print(f"Created {len(created_docs)} of {len(results)} pet(s).")
+        return results
+
     # CRUD - Read
-    def read_pets(self, query: dict = {}) -> List[dict]:
+    @requires_connection(list)
+    def read_pets(self, query: dict = {}, projection: Optional[dict] = None, view: Optional[str] = None) -> List[dict]:
         """
         Returns a list of pet documents matching the given query.
         If no query is provided, returns all documents in the collection.
+        For large results use `iter_pets` or `page_pets` instead.
+        `view` selects a named projection from PET_VIEWS, e.g. "card".
         """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return []
-
-        results = list(self.collection.find(query))
+        results = list(self.collection.find(query, view_projection(view, projection)))
         if results:
             print(f"Found {len(results)} document(s):")
             for doc in results:
@@ -156,19 +736,125 @@ class PetAdoptionDatabase:
             print("No documents found.")
         return results
 
+    @requires_connection(lambda: iter(()))
+    def iter_pets(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                  batch_size: int = DEFAULT_BATCH_SIZE, sort: Optional[list] = None, view: Optional[str] = None,
+                  raw: bool = False) -> Iterator[dict]:
+        """
+        Streams the pet documents matching the given query, fetching `batch_size` documents per round trip,
+        so only one batch is held in memory at a time.
+
+        Args:
+            query (dict, optional): Filter; all pets if omitted.
+            projection (dict, optional): Fields to include or exclude, e.g. {"description": 0}.
+            batch_size (int): Number of documents fetched per round trip.
+            sort (list, optional): Sort specification, e.g. [("age", 1)].
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
+            raw (bool): Yield RawBSONDocument objects, which are not decoded until a field is accessed
+                (`.raw` gives the BSON bytes).
+
+        Yields:
+            dict: Pet documents.
+        """
+        collection = self.collection
+        if raw:
+            collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+        cursor = collection.find(query or {}, view_projection(view, projection), batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        with cursor:
+            yield from cursor
+
+    @requires_connection(lambda: iter(()))
+    def raw_batches(self, query: Optional[dict] = None, projection: Optional[dict] = None,
+                    batch_size: int = DEFAULT_BATCH_SIZE, sort: Optional[list] = None,
+                    view: Optional[str] = None) -> Iterator[bytes]:
+        """
+        Streams the pets matching the query as raw BSON, one `bytes` object per server batch
+        (the documents concatenated), without decoding anything. For callers that only pass the data on,
+        e.g. to a file or an HTTP response; `bson.decode_all(batch)` turns a batch into documents.
+
+        Args: as in `iter_pets`.
+        """
+        cursor = self.collection.find_raw_batches(query or {}, view_projection(view, projection),
+                                                  batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+        with cursor:
+            yield from cursor
+
+    @requires_connection(lambda: ([], None))
+    def page_pets(self, query: Optional[dict] = None, limit: int = 50, page_token: Optional[str] = None,
+                  projection: Optional[dict] = None, view: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        Returns one page of pets matching the query, ordered by _id (keyset pagination).
+
+        Unlike skip(), every page is a single seek on the _id index, however deep the page is.
+
+        Args:
+            query (dict, optional): Filter; all pets if omitted.
+            limit (int): Page size.
+            page_token (str, optional): Token returned with the previous page; None for the first page.
+            projection (dict, optional): Fields to include or exclude.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The page and the token of the next page (None after the last page).
+        """
+        query = query or {}
+        if page_token is not None:
+            query = {"$and": [query, {"_id": {"$gt": self._decode_page_token(page_token)}}]}
+
+        projection = view_projection(view, projection)
+        pets = list(self.collection.find(query, projection).sort("_id", pymongo.ASCENDING).limit(limit))
+        next_token = self._encode_page_token(pets[-1]["_id"]) if len(pets) == limit else None
+        return pets, next_token
+
+    @staticmethod
+    def _encode_page_token(last_id) -> str:
+        return base64.urlsafe_b64encode(json.dumps({"after": last_id}).encode()).decode()
+
+    @staticmethod
+    def _decode_page_token(page_token: str):
+        try:
+            return json.loads(base64.urlsafe_b64decode(page_token.encode()))["after"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError("Invalid page token.") from None
+
     # CRUD - Update
+    @requires_connection()
     def update_pet(self, query: dict, new_values: dict) -> Optional[dict]:
         """
         Updates a single pet document that matches the given query with the provided new values.
-        Returns the updated document if the update was successful, or None if no document was updated or found.
+        Returns the updated document if the update was successful, or None if no document was updated or found
+        (also when the pet already has these values).
+
+        Raises:
+            ValueError: When array index paths (e.g. "colors.0") are updated together with a readiness field,
+                see pet_update.
         """
-        if self.collection is None:
-            print("No connection to the collection.")
+        if not new_values:
+            print("No document updated.")
             return None
 
-        result = self.collection.update_one(query, {"$set": new_values})
-        if result.modified_count == 1:
-            updated_doc = self.collection.find_one(query)
+        update = pet_update(new_values)
+        query = changed_filter(query, new_values)
+        if any(field.split(".")[0] in ROLLUP_FIELDS for field in new_values):
+            # The counts of the old version have to be taken back: the update returns the old version and the new
+            # one is derived from it, so both come from the same atomic write
+            old_doc = self.collection.find_one_and_update(query, update)
+            updated_doc = applied_update(old_doc, new_values) if old_doc else None
+            if updated_doc:
+                self._update_rollups([updated_doc], removed=[old_doc])
+        else:
+            updated_doc = self.collection.find_one_and_update(
+                query,
+                update,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+        if updated_doc:
+            self._index_descriptions([updated_doc])
+            self._invalidate(new_values, [updated_doc["_id"]])
             print("Document updated:")
             pprint.pprint(updated_doc)
             return updated_doc
@@ -177,17 +863,18 @@ class PetAdoptionDatabase:
             return None
 
     # CRUD - Delete
+    @requires_connection()
     def delete_pet(self, query: dict) -> Optional[dict]:
         """
         Deletes a single pet document that matches the given query.
         Returns the deleted document if found and deleted, or None if no match was found.
         """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return None
-
         deleted_doc = self.collection.find_one_and_delete(query)
         if deleted_doc:
+            if self._description_index is not None:
+                self._description_index.remove(deleted_doc["_id"])
+            self._invalidate(pet_ids=[deleted_doc["_id"]])
+            self._update_rollups(removed=[deleted_doc])
             print("Document deleted:")
             pprint.pprint(deleted_doc)
             return deleted_doc
@@ -195,26 +882,10 @@ class PetAdoptionDatabase:
             print("No matching document found to delete.")
             return None
 
-    def find_pets_for_adoption(self, pet_type: str = "any", max_age: int = -1, max_fee: int = -1,
-                               location: str = 'any', maturity_size: str = 'any', fur_length: str = 'any') -> list:
-        """
-        Returns a list of pets that are available for adoption, filtered by optional criteria.
-
-        Args:
-            pet_type (str): Type of pet to search for (e.g., 'Dog', 'Cat'). Use 'any' to ignore this filter.
-            max_age (int): Maximum age in months. Use -1 to ignore this filter.
-            max_fee (int): Maximum adoption fee. Use -1 to ignore this filter.
-            location (str): Location of the pet. Use 'any' to search across all locations.
-            maturity_size (str): Maturity size of the pet. Use 'any' to ignore this filter.
-            fur_length (str): Length of the pet's fur. Use 'any' to ignore this filter.
-
-        Returns:
-            list: A list of matching pet documents, or an empty list if none found.
-    """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return []
-
+    @staticmethod
+    def adoption_search_query(pet_type: str = "any", max_age: int = -1, max_fee: int = -1, location: str = 'any',
+                              maturity_size: str = 'any', fur_length: str = 'any') -> dict:
+        # Filter used by find_pets_for_adoption / iter_pets_for_adoption
         query = {"adoption.adopted": False}
 
         if pet_type.lower() != "any":
@@ -235,7 +906,35 @@ class PetAdoptionDatabase:
         if fur_length.lower() != "any":
             query["furLength"] = fur_length
 
-        available_pets = list(self.collection.find(query))
+        return query
+
+    @requires_connection(list)
+    def find_pets_for_adoption(self, pet_type: str = "any", max_age: int = -1, max_fee: int = -1,
+                               location: str = 'any', maturity_size: str = 'any', fur_length: str = 'any',
+                               projection: Optional[dict] = None, view: Optional[str] = None) -> list:
+        """
+        Returns a list of pets that are available for adoption, filtered by optional criteria.
+
+        Args:
+            pet_type (str): Type of pet to search for (e.g., 'Dog', 'Cat'). Use 'any' to ignore this filter.
+            max_age (int): Maximum age in months. Use -1 to ignore this filter.
+            max_fee (int): Maximum adoption fee. Use -1 to ignore this filter.
+            location (str): Location of the pet. Use 'any' to search across all locations.
+            maturity_size (str): Maturity size of the pet. Use 'any' to ignore this filter.
+            fur_length (str): Length of the pet's fur. Use 'any' to ignore this filter.
+            projection (dict, optional): Fields to include or exclude, e.g. {"description": 0}.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
+
+        Returns:
+            list: A list of matching pet documents, or an empty list if none found.
+    """
+        projection = view_projection(view, projection)
+        query = self.adoption_search_query(pet_type, max_age, max_fee, location, maturity_size, fur_length)
+        available_pets = self._cached(
+            make_key("find_pets_for_adoption", query, projection),
+            lambda: list(self.collection.find(query, projection)),
+            query_fields(query), projected_fields(projection), query=query
+        )
         if available_pets:
             print(f"Found {len(available_pets)} available pets.")
             return available_pets
@@ -243,30 +942,107 @@ class PetAdoptionDatabase:
             print("No available pets found.")
             return []
 
-    def find_pets_by_description(self, keywords: list[str]) -> list:
+    def iter_pets_for_adoption(self, pet_type: str = "any", max_age: int = -1, max_fee: int = -1,
+                               location: str = 'any', maturity_size: str = 'any', fur_length: str = 'any',
+                               projection: Optional[dict] = None,
+                               batch_size: int = DEFAULT_BATCH_SIZE, view: Optional[str] = None,
+                               raw: bool = False) -> Iterator[dict]:
+        """
+        Streaming version of `find_pets_for_adoption` (same filters), see `iter_pets`.
+        """
+        query = self.adoption_search_query(pet_type, max_age, max_fee, location, maturity_size, fur_length)
+        return self.iter_pets(query, projection, batch_size, view=view, raw=raw)
+
+    @requires_connection()
+    def description_index(self, rebuild: bool = False) -> Optional[DescriptionIndex]:
         """
-        Returns a list of pets available for adoption whose descriptions contain any of the provided keywords.
+        Returns the full-text index of pet descriptions, built from the collection on first use.
+
+        Every later call first reads the pets created or changed since the previous one (new _id or newer
+        'lastModified', see DescriptionIndex.refresh_filter), so writes of other handlers and processes are found
+        too. Pets deleted elsewhere are dropped from the results when they are not found; pass `rebuild=True`
+        to build the index again.
+        """
+        return self._refreshed_description_index(rebuild)
+
+    def _refreshed_description_index(self, rebuild: bool = False) -> DescriptionIndex:
+        # description_index without the connection handling, for the search methods: a ConnectionFailure
+        # reaches their own requires_connection, which returns their default
+        if self._description_index is None or rebuild:
+            index = DescriptionIndex()
+            with self.collection.find({}, INDEX_PROJECTION, batch_size=5000) as cursor:
+                index.add_pets(cursor)
+            self._description_index = index
+            print(f"Indexed descriptions of {len(index)} pets.")
+        else:
+            with self.collection.find(self._description_index.refresh_filter(), INDEX_PROJECTION) as cursor:
+                self._description_index.add_pets(cursor)
+        return self._description_index
+
+    def _index_descriptions(self, pets: Iterable[dict]):
+        # Keeps a built description index in line with created / updated documents
+        if self._description_index is None:
+            return
+        for pet in pets:
+            self._description_index.add(pet["_id"], pet.get("description"),
+                                        not pet.get("adoption", {}).get("adopted"))
+
+    @staticmethod
+    def description_search_terms(keywords: list[str]) -> list:
+        # Every keyword matches words starting with it; keywords of several words match as a phrase
+        terms = []
+        for keyword in keywords:
+            words = tokenize(keyword)
+            if len(words) == 1:
+                terms.append(("prefix", words[0]))
+            elif words:
+                terms.append(("phrase", words))
+        return terms
+
+    def _ranked_pets(self, ranked_ids: list, projection: Optional[dict] = None,
+                     batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+        # Fetches the pets with the given ids ($in per batch) and yields them in the given order.
+        # Pets adopted or deleted in the meantime (also by other processes) are skipped and no longer offered
+        # by the description index.
+        projection = dict(projection) if projection else None
+        hide_id = projection is not None and projection.pop("_id", 1) in (0, False)
+        for start in range(0, len(ranked_ids), batch_size):
+            ids = ranked_ids[start:start + batch_size]
+            found = {pet["_id"]: pet for pet in self.collection.find(
+                {"_id": {"$in": ids}, "adoption.adopted": False}, projection or None)}
+            for pet_id in ids:
+                pet = found.get(pet_id)
+                if pet is None:
+                    if self._description_index is not None:
+                        self._description_index.set_available(pet_id, False)
+                    continue
+                if hide_id:
+                    del pet["_id"]
+                yield pet
+
+    @requires_connection(list)
+    def find_pets_by_description(self, keywords: list[str], projection: Optional[dict] = None,
+                                 limit: Optional[int] = None, view: Optional[str] = None) -> list:
+        """
+        Returns a list of pets available for adoption whose descriptions contain any of the provided keywords,
+        best matches first.
+
+        Matching ignores case and diacritics ("lodz" finds "Łódź"); a keyword matches every word starting with it
+        ("child" finds "children"), a keyword of several words matches them as a phrase.
 
         Args:
             keywords (list[str]): A list of words or phrases to search for in the 'description' field.
+            projection (dict, optional): Fields to include or exclude.
+            limit (int, optional): Maximum number of pets to return.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
 
         Returns:
             list: A list of matching pet documents, or an empty list if none found.
         """
 
-        if self.collection is None:
-            print("No connection to the collection.")
-            return []
-
-        # Creating regex for keywords
-        conditions = [{"description": {"$regex": word, "$options": "i"}} for word in keywords]
-
-        query = {
-            "adoption.adopted": False,
-            "$or": conditions
-        }
-
-        pets = list(self.collection.find(query))
+        projection = view_projection(view, projection)
+        ranked = self._refreshed_description_index().search(self.description_search_terms(keywords), limit)
+        pets = list(self._ranked_pets([pet_id for pet_id, _ in ranked], projection, batch_size=len(ranked) or 1))
 
         if pets:
             print(f"Found {len(pets)} matching pets:")
@@ -275,7 +1051,47 @@ class PetAdoptionDatabase:
             print("No available pets found.")
             return []
 
-    def get_pets_by_age(self, order: str, n: int = 1, adopted: Optional[bool] = None) -> List[dict]:
+    @requires_connection(lambda: iter(()))
+    def iter_pets_by_description(self, keywords: list[str], projection: Optional[dict] = None,
+                                 batch_size: int = DEFAULT_BATCH_SIZE, view: Optional[str] = None) -> Iterator[dict]:
+        """
+        Streaming version of `find_pets_by_description` (best matches first), see `iter_pets`.
+        """
+        projection = view_projection(view, projection)
+        ranked = self._refreshed_description_index().search(self.description_search_terms(keywords))
+        yield from self._ranked_pets([pet_id for pet_id, _ in ranked], projection, batch_size)
+
+    @requires_connection(list)
+    def search_pets(self, query: str, limit: int = 20, projection: Optional[dict] = None,
+                    view: Optional[str] = None) -> List[dict]:
+        """
+        Full-text search in the descriptions of pets available for adoption, best matches first.
+
+        Args:
+            query (str): Words, "exact phrases" and prefix* terms, e.g. '"good with children" playful cat*'.
+                A pet matches if it matches any of them; case and diacritics are ignored.
+            limit (int): Maximum number of pets to return.
+            projection (dict, optional): Fields to include or exclude.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
+
+        Returns:
+            List[dict]: Matching pet documents, each with its relevance in 'score'.
+        """
+        projection = view_projection(view, projection)
+        ranked = self._refreshed_description_index().search(query, limit)
+        scores = dict(ranked)
+        pets = []
+        for pet in self._ranked_pets(list(scores), projection, batch_size=len(scores) or 1):
+            if "_id" in pet:
+                pet["score"] = round(scores[pet["_id"]], 4)
+            pets.append(pet)
+
+        print(f"Found {len(pets)} pet(s) matching '{query}'.")
+        return pets
+
+    @requires_connection(list)
+    def get_pets_by_age(self, order: str, n: int = 1, adopted: Optional[bool] = None,
+                        projection: Optional[dict] = None, view: Optional[str] = None) -> List[dict]:
         """
         Returns a list of n pets with the lowest or highest age, depending on the order.
 
@@ -286,6 +1102,8 @@ class PetAdoptionDatabase:
                 - True: only return adopted pets,
                 - False: only return not adopted pets,
                 - None: include all pets regardless of adoption status.
+            projection (dict, optional): Fields to include or exclude.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
 
         Returns:
             List[dict]: A list of pet documents sorted by age.
@@ -295,10 +1113,6 @@ class PetAdoptionDatabase:
         if order not in allowed_orders:
             raise ValueError(f"The 'order' argument must be one of: {allowed_orders}")
 
-        if self.collection is None:
-            print("No connection to the collection.")
-            return []
-
         sort_order = 1 if order == "youngest" else -1
 
         query = {}
@@ -307,7 +1121,7 @@ class PetAdoptionDatabase:
         elif adopted is False:
             query["adoption.adopted"] = False
 
-        pets = list(self.collection.find(query).sort("age", sort_order).limit(n))
+        pets = list(self.collection.find(query, view_projection(view, projection)).sort("age", sort_order).limit(n))
 
         if pets:
             print(f"Found {len(pets)} pets ({order})", end='')
@@ -324,12 +1138,15 @@ class PetAdoptionDatabase:
 
         return pets
 
+    @requires_connection(list)
     def get_pets_by_shelter_stay(
             self,
             stay_type: str,
             n: int = 1,
             threshold_months: Optional[int] = None,
-            comparison: Optional[str] = None
+            comparison: Optional[str] = None,
+            projection: Optional[dict] = None,
+            view: Optional[str] = None
     ) -> List[dict]:
         """
         Returns a list of pets filtered and sorted by their duration in the shelter.
@@ -342,6 +1159,8 @@ class PetAdoptionDatabase:
                 "longer" — include pets that stayed longer than the threshold.
                 "shorter" — include pets that stayed shorter than the threshold.
                 None — no threshold filtering applied.
+            projection (dict, optional): Fields to include or exclude.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
 
         Returns:
             List[dict]: List of pet documents sorted by shelter stay duration.
@@ -354,10 +1173,6 @@ class PetAdoptionDatabase:
         if comparison not in allowed_comparisons:
             raise ValueError(f"'comparison' must be one of {allowed_comparisons}")
 
-        if self.collection is None:
-            print("No connection to the collection.")
-            return []
-
         sort_order = -1 if stay_type == "longest" else 1
 
         query = {"adoption.daysInShelter": {"$exists": True, "$ne": None}}
@@ -369,7 +1184,8 @@ class PetAdoptionDatabase:
             else:  # comparison == "shorter"
                 query["adoption.daysInShelter"]["$lt"] = threshold_days
 
-        pets = list(self.collection.find(query).sort("adoption.daysInShelter", sort_order).limit(n))
+        projection = view_projection(view, projection)
+        pets = list(self.collection.find(query, projection).sort("adoption.daysInShelter", sort_order).limit(n))
 
         if pets:
             print(f"Found {len(pets)} pet(s) sorted by {stay_type} stay in shelter.")
@@ -386,7 +1202,11 @@ class PetAdoptionDatabase:
 
         return pets
 
-    def pets_ready_for_adoption(self) -> List[dict]:
+    # Python version of the readiness rule, for documents without the stored flag
+    is_ready = staticmethod(is_ready)
+
+    @requires_connection(list)
+    def pets_ready_for_adoption(self, projection: Optional[dict] = None, view: Optional[str] = None) -> List[dict]:
         """
         Returns a list of pets that are ready for adoption.
 
@@ -397,23 +1217,23 @@ class PetAdoptionDatabase:
         - Sterilized
         - Dewormed
 
+        The criteria are stored as the 'readyForAdoption' flag, so the query is a single seek on the partial
+        'ready_id' index; with the projection {"_id": 1} it is answered from the index alone.
+
+        Args:
+            projection (dict, optional): Fields to include or exclude.
+            view (str, optional): Named projection from PET_VIEWS ("card", "list", "full"), instead of `projection`.
+
         Returns:
             List[dict]: List of pets matching the criteria.
         """
 
-        if self.collection is None:
-            print("No connection to the collection.")
-            return []
-
-        query = {
-            "adoption.adopted": False,
-            "medical.vaccinated": "Yes",
-            "medical.health": {"$in": ["Healthy", "Minor Injury"]},
-            "medical.sterilized": "Yes",
-            "medical.dewormed": "Yes"
-        }
-
-        pets = list(self.collection.find(query))
+        projection = view_projection(view, projection)
+        pets = self._cached(
+            make_key("pets_ready_for_adoption", projection),
+            lambda: list(self.collection.find(READY_FOR_ADOPTION_QUERY, projection)),
+            query_fields(READY_FOR_ADOPTION_QUERY), projected_fields(projection), query=READY_FOR_ADOPTION_QUERY
+        )
 
         if pets:
             print(f"Found {len(pets)} pet(s) ready for adoption:")
@@ -422,6 +1242,15 @@ class PetAdoptionDatabase:
 
         return pets
 
+    def iter_pets_ready_for_adoption(self, projection: Optional[dict] = None,
+                                     batch_size: int = DEFAULT_BATCH_SIZE, view: Optional[str] = None,
+                                     raw: bool = False) -> Iterator[dict]:
+        """
+        Streaming version of `pets_ready_for_adoption`, see `iter_pets`.
+        """
+        return self.iter_pets(READY_FOR_ADOPTION_QUERY, projection, batch_size, view=view, raw=raw)
+
+    @requires_connection()
     def is_ready_for_adoption(self, pet_id: int) -> Optional[bool]:
         """
         Checks if the pet with the given ID is ready for adoption.
@@ -442,33 +1271,18 @@ class PetAdoptionDatabase:
                 - False if not ready
                 - None if pet not found or connection error
         """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return None
-
         try:
-            pet = self.collection.find_one({"_id": pet_id})
-
-            if pet is None:
+            # Ready pets are found in the partial 'ready_id' index alone (covered query); only a pet that is
+            # not there needs the _id lookup telling "not ready" from "not found", answered by the _id index
+            is_ready = self.collection.find_one({**READY_FOR_ADOPTION_QUERY, "_id": pet_id}, {"_id": 1}) is not None
+            if not is_ready and self.collection.find_one({"_id": pet_id}, {"_id": 1}) is None:
                 print(f"No pet found with id {pet_id}")
                 return None
 
-            name = pet.get("name") or "Unnamed"
-            adoption = pet.get("adoption", {})
-            medical = pet.get("medical", {})
-
-            is_ready = (
-                    adoption.get("adopted") is False and
-                    medical.get("vaccinated") == "Yes" and
-                    medical.get("dewormed") == "Yes" and
-                    medical.get("sterilized") == "Yes" and
-                    medical.get("health") in ["Healthy", "Minor Injury"]
-            )
-
             if is_ready:
-                print(f"Pet '{name}' (id: {pet_id}) is READY for adoption.")
+                print(f"Pet (id: {pet_id}) is READY for adoption.")
             else:
-                print(f"Pet '{name}' (id: {pet_id}) is NOT ready for adoption.")
+                print(f"Pet (id: {pet_id}) is NOT ready for adoption.")
 
             return is_ready
 
@@ -476,6 +1290,7 @@ class PetAdoptionDatabase:
             print(f"Error checking adoption readiness: {e}")
             return None
 
+    @requires_connection()
     def prepare_pet_for_adoption(self, pet_id: int) -> Optional[dict]:
         """
         Prepares a pet for adoption by updating its medical status:
@@ -485,61 +1300,34 @@ class PetAdoptionDatabase:
             - "Unknown" or "Serious Injury" -
                 60% chance of becoming "Healthy", 40% chance of changing to "Minor Injury"
 
+        The health roll happens on the server, in a single atomic update.
+
         Args:
             pet_id (int): The _id of the pet.
 
         Returns:
             Optional[dict]: The updated pet document if successful, or None on error.
         """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return None
-
         try:
-            pet = self.collection.find_one({"_id": pet_id})
-            if pet is None:
-                print(f"No pet found with id {pet_id}")
-                return None
-
-            name = pet.get("name") or "Unnamed"
-            medical = pet.get("medical", {})
-            current_health = medical.get("health")
-
-            if current_health == "Minor Injury":
-                new_health = "Healthy" if random.random() < 0.6 else "Minor Injury"
-            elif current_health in ["Unknown", "Serious Injury"]:
-                roll = random.random()
-                if roll < 0.6:
-                    new_health = "Healthy"
-                else:
-                    new_health = "Minor Injury"
-            else:
-                new_health = current_health
-
-            update_result = self.collection.update_one(
+            updated_pet = self.collection.find_one_and_update(
                 {"_id": pet_id},
-                {
-                    "$set": {
-                        "medical.vaccinated": "Yes",
-                        "medical.dewormed": "Yes",
-                        "medical.sterilized": "Yes",
-                        "medical.health": new_health
-                    }
-                }
+                PREPARE_FOR_ADOPTION_PIPELINE,
+                return_document=pymongo.ReturnDocument.AFTER
             )
+            if updated_pet is None:
+                print(f"No pet found with id {pet_id}")
+                return None
 
-            if update_result.modified_count > 0:
-                updated_pet = self.collection.find_one({"_id": pet_id})
-                print(f"Pet '{name}' (id: {pet_id}) has been prepared for adoption.")
-                return updated_pet
-            else:
-                print(f"Pet with id: {pet_id} not modified or found.")
-                return pet
+            self._invalidate(["medical"], [pet_id])
+            name = updated_pet.get("name") or "Unnamed"
+            print(f"Pet '{name}' (id: {pet_id}) has been prepared for adoption.")
+            return updated_pet
 
         except Exception as e:
             print(f"Error preparing pet for adoption: {e}")
             return None
 
+    @requires_connection(dict)
     def adopt_pet(self, pet_id: int) -> dict:
         """
         Marks the pet as adopted by updating the adoption fields:
@@ -548,6 +1336,9 @@ class PetAdoptionDatabase:
         - Calculates daysInShelter from rescueDate
         - Sets adoptionPeriod based on daysInShelter
 
+        The update only applies to a pet that is not adopted yet and is computed on the server,
+        so two concurrent adoptions of the same pet cannot both succeed.
+
         Args:
             pet_id (int): The _id of the pet to adopt.
 
@@ -555,37 +1346,26 @@ class PetAdoptionDatabase:
             dict: Updated pet document if successful, empty dict otherwise.
         """
 
-        if self.collection is None:
-            print("No connection to the collection.")
-            return {}
-
         try:
-            pet = self.collection.find_one({"_id": pet_id})
-            if pet is None:
-                print(f"No pet found with id {pet_id}")
-                return {}
+            adopted_pet = self.collection.find_one_and_update(
+                {"_id": pet_id, "adoption.adopted": False},
+                adoption_pipeline(datetime.today()),
+                return_document=pymongo.ReturnDocument.AFTER
+            )
 
-            if pet.get("adoption", {}).get("adopted", False):
-                print(f"Pet with id {pet_id} is already adopted.")
+            if adopted_pet is None:
+                # Only a failed adoption needs a second look to tell why
+                if self.collection.find_one({"_id": pet_id}, {"_id": 1}) is None:
+                    print(f"No pet found with id {pet_id}")
+                else:
+                    print(f"Pet with id {pet_id} is already adopted.")
                 return {}
 
-            # Update the pet's adoption status
-            today = datetime.today().date()
-            rescue_date = pet.get("rescueDate").date()
-            days_in_shelter = (today - rescue_date).days
-
-            self.collection.update_one(
-                {"_id": pet_id},
-                {"$set": {
-                    "adoption.adopted": True,
-                    "adoption.adoptionDate": datetime.today(),
-                    "adoption.adoptionPeriod": self.return_period(days_in_shelter),
-                    "adoption.daysInShelter": days_in_shelter
-                }
-                }
-            )
-
-            adopted_pet = self.collection.find_one({"_id": pet_id})
+            if self._description_index is not None:
+                self._description_index.set_available(pet_id, False)
+            self._invalidate(["adoption"], [pet_id])
+            # Before the adoption the pet only counted as rescued
+            self._update_rollups([adopted_pet], removed=[{**adopted_pet, "adoption": {"adopted": False}}])
             print(f"You adopted pet {adopted_pet.get('name')} (id: {adopted_pet.get('_id')})!!!")
             return adopted_pet
 
@@ -593,31 +1373,153 @@ class PetAdoptionDatabase:
             print(f"Error during adoption process: {e}")
             return {}
 
-    def get_pet_of_the_day(self) -> Optional[dict]:
+    def _adoption_states(self, pet_ids: list, projection: dict = None) -> dict:
+        # Fetches the given pets with one $in query: id -> document (with 'adoption.adopted' and the projection)
+        projection = {"adoption.adopted": 1, **(projection or {})}
+        return {pet["_id"]: pet for pet in self.collection.find({"_id": {"$in": pet_ids}}, projection)}
+
+    @requires_connection(dict)
+    def adopt_pets(self, pet_ids: Iterable[int]) -> dict:
+        """
+        Adopts many pets at once, with the same rules as `adopt_pet`.
+
+        Uses one $in query to find the pets and one update for all pets that can be adopted.
+
+        Args:
+            pet_ids (Iterable[int]): The _ids of the pets to adopt.
+
+        Returns:
+            dict: Pet id -> "adopted", "already_adopted" or "missing" (empty dict if no connection).
+        """
+        pet_ids = list(dict.fromkeys(pet_ids))
+        pets = self._adoption_states(pet_ids, {"location": 1})
+        results = adoption_statuses(pet_ids, pets, "adopted")
+
+        eligible = [pet_id for pet_id, status in results.items() if status == "adopted"]
+        if eligible:
+            # Mongo keeps milliseconds, the date has to match exactly when we look for our own adoptions
+            now = datetime.today()
+            now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            update = self.collection.update_many(
+                {"_id": {"$in": eligible}, "adoption.adopted": False},
+                adoption_pipeline(now)
+            )
+            if update.modified_count < len(eligible):
+                # Some pets were adopted by someone else in the meantime
+                ours = {pet["_id"] for pet in self.collection.find(
+                    {"_id": {"$in": eligible}, "adoption.adoptionDate": now}, {"_id": 1})}
+                for pet_id in eligible:
+                    if pet_id not in ours:
+                        results[pet_id] = "already_adopted"
+
+        if self._description_index is not None:
+            for pet_id, status in results.items():
+                if status != "missing":
+                    self._description_index.set_available(pet_id, False)
+
+        adopted = [pet_id for pet_id, status in results.items() if status == "adopted"]
+        if adopted:
+            self._invalidate(["adoption"], adopted)
+            self._update_rollups(adopted_rollup_docs(pets, adopted, now))
+        print(f"Adopted {len(adopted)} of {len(results)} pet(s).")
+        return results
+
+    @requires_connection(dict)
+    def prepare_pets_for_adoption(self, pet_ids: Iterable[int]) -> dict:
+        """
+        Prepares many pets for adoption at once, with the same medical update as `prepare_pet_for_adoption`
+        (the health roll is made separately for every pet). Pets that are already adopted are skipped.
+
+        Uses one $in query to find the pets and one update for all pets to prepare. When the update matches fewer
+        pets than were found, the pets are read again, so those adopted or deleted in between are reported as such.
+
+        Args:
+            pet_ids (Iterable[int]): The _ids of the pets to prepare.
+
+        Returns:
+            dict: Pet id -> "prepared", "already_adopted" or "missing" (empty dict if no connection).
+        """
+        pet_ids = list(dict.fromkeys(pet_ids))
+        pets = self._adoption_states(pet_ids)
+        results = adoption_statuses(pet_ids, pets, "prepared")
+
+        eligible = [pet_id for pet_id, status in results.items() if status == "prepared"]
+        if eligible:
+            result = self.collection.update_many(
+                {"_id": {"$in": eligible}, "adoption.adopted": False},
+                PREPARE_FOR_ADOPTION_PIPELINE
+            )
+            self._invalidate(["medical"], eligible)
+            if result.matched_count < len(eligible):
+                # Some pets were adopted or deleted between the read and the update
+                results.update(adoption_statuses(eligible, self._adoption_states(eligible), "prepared"))
+
+        prepared = sum(status == "prepared" for status in results.values())
+        print(f"Prepared {prepared} of {len(results)} pet(s) for adoption.")
+        return results
+
+    @requires_connection(dict)
+    def readiness_of(self, pet_ids: Iterable[int]) -> dict:
+        """
+        Checks many pets at once with the same rules as `is_ready_for_adoption`. The ready pets are found
+        with one $in query answered from the 'ready_id' index alone; only the others are read to tell
+        adopted pets from missing ones.
+
+        Args:
+            pet_ids (Iterable[int]): The _ids of the pets to check.
+
+        Returns:
+            dict: Pet id -> "ready", "not_ready", "already_adopted" or "missing" (empty dict if no connection).
+        """
+        pet_ids = list(dict.fromkeys(pet_ids))
+        ready_ids = {pet["_id"] for pet in self.collection.find(
+            {**READY_FOR_ADOPTION_QUERY, "_id": {"$in": pet_ids}}, {"_id": 1})}
+        pets = self._adoption_states([pet_id for pet_id in pet_ids if pet_id not in ready_ids])
+
+        results = {}
+        for pet_id in pet_ids:
+            pet = pets.get(pet_id)
+            if pet_id in ready_ids:
+                results[pet_id] = "ready"
+            elif pet is None:
+                results[pet_id] = "missing"
+            elif pet.get("adoption", {}).get("adopted"):
+                results[pet_id] = "already_adopted"
+            else:
+                results[pet_id] = "not_ready"
+
+        ready = sum(status == "ready" for status in results.values())
+        print(f"{ready} of {len(results)} pet(s) ready for adoption.")
+        return results
+
+    @requires_connection()
+    def get_pet_of_the_day(self, unadopted_only: bool = False, shared_cache: bool = False) -> Optional[dict]:
         """
         Returns the "Pet of the Day" based on the current date.
         Uses a hash of today's date to select a pseudo-random pet consistently for the day.
 
+        The hash picks an id between 1 and the largest existing id (not the id counter: ids reserved in blocks and
+        never used would leave a gap above the last pet and favour the pet with the lowest id); the pet of the day
+        is the first pet with an id greater or equal to it (or the first pet at all, when the ids above it were
+        deleted), found with a single index seek. The choice and the largest id are remembered for the rest
+        of the day.
+
+        Args:
+            unadopted_only (bool): Choose only among pets that are not adopted yet.
+            shared_cache (bool): Store the choice in the 'dailyCache' collection, so that all handlers
+                (processes) show the same pet for the whole day, even if pets are added or adopted in the meantime.
+
         Returns:
             dict or None: The selected pet document or None if no pets available or error occurs.
         """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return None
-
-        # Get total count of pets
-        count = self.collection.count_documents({})
-        if count == 0:
-            print("No pets available.")
-            return None
-
-        # Index based on date
         today = datetime.now().date().isoformat()  # e.g., '2025-06-10'
-        hash_value = int(hashlib.sha256(today.encode()).hexdigest(), 16)
-        index = hash_value % count
+        key = (today, unadopted_only)
+        pet_of_the_day = self._pets_of_the_day.get(key)
 
-        pet = self.collection.find().skip(index).limit(1)
-        pet_of_the_day = next(pet, None)
+        if pet_of_the_day is None:
+            pet_of_the_day = self._choose_pet_of_the_day(today, unadopted_only, shared_cache)
+            if pet_of_the_day is not None:
+                self._pets_of_the_day = remember_pet_of_the_day(self._pets_of_the_day, key, pet_of_the_day)
 
         if pet_of_the_day:
             print("Pet of the Day:")
@@ -626,6 +1528,47 @@ class PetAdoptionDatabase:
             print("Failed to retrieve Pet of the Day.")
         return pet_of_the_day
 
+    def _choose_pet_of_the_day(self, today: str, unadopted_only: bool, shared_cache: bool) -> Optional[dict]:
+        cache_id = pet_of_the_day_cache_id(today, unadopted_only)
+
+        if shared_cache:
+            cached = self.db.dailyCache.find_one({"_id": cache_id})
+            if cached:
+                pet = self.collection.find_one({**pet_of_the_day_query(unadopted_only), "_id": cached["petId"]})
+                if pet is not None:
+                    return pet
+
+        if self._largest_pet_id is None or self._largest_pet_id[0] != today:
+            last_pet = self.collection.find_one({}, {"_id": 1}, sort=[("_id", pymongo.DESCENDING)])
+            if last_pet is None:
+                print("No pets available.")
+                return None
+            self._largest_pet_id = (today, last_pet["_id"])
+
+        # Id based on date, see pet_of_the_day_candidates
+        pet = None
+        for query in pet_of_the_day_candidates(today, unadopted_only, self._largest_pet_id[1]):
+            pet = self.collection.find_one(query, sort=[("_id", pymongo.ASCENDING)])
+            if pet is not None:
+                break
+        if pet is None:
+            print("No pets available.")
+            return None
+
+        if shared_cache:
+            # The first handler to store its choice wins, the others use the stored one
+            cached = self.db.dailyCache.find_one_and_update(
+                {"_id": cache_id},
+                daily_cache_update(today, pet["_id"]),
+                upsert=True,
+                return_document=pymongo.ReturnDocument.AFTER
+            )
+            if cached["petId"] != pet["_id"]:
+                pet = self.collection.find_one({"_id": cached["petId"]}) or pet
+
+        return pet
+
+    @requires_connection()
     def adoption_rescue_stats(
             self,
             adopted: bool = True,
@@ -652,77 +1595,100 @@ class PetAdoptionDatabase:
 
         Returns:
             dict or None: Statistics dictionary or None if no connection.
-        """
-        if self.collection is None:
-            print("No connection to the collection.")
-            return None
 
+        With `use_rollups` (the default) the counts come from the daily rollups, so the cost depends on the number
+        of days and cities rather than on the number of pets. Rollups marked stale by a failed update are rebuilt
+        first (see `_update_rollups`).
+        """
         # Time range
-        today = datetime.today()
-        if month == 0 and year == 0:
-            year, month = today.year, today.month
-            start = datetime(year, month, 1)
-            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
-        elif month == 0 and year != 0:
-            start = datetime(year, 1, 1)
-            end = datetime(year + 1, 1, 1)
-        elif month != 0 and year != 0:
-            start = datetime(year, month, 1)
-            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
-        else:
+        period = stats_period(month, year)
+        if period is None:
             print("When month specified, year should be also specified!")
             return None
+        start, end = period
 
         # City filter
-        if isinstance(city, str) and city.lower() == 'all':
-            city_filter = {}
-        elif isinstance(city, list):
-            city_filter = {"location": {"$in": city}}
-        else:
-            city_filter = {"location": city}
+        city_filter = location_filter(city)
+        matches = stats_matches(adopted, rescued, city_filter, start, end)
+
+        def compute():
+            results = {}
+
+            if self.use_rollups:
+                # Daily counts per location, maintained by every write of this handler
+                self._ensure_current_rollups()
+                cities = None if not city_filter else [city] if isinstance(city, str) else list(city)
+                for field, include in (("adopted", adopted), ("rescued", rescued)):
+                    if include:
+                        results[field] = rollup_counts(self.rollups, field, start, end, cities, mode, limit, order)
+                return results
+
+            # Adopted pets
+            if adopted:
+                adopted_match = matches["adopted"]
+
+                if mode == "sum":
+                    count = self.collection.count_documents(adopted_match)
+                    results["adopted"] = count
+                else:  # groupby
+                    pipeline = location_stats_pipeline(adopted_match, order, limit)
+                    result = self.collection.aggregate(pipeline)
+                    results["adopted"] = {doc["_id"]: doc["count"] for doc in result}
+
+            # Rescued pets
+            if rescued:
+                rescued_match = matches["rescued"]
+
+                if mode == "sum":
+                    count = self.collection.count_documents(rescued_match)
+                    results["rescued"] = count
+                else:  # groupby
+                    pipeline = location_stats_pipeline(rescued_match, order, limit)
+                    result = self.collection.aggregate(pipeline)
+                    results["rescued"] = {doc["_id"]: doc["count"] for doc in result}
+
+            return results
+
+        # The order of the cities does not matter
+        cities = sorted(city) if isinstance(city, list) else city_filter
+        key = make_key("adoption_rescue_stats", adopted, rescued, cities, start, end, mode, limit, order)
+        return self._cached(key, compute, STATS_FIELDS, by_pet=False, query={"$or": list(matches.values())})
+
+    @requires_connection()
+    def adoption_rescue_timeseries(
+            self,
+            start: datetime,
+            end: datetime,
+            granularity: str = "month",
+            city='all'
+    ) -> Optional[dict]:
+        """
+        Returns adoption and rescue statistics per period and location, computed in a single aggregation.
 
-        results = {}
+        Every row (period, location) has the number of adopted and rescued pets, the median daysInShelter
+        of the adopted ones and the number of adoptions per adoptionPeriod.
 
-        # Aggregation pipeline
-        def build_pipeline(match_stage):
-            pipeline = [
-                {"$match": match_stage},
-                {"$group": {"_id": "$location", "count": {"$sum": 1}}},
-                {"$sort": {"count": order}}
-            ]
-            if limit > 0:
-                pipeline.append({"$limit": limit})
-            return pipeline
+        Args:
+            start (datetime): Start of the range (inclusive).
+            end (datetime): End of the range (exclusive).
+            granularity (str): "day", "week" (starting on Monday) or "month".
+            city (str or list): City name(s) to filter by, or 'all' for no filtering (default 'all').
 
-        # Adopted pets
-        if adopted:
-            adopted_match = {
-                **city_filter,
-                "adoption.adopted": True,
-                "adoption.adoptionDate": {"$gte": start, "$lt": end}
-            }
-
-            if mode == "sum":
-                count = self.collection.count_documents(adopted_match)
-                results["adopted"] = count
-            else:  # groupby
-                pipeline = build_pipeline(adopted_match)
-                result = self.collection.aggregate(pipeline)
-                results["adopted"] = {doc["_id"]: doc["count"] for doc in result}
-
-        # Rescued pets
-        if rescued:
-            rescued_match = {
-                **city_filter,
-                "rescueDate": {"$gte": start, "$lt": end}
-            }
-
-            if mode == "sum":
-                count = self.collection.count_documents(rescued_match)
-                results["rescued"] = count
-            else:  # groupby
-                pipeline = build_pipeline(rescued_match)
-                result = self.collection.aggregate(pipeline)
-                results["rescued"] = {doc["_id"]: doc["count"] for doc in result}
+        Returns:
+            dict or None: Columns of equal length, ready for pandas.DataFrame(...):
+                "period", "location", "adopted", "rescued", "medianDaysInShelter" and one column per
+                adoption period (ADOPTION_PERIODS). Rows are sorted by period and location. None if no connection.
+        """
+        allowed_granularities = ["day", "week", "month"]
+        if granularity not in allowed_granularities:
+            raise ValueError(f"'granularity' must be one of {allowed_granularities}")
 
-        return results
+        city_filter = location_filter(city)
+        pipeline = timeseries_pipeline(start, end, granularity, city_filter)
+
+        def compute():
+            return timeseries_columns(next(self.collection.aggregate(pipeline)))
+
+        cities = sorted(city) if isinstance(city, list) else city_filter
+        key = make_key("adoption_rescue_timeseries", start, end, granularity, cities)
+        return self._cached(key, compute, STATS_FIELDS + ["adoption"], by_pet=False, query=pipeline[0]["$match"])
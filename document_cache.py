@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Optional
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+CACHE_EXTENSION = ".bson"
+# Rejection report of the load that wrote an entry, stored next to it
+REPORT_EXTENSION = ".rejected.csv"
+
+
+def csv_fingerprint(csv_path: str, *key_parts) -> str:
+    """
+    Returns a SHA-256 of the CSV contents combined with the other parts of the key
+    (transform version, seed, ...), so a change to any of them gives a different cache entry.
+    """
+    digest = hashlib.sha256()
+    with open(csv_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    for part in key_parts:
+        digest.update(f"|{part}".encode())
+    return digest.hexdigest()
+
+
+def schema_fingerprint(schema: Optional[dict]) -> str:
+    # Part of the cache key: the documents of an entry were validated against this schema
+    return hashlib.sha256(json.dumps(schema, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def cache_path(cache_dir: str, fingerprint: str) -> str:
+    return os.path.join(cache_dir, fingerprint + CACHE_EXTENSION)
+
+
+def cached_report_path(path: str) -> str:
+    return path[:-len(CACHE_EXTENSION)] + REPORT_EXTENSION
+
+
+def restore_report(path: str, report_path: str) -> bool:
+    """
+    Copies the rejection report stored with the entry at `path` to `report_path`.
+    Returns False when the load that wrote the entry rejected no rows.
+    """
+    stored = cached_report_path(path)
+    if not os.path.exists(stored):
+        return False
+    shutil.copyfile(stored, report_path)
+    return True
+
+
+def iter_cached_batches(path: str, batch_size: int = 10000):
+    """
+    Streams the cached documents in batches of `batch_size`.
+    Documents stay as RawBSONDocument, so they go to insert_many without being decoded and re-encoded.
+    """
+    # Reading the entry makes it the most recently used one
+    os.utime(path)
+    with open(path, "rb") as f:
+        batch = []
+        for doc in bson.decode_file_iter(f, CodecOptions(document_class=RawBSONDocument)):
+            batch.append(doc)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def write_through(batches, path: str, report_path: Optional[str] = None):
+    """
+    Passes the batches on unchanged while writing their documents to the cache file at `path`.
+    The entry appears only after the last batch, so an interrupted load never leaves a partial entry behind.
+    The rejection report the load wrote to `report_path` (if any) is stored with the entry before it appears,
+    see restore_report.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary_path = path + ".part"
+    completed = False
+    try:
+        with open(temporary_path, "wb") as f:
+            for batch in batches:
+                f.write(b"".join(bson.encode(doc) for doc in batch))
+                yield batch
+        stored_report = cached_report_path(path)
+        if report_path and os.path.exists(report_path):
+            shutil.copyfile(report_path, stored_report)
+        elif os.path.exists(stored_report):
+            os.remove(stored_report)
+        completed = True
+        os.replace(temporary_path, path)
+    finally:
+        if not completed and os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def evict(cache_dir: str, max_bytes: int) -> list:
+    """
+    Removes the least recently used entries until the cache takes at most `max_bytes`.
+    Returns the paths of the removed entries.
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+
+    entries = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir) if name.endswith(CACHE_EXTENSION)]
+    entries.sort(key=os.path.getmtime, reverse=True)
+
+    removed, total = [], 0
+    for path in entries:
+        report = cached_report_path(path)
+        total += os.path.getsize(path) + (os.path.getsize(report) if os.path.exists(report) else 0)
+        if total > max_bytes:
+            os.remove(path)
+            if os.path.exists(report):
+                os.remove(report)
+            removed.append(path)
+    return removed
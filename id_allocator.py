@@ -0,0 +1,95 @@
+import threading
+import pymongo
+
+
+def reservation(name: str, n: int) -> tuple:
+    # find_one_and_update arguments reserving `n` ids of the counter `name`
+    return {"_id": name}, {"$inc": {"seq": n}}
+
+
+def reserved_ids(counter: dict, n: int) -> range:
+    # The ids reserved by a reservation, from the counter document after it
+    return range(counter["seq"] - n + 1, counter["seq"] + 1)
+
+
+class IdBlockAllocator:
+    """
+    Hands out ids from blocks reserved in the counters collection (HiLo).
+
+    Every reservation is one atomic `$inc` of the counter by `block_size`, so ids stay unique across handlers
+    and processes while only one in `block_size` ids costs a round trip. When fewer than `refill_at` ids are left,
+    the next block is reserved on a background thread. Ids of a block that is not used up (e.g. when the process
+    exits) are skipped, so ids are unique and increasing per handler, but not gap-free.
+    """
+
+    def __init__(self, counters, name: str = "petID", block_size: int = 20, refill_at: int = None):
+        if block_size < 1:
+            raise ValueError("'block_size' must be at least 1")
+
+        self.counters = counters
+        self.name = name
+        self.block_size = block_size
+        self.refill_at = block_size // 4 if refill_at is None else refill_at
+
+        self._lock = threading.Lock()
+        self._next = 1  # next id to hand out
+        self._end = 0  # last id of the current block (inclusive), nothing reserved yet
+        self._spare = None  # block reserved in the background, (first, last)
+        self._refill = None  # running background reservation
+
+    def reserve(self, n: int) -> range:
+        """
+        Reserves `n` consecutive ids with a single counter update and returns them.
+        """
+        counter = self.counters.find_one_and_update(
+            *reservation(self.name, n),
+            upsert=True,
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        return reserved_ids(counter, n)
+
+    def _refill_in_background(self):
+        block = None
+        try:
+            block = self.reserve(self.block_size)
+        finally:
+            with self._lock:
+                if block is not None:
+                    self._spare = (block.start, block.stop - 1)
+                self._refill = None
+
+    def next_id(self) -> int:
+        """
+        Returns the next id; thread-safe.
+        """
+        with self._lock:
+            if self._next > self._end:
+                self._take_next_block()
+
+            pet_id = self._next
+            self._next += 1
+
+            remaining = self._end - self._next + 1
+            if remaining <= self.refill_at and self._spare is None and self._refill is None:
+                self._refill = threading.Thread(target=self._refill_in_background, daemon=True)
+                self._refill.start()
+
+            return pet_id
+
+    def _take_next_block(self):
+        # Called with the lock held, when the current block is used up
+        while self._next > self._end:
+            if self._spare is not None:
+                self._next, self._end = self._spare
+                self._spare = None
+            elif self._refill is not None:
+                # The next block is already being reserved, wait for it
+                refill = self._refill
+                self._lock.release()
+                try:
+                    refill.join()
+                finally:
+                    self._lock.acquire()
+            else:
+                block = self.reserve(self.block_size)
+                self._next, self._end = block.start, block.stop - 1
@@ -0,0 +1,199 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from datetime import datetime
+from connection import get_client
+from readiness import repair_readiness
+
+# Secondary indexes needed by the PetAdoptionDatabase query methods
+PET_INDEXES = {
+    # Equality fields first, then the age / fee ranges (ESR); only pets still waiting for a home.
+    # An index can only be used with a condition on its first field, so searches for any type
+    # (pet_type="any") have their own index starting with the location. Searches without a type
+    # and a location fall back to the 'adopted_age' index below (adoption.adopted, then the age range).
+    "find_pets_for_adoption": [
+        IndexModel(
+            [("type", ASCENDING), ("location", ASCENDING), ("maturitySize", ASCENDING), ("furLength", ASCENDING),
+             ("age", ASCENDING), ("fee", ASCENDING)],
+            name="adoption_search",
+            partialFilterExpression={"adoption.adopted": False}
+        ),
+        IndexModel(
+            [("location", ASCENDING), ("maturitySize", ASCENDING), ("furLength", ASCENDING), ("age", ASCENDING),
+             ("fee", ASCENDING)],
+            name="adoption_search_any_type",
+            partialFilterExpression={"adoption.adopted": False}
+        ),
+    ],
+    # Only ready pets are indexed; the ready list and readiness checks by _id are answered from the index alone
+    "pets_ready_for_adoption": [
+        IndexModel(
+            [("readyForAdoption", ASCENDING), ("_id", ASCENDING)],
+            name="ready_id",
+            partialFilterExpression={"readyForAdoption": True}
+        )
+    ],
+    "get_pets_by_age": [
+        IndexModel([("adoption.adopted", ASCENDING), ("age", ASCENDING)], name="adopted_age"),
+        IndexModel([("age", ASCENDING)], name="age"),
+    ],
+    # Seek to the pet of the day among unadopted pets
+    "get_pet_of_the_day": [
+        IndexModel([("adoption.adopted", ASCENDING), ("_id", ASCENDING)], name="adopted_id"),
+    ],
+    "get_pets_by_shelter_stay": [
+        IndexModel([("adoption.daysInShelter", ASCENDING)], name="days_in_shelter"),
+    ],
+    "adoption_rescue_stats": [
+        IndexModel(
+            [("adoption.adoptionDate", ASCENDING), ("location", ASCENDING)],
+            name="adoption_date_location",
+            partialFilterExpression={"adoption.adopted": True}
+        ),
+        IndexModel([("rescueDate", ASCENDING), ("location", ASCENDING)], name="rescue_date_location"),
+    ],
+    # Pets changed since the last refresh of a snapshot (see snapshot.PetSnapshot)
+    "snapshot_refresh": [
+        IndexModel([("lastModified", ASCENDING)], name="last_modified"),
+    ],
+    # Documents of the CSV rows of a chunk (see create_database.sync_collection); pets created in the app have no key
+    "sync_collection": [
+        IndexModel(
+            [("sourceKey", ASCENDING)],
+            name="source_key",
+            unique=True,
+            partialFilterExpression={"sourceKey": {"$exists": True}}
+        ),
+    ],
+}
+
+# Representative query of every method, used to check that it is served by an index
+_month = {"$gte": datetime(2024, 5, 1), "$lt": datetime(2024, 6, 1)}
+QUERY_SHAPES = {
+    "find_pets_for_adoption": {
+        "filter": {"adoption.adopted": False, "type": "Dog", "age": {"$lte": 24}, "fee": {"$lte": 50},
+                   "location": "Lębork"}
+    },
+    "find_pets_for_adoption (any type)": {
+        "filter": {"adoption.adopted": False, "age": {"$lte": 24}, "fee": {"$lte": 50}, "location": "Lębork"}
+    },
+    "find_pets_for_adoption (any type, any location)": {
+        "filter": {"adoption.adopted": False, "age": {"$lte": 24}, "maturitySize": "Small"}
+    },
+    "pets_ready_for_adoption": {"filter": {"readyForAdoption": True}},
+    "readiness_of": {"filter": {"readyForAdoption": True, "_id": {"$in": [1, 2, 3]}}, "projection": {"_id": 1}},
+    "is_ready_for_adoption": {"filter": {"readyForAdoption": True, "_id": 1}, "projection": {"_id": 1}, "limit": 1},
+    "get_pets_by_age": {"filter": {"adoption.adopted": False}, "sort": [("age", DESCENDING)], "limit": 5},
+    "get_pets_by_age (any adoption status)": {"filter": {}, "sort": [("age", ASCENDING)], "limit": 5},
+    "get_pets_by_shelter_stay": {
+        "filter": {"adoption.daysInShelter": {"$exists": True, "$ne": None, "$gt": 150}},
+        "sort": [("adoption.daysInShelter", DESCENDING)], "limit": 2
+    },
+    "get_pet_of_the_day (unadopted)": {
+        "filter": {"adoption.adopted": False, "_id": {"$gte": 1000}}, "sort": [("_id", ASCENDING)], "limit": 1
+    },
+    "adoption_rescue_stats (adopted)": {
+        "pipeline": [{"$match": {"adoption.adopted": True, "adoption.adoptionDate": _month}},
+                     {"$group": {"_id": "$location", "count": {"$sum": 1}}}]
+    },
+    "adoption_rescue_stats (rescued)": {
+        "pipeline": [{"$match": {"rescueDate": _month}},
+                     {"$group": {"_id": "$location", "count": {"$sum": 1}}}]
+    },
+    "adoption_rescue_timeseries": {
+        "pipeline": [{"$match": {"$or": [{"adoption.adopted": True, "adoption.adoptionDate": _month},
+                                         {"rescueDate": _month}]}},
+                     {"$facet": {"count": [{"$count": "pets"}]}}]
+    },
+    "snapshot_refresh": {
+        "filter": {"$or": [{"_id": {"$gt": 1000}}, {"lastModified": {"$gte": datetime(2024, 5, 1)}}]}
+    },
+    "sync_collection": {
+        "filter": {"sourceKey": {"$in": ["00000000000000aa", "00000000000000bb"]}},
+        "projection": {"sourceKey": 1, "sourceHash": 1}
+    },
+}
+
+
+def ensure_indexes(collection, repair: bool = True):
+    """
+    Creates every index from PET_INDEXES. Indexes that already exist with the same definition are left as they are,
+    so it is safe to call after every load.
+
+    With `repair` the 'readyForAdoption' flag behind the 'ready_id' index is also recomputed where it is missing
+    or stale (see readiness.repair_readiness) - required once for pets stored before the flag existed, otherwise
+    pets_ready_for_adoption does not find them. Loads that have just written every flag can skip it.
+    """
+    models = [model for models in PET_INDEXES.values() for model in models]
+    names = collection.create_indexes(models)
+    print(f"🗂️ Ensured {len(names)} indexes: {', '.join(names)}")
+    if repair:
+        fixed = repair_readiness(collection)
+        print(f"🩺 Recomputed the readiness flag of {fixed} pet(s).")
+    return names
+
+
+def winning_plan(explain: dict) -> dict:
+    # find() explains have the plan at the top level, aggregations inside the first ($cursor) stage
+    if "queryPlanner" in explain:
+        planner = explain["queryPlanner"]
+    else:
+        planner = explain["stages"][0]["$cursor"]["queryPlanner"]
+    plan = planner["winningPlan"]
+    return plan.get("queryPlan", plan)
+
+
+def plan_stages(plan: dict) -> list:
+    """
+    Returns the names of all stages of a query plan, from the root down.
+    """
+    stages = [plan["stage"]]
+    if "inputStage" in plan:
+        stages += plan_stages(plan["inputStage"])
+    for stage in plan.get("inputStages", []):
+        stages += plan_stages(stage)
+    return stages
+
+
+def explain_shape(collection, shape: dict, verbosity: str = "queryPlanner") -> dict:
+    # Explains a find (filter / projection / sort / limit), a count (count: True) or an aggregation (pipeline) shape
+    if "pipeline" in shape:
+        command = {"aggregate": collection.name, "pipeline": shape["pipeline"], "cursor": {}}
+    elif shape.get("count"):
+        command = {"count": collection.name, "query": shape["filter"]}
+    else:
+        command = {"find": collection.name, "filter": shape["filter"]}
+        if shape.get("projection"):
+            command["projection"] = shape["projection"]
+        if shape.get("sort"):
+            command["sort"] = dict(shape["sort"])
+        if shape.get("limit"):
+            command["limit"] = shape["limit"]
+        if shape.get("hint"):
+            command["hint"] = shape["hint"] if isinstance(shape["hint"], str) else dict(shape["hint"])
+    return collection.database.command("explain", command, verbosity=verbosity)
+
+
+def verify_indexes(collection) -> dict:
+    """
+    Explains the query of every method from QUERY_SHAPES and checks that it does not scan the whole collection.
+
+    Returns:
+        dict: Method name -> list of plan stages, for every method whose plan contains a COLLSCAN.
+    """
+    failures = {}
+    for method, shape in QUERY_SHAPES.items():
+        stages = plan_stages(winning_plan(explain_shape(collection, shape)))
+        if "COLLSCAN" in stages:
+            failures[method] = stages
+            print(f"❌ {method}: {' -> '.join(stages)}")
+        else:
+            print(f"✅ {method}: {' -> '.join(stages)}")
+    return failures
+
+
+if __name__ == "__main__":
+    database_uri = "mongodb://localhost:27017"
+    pets = get_client(database_uri)["petsDB"]["petsInformation"]
+
+    ensure_indexes(pets)
+    if verify_indexes(pets):
+        raise SystemExit(1)
@@ -7,6 +7,7 @@ if __name__ == "__main__":
     #        "?retryWrites=true&w=majority&appName=ProjectCluster")
     uri = "mongodb://localhost:27017"
     pet_db = PetAdoptionDatabase(uri=uri)
+    pet_db.ping()
 
     print("=================================================")
 
@@ -51,7 +52,8 @@ if __name__ == "__main__":
         max_fee=50,
         location="Lębork",
         maturity_size="Medium",
-        fur_length="Long"
+        fur_length="Long",
+        view="card"  # only the fields printed below
     )
 
     for pet in pets:
@@ -114,3 +116,7 @@ if __name__ == "__main__":
 
     # Default (adopted, this month, grouped by city)
     print(pet_db.adoption_rescue_stats())
+
+    # Monthly trend per city in one aggregation (columns load straight into pandas.DataFrame)
+    print(pet_db.adoption_rescue_timeseries(datetime(2024, 1, 1), datetime(2025, 1, 1), granularity="month",
+                                            city=["Gdańsk", "Sopot"]))
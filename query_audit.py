@@ -0,0 +1,291 @@
+import argparse
+import io
+import json
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+from database_handler import PetAdoptionDatabase
+from indexes import explain_shape, winning_plan, plan_stages
+
+# Calls of the handler whose queries are audited: (label, method, keyword arguments, handler attributes)
+AUDITED_CALLS = [
+    ("find_pets_for_adoption", "find_pets_for_adoption",
+     {"pet_type": "Dog", "max_age": 24, "max_fee": 50, "location": "Lębork"}, {}),
+    ("find_pets_for_adoption (view)", "find_pets_for_adoption", {"pet_type": "Cat", "view": "card"}, {}),
+    ("find_pets_for_adoption (any type)", "find_pets_for_adoption",
+     {"max_age": 24, "max_fee": 50, "location": "Lębork"}, {}),
+    ("find_pets_for_adoption (any type, any location)", "find_pets_for_adoption",
+     {"max_age": 24, "maturity_size": "Small"}, {}),
+    ("find_pets_by_description", "find_pets_by_description",
+     {"keywords": ["friendly", "good with children"], "limit": 20}, {}),
+    ("get_pets_by_age", "get_pets_by_age", {"order": "oldest", "n": 5, "adopted": False}, {}),
+    ("get_pets_by_age (any adoption status)", "get_pets_by_age", {"order": "youngest", "n": 5}, {}),
+    ("get_pets_by_shelter_stay", "get_pets_by_shelter_stay",
+     {"stay_type": "longest", "n": 2, "threshold_months": 5, "comparison": "longer"}, {}),
+    ("pets_ready_for_adoption", "pets_ready_for_adoption", {}, {}),
+    ("readiness_of", "readiness_of", {"pet_ids": [1, 2, 3]}, {}),
+    ("is_ready_for_adoption", "is_ready_for_adoption", {"pet_id": 1}, {}),
+    ("get_pet_of_the_day", "get_pet_of_the_day", {}, {}),
+    ("get_pet_of_the_day (unadopted)", "get_pet_of_the_day", {"unadopted_only": True}, {}),
+    ("adoption_rescue_stats (rollups)", "adoption_rescue_stats", {"adopted": True, "rescued": True},
+     {"use_rollups": True}),
+    ("adoption_rescue_stats (pets)", "adoption_rescue_stats", {"adopted": True, "rescued": True},
+     {"use_rollups": False}),
+    ("adoption_rescue_stats (pets, sum)", "adoption_rescue_stats", {"adopted": True, "rescued": True, "mode": "sum"},
+     {"use_rollups": False}),
+]
+
+
+class _RecordedCursor:
+    # Cursor of a recorded find: remembers sort / limit / hint in the shape and yields nothing
+
+    def __init__(self, shape: dict):
+        self.shape = shape
+
+    def sort(self, key, direction=None):
+        self.shape["sort"] = [(key, direction or 1)] if isinstance(key, str) else list(key)
+        return self
+
+    def limit(self, limit: int):
+        self.shape["limit"] = limit
+        return self
+
+    def hint(self, index):
+        self.shape["hint"] = index
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        return iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class QueryRecorder:
+    """
+    Stand-in for a pymongo Collection in a dry run: every read made through it is recorded as a shape
+    for indexes.explain_shape (filter / projection / sort / limit, count or pipeline) and returns no documents,
+    except the lookup of the largest _id, which returns {"_id": largest_id} so that the queries depending
+    on it (the seek of get_pet_of_the_day) are built and recorded too. Writes are refused.
+    """
+
+    def __init__(self, collection, largest_id: int = 1000):
+        self.collection = collection
+        self.name = collection.name
+        self.database = collection.database
+        self.largest_id = largest_id
+        self.shapes = []
+
+    def _record(self, shape: dict) -> dict:
+        self.shapes.append(shape)
+        return shape
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, **kwargs) -> _RecordedCursor:
+        cursor = _RecordedCursor(self._record({"filter": filter or {}, "projection": projection}))
+        if sort:
+            cursor.sort(sort)
+        if limit:
+            cursor.limit(limit)
+        return cursor
+
+    find_raw_batches = find
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        self.find(filter, projection, sort=sort, limit=1)
+        if not filter and sort and list(sort)[0] in (("_id", -1), ["_id", -1]):
+            return {"_id": self.largest_id}
+        return None
+
+    def count_documents(self, filter: dict, **kwargs) -> int:
+        self._record({"filter": filter, "count": True})
+        return 0
+
+    def aggregate(self, pipeline: list, **kwargs):
+        self._record({"pipeline": pipeline})
+        return iter(())
+
+    def with_options(self, **kwargs) -> "QueryRecorder":
+        return self
+
+    def __getattr__(self, name):
+        raise RuntimeError(f"'{name}' is not allowed in a dry run.")
+
+
+@contextmanager
+def dry_run(handler: PetAdoptionDatabase):
+    """
+    Runs the handler's methods without touching the data: reads of the pets and the rollups are recorded
+    instead of executed, and the query cache is bypassed. Yields a list that receives the recorded
+    (collection, shape) pairs when the block ends.
+    """
+    saved = handler.collection, handler.rollups, handler.cache
+    recorders = [QueryRecorder(handler.collection), QueryRecorder(handler.rollups)]
+    handler.collection, handler.rollups = recorders
+    handler.cache = None
+    queries = []
+    try:
+        yield queries
+    finally:
+        handler.collection, handler.rollups, handler.cache = saved
+        queries.extend((recorder.collection, shape) for recorder in recorders for shape in recorder.shapes)
+
+
+def capture_queries(handler: PetAdoptionDatabase, method: str, kwargs: dict, attributes: dict) -> list:
+    """
+    Calls a handler method in a dry run and returns the (collection, shape) pairs of the queries it built.
+    """
+    saved = {name: getattr(handler, name) for name in attributes}
+    for name, value in attributes.items():
+        setattr(handler, name, value)
+    # Pets of the day (and the largest id they are drawn from) are remembered for the day, so the queries
+    # are only built on the first call
+    handler._pets_of_the_day = {}
+    handler._largest_pet_id = None
+    try:
+        with dry_run(handler) as queries, redirect_stdout(io.StringIO()):
+            getattr(handler, method)(**kwargs)
+    finally:
+        for name, value in saved.items():
+            setattr(handler, name, value)
+    return queries
+
+
+def _execution_stats(explain: dict) -> dict:
+    # Like winning_plan: top level for find / count, inside the first ($cursor) stage for aggregations
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    return explain["stages"][0]["$cursor"]["executionStats"]
+
+
+def _index_names(plan: dict) -> list:
+    names = [plan["indexName"]] if "indexName" in plan else []
+    if "inputStage" in plan:
+        names += _index_names(plan["inputStage"])
+    for stage in plan.get("inputStages", []):
+        names += _index_names(stage)
+    return names
+
+
+def audit_query(collection, shape: dict) -> dict:
+    """
+    Runs the query with explain("executionStats") and returns what matters for its cost: plan stages,
+    indexes used, keys / documents examined per returned document and whether it sorts in memory.
+    """
+    explain = explain_shape(collection, shape, verbosity="executionStats")
+    plan = winning_plan(explain)
+    stages = plan_stages(plan)
+    stats = _execution_stats(explain)
+
+    returned = stats.get("nReturned", 0)
+    keys = stats.get("totalKeysExamined", 0)
+    docs = stats.get("totalDocsExamined", 0)
+    return {
+        "collection": collection.name,
+        "shape": shape,
+        "stages": stages,
+        "indexes": _index_names(plan),
+        "collscan": "COLLSCAN" in stages,
+        "in_memory_sort": "SORT" in stages,
+        "returned": returned,
+        "keys_examined": keys,
+        "docs_examined": docs,
+        "keys_per_returned": round(keys / max(returned, 1), 2),
+        "docs_per_returned": round(docs / max(returned, 1), 2),
+        "millis": stats.get("executionTimeMillis", 0),
+    }
+
+
+def threshold_violations(report: dict, max_keys_per_returned: float, max_docs_per_returned: float,
+                         allow_collscan: bool = False, allow_in_memory_sort: bool = False) -> list:
+    """
+    Returns the reasons why an audited query exceeds the thresholds (empty list if it does not).
+    """
+    violations = []
+    if report["collscan"] and not allow_collscan:
+        violations.append("COLLSCAN")
+    if report["in_memory_sort"] and not allow_in_memory_sort:
+        violations.append("in-memory SORT")
+    if report["keys_per_returned"] > max_keys_per_returned:
+        violations.append(f"{report['keys_per_returned']} keys examined per returned document")
+    if report["docs_per_returned"] > max_docs_per_returned:
+        violations.append(f"{report['docs_per_returned']} documents examined per returned document")
+    return violations
+
+
+def audit_handler(handler: PetAdoptionDatabase, max_keys_per_returned: float = 10.0,
+                  max_docs_per_returned: float = 2.0, allow_collscan: bool = False,
+                  allow_in_memory_sort: bool = False, calls: list = None) -> list:
+    """
+    Audits the queries of every call from AUDITED_CALLS (or `calls`) and prints one line per query.
+
+    Returns:
+        list: One report per query (see audit_query) with the call's label and its 'violations'.
+    """
+    # The description index is built from a full scan on first use; build it now so the dry run
+    # records the search itself
+    with redirect_stdout(io.StringIO()):
+        handler.description_index()
+
+    reports = []
+    for label, method, kwargs, attributes in calls or AUDITED_CALLS:
+        queries = capture_queries(handler, method, kwargs, attributes)
+        if not queries:
+            print(f"➖ {label}: no query (nothing matched before the database was asked)")
+        for number, (collection, shape) in enumerate(queries, start=1):
+            name = label if len(queries) == 1 else f"{label} #{number}"
+            report = {"call": name, **audit_query(collection, shape)}
+            report["violations"] = threshold_violations(report, max_keys_per_returned, max_docs_per_returned,
+                                                        allow_collscan, allow_in_memory_sort)
+            reports.append(report)
+
+            mark = "❌" if report["violations"] else "✅"
+            indexes = ", ".join(report["indexes"]) or "-"
+            print(f"{mark} {name}: {' -> '.join(report['stages'])} (index: {indexes}); "
+                  f"returned {report['returned']}, keys/returned {report['keys_per_returned']}, "
+                  f"docs/returned {report['docs_per_returned']}, {report['millis']} ms")
+            for violation in report["violations"]:
+                print(f"     - {violation}")
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain the queries of every PetAdoptionDatabase method "
+                                                 "and fail when one exceeds the thresholds")
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="petsDB")
+    parser.add_argument("--collection", default="petsInformation")
+    parser.add_argument("--max-keys-per-returned", type=float, default=10.0,
+                        help="index keys examined per returned document")
+    parser.add_argument("--max-docs-per-returned", type=float, default=2.0,
+                        help="documents examined per returned document")
+    parser.add_argument("--allow-collscan", action="store_true")
+    parser.add_argument("--allow-in-memory-sort", action="store_true")
+    parser.add_argument("--output", help="write the reports to this JSON file")
+    args = parser.parse_args()
+
+    pet_db = PetAdoptionDatabase(args.uri, args.db, args.collection)
+    if not pet_db.ping():
+        raise SystemExit(1)
+
+    reports = audit_handler(pet_db, args.max_keys_per_returned, args.max_docs_per_returned,
+                            args.allow_collscan, args.allow_in_memory_sort)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"timestamp": datetime.now().isoformat(timespec="seconds"), "reports": reports}, f,
+                      indent=2, default=str)
+        print(f"\n✅ Reports written to '{args.output}'.")
+
+    failed = [report["call"] for report in reports if report["violations"]]
+    if failed:
+        print(f"\n❌ {len(failed)} of {len(reports)} queries exceed the thresholds: {', '.join(failed)}")
+        raise SystemExit(1)
+    print(f"\n✅ All {len(reports)} queries within the thresholds.")
@@ -0,0 +1,262 @@
+import json
+import operator
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+# Marks an entry that depends on every field of the documents it returns
+ALL_FIELDS = "*"
+
+# Value of a field a document does not have
+_MISSING = object()
+
+_COMPARISONS = {"$gt": operator.gt, "$gte": operator.ge, "$lt": operator.lt, "$lte": operator.le}
+
+
+def make_key(method: str, *params) -> str:
+    """
+    Returns the cache key of a call: the method name and its normalized parameters
+    (the built query, projection, ...), with dict keys sorted so that equal queries give equal keys.
+    """
+    return json.dumps([method, *params], sort_keys=True, default=str)
+
+
+def fields_overlap(fields: Iterable[str], other: Iterable[str]) -> bool:
+    # "adoption" overlaps "adoption.adopted" (and the other way round), "*" overlaps everything
+    for field in fields:
+        for other_field in other:
+            if ALL_FIELDS in (field, other_field) or field == other_field:
+                return True
+            if field.startswith(other_field + ".") or other_field.startswith(field + "."):
+                return True
+    return False
+
+
+def query_fields(query: dict) -> set:
+    """
+    Returns the fields a filter depends on, including the ones inside $and / $or / $nor.
+    """
+    fields = set()
+    for field, condition in query.items():
+        if field in ("$and", "$or", "$nor"):
+            for part in condition:
+                fields |= query_fields(part)
+        else:
+            fields.add(field)
+    return fields
+
+
+def _lookup(doc: dict, path: str):
+    # Value at a dotted path; a list on the way is returned as it is (arrays are not evaluated, see may_match)
+    value = doc
+    for key in path.split("."):
+        if isinstance(value, list):
+            return value
+        if not isinstance(value, dict) or key not in value:
+            return _MISSING
+        value = value[key]
+    return value
+
+
+def _equal(value, expected) -> bool:
+    # {field: None} matches a missing field too
+    if expected is None:
+        return value is None or value is _MISSING
+    return value is not _MISSING and value == expected
+
+
+def _condition_may_match(value, condition) -> bool:
+    if isinstance(value, list):
+        return True
+    if not (isinstance(condition, dict) and condition and all(op.startswith("$") for op in condition)):
+        return _equal(value, condition)
+
+    for op, argument in condition.items():
+        try:
+            if op == "$eq":
+                matched = _equal(value, argument)
+            elif op == "$ne":
+                matched = not _equal(value, argument)
+            elif op == "$in":
+                matched = any(_equal(value, option) for option in argument)
+            elif op == "$nin":
+                matched = not any(_equal(value, option) for option in argument)
+            elif op == "$exists":
+                matched = (value is not _MISSING) == bool(argument)
+            elif op in _COMPARISONS:
+                matched = value is not _MISSING and value is not None and _COMPARISONS[op](value, argument)
+            else:
+                matched = True
+        except TypeError:
+            # Values of different types (e.g. a date and a number)
+            matched = True
+        if not matched:
+            return False
+    return True
+
+
+def may_match(query: dict, doc: dict) -> bool:
+    """
+    Returns False only when the document certainly does not match the filter. Equality, $eq, $ne, $gt, $gte, $lt,
+    $lte, $in, $nin, $exists, $and and $or are evaluated; anything else (array fields, $regex, $nor, $expr, ...)
+    counts as a possible match.
+    """
+    for field, condition in query.items():
+        if field == "$and":
+            if not all(may_match(part, doc) for part in condition):
+                return False
+        elif field == "$or":
+            if not any(may_match(part, doc) for part in condition):
+                return False
+        elif field.startswith("$"):
+            continue
+        elif not _condition_may_match(_lookup(doc, field), condition):
+            return False
+    return True
+
+
+def projected_fields(projection: Optional[dict]) -> set:
+    # Fields of the returned documents; only an inclusion projection limits them
+    if projection and all(value in (1, True) for field, value in projection.items() if field != "_id"):
+        return set(projection) | {"_id"}
+    return {ALL_FIELDS}
+
+
+class _Entry:
+    __slots__ = ("payload", "expires", "filter_fields", "output_fields", "pet_ids", "query")
+
+    def __init__(self, payload, expires, filter_fields, output_fields, pet_ids, query):
+        self.payload = payload
+        self.expires = expires
+        self.filter_fields = filter_fields
+        self.output_fields = output_fields
+        self.pet_ids = pet_ids
+        self.query = query
+
+
+class QueryCache:
+    """
+    LRU cache of query results with a time-to-live and a memory budget.
+
+    Results are stored pickled, so every hit returns a fresh copy and the memory budget counts the real size.
+    Every entry remembers what it depends on:
+    - `filter_fields`: fields that decide which pets are in the result (or how they are counted),
+    - `output_fields`: fields of the returned documents (empty for counts),
+    - `pet_ids`: ids of the returned pets (None for aggregations over all pets),
+    - `query`: filter of the pets in the result or counted by it (None if unknown),
+    so a write only drops the entries it can change (see `invalidate`).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0, max_bytes: int = 64 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: str):
+        """
+        Returns (True, value) on a hit and (False, None) on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            payload = entry.payload
+        return True, pickle.loads(payload)
+
+    def put(self, key: str, value, filter_fields: Iterable[str], output_fields: Iterable[str] = (),
+            pet_ids: Optional[Iterable] = None, query: Optional[dict] = None):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        entry = _Entry(payload, time.monotonic() + self.ttl, frozenset(filter_fields), frozenset(output_fields),
+                       None if pet_ids is None else frozenset(pet_ids), query)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self.bytes += len(payload)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        # Called with the lock held
+        self.bytes -= len(self._entries.pop(key).payload)
+
+    def invalidate(self, fields: Optional[Iterable[str]] = None, pet_ids: Optional[Iterable] = None,
+                   inserted: Optional[Iterable[dict]] = None) -> int:
+        """
+        Drops the entries a write can change and returns their number.
+
+        - Insert: the `inserted` documents; drops the entries whose query one of them may match (see may_match),
+          and the entries without a query.
+        - Delete: `pet_ids` only, drops the aggregations and the results containing one of the pets.
+        - Update: the updated `fields` and, if known, the `pet_ids` of the updated pets; drops the entries
+          filtering on one of the fields, and the results containing one of the pets and returning one of the fields.
+        - No arguments: drops everything.
+        """
+        pet_ids = None if pet_ids is None else set(pet_ids)
+        fields = None if fields is None else list(fields)
+        inserted = None if inserted is None else list(inserted)
+
+        with self._lock:
+            stale = []
+            for key, entry in self._entries.items():
+                if inserted is not None:
+                    if entry.query is None or any(may_match(entry.query, doc) for doc in inserted):
+                        stale.append(key)
+                    continue
+                if fields is None and pet_ids is None:
+                    stale.append(key)
+                    continue
+
+                contains_pets = entry.pet_ids is None or pet_ids is None or not entry.pet_ids.isdisjoint(pet_ids)
+                if fields is None:
+                    changed = contains_pets
+                else:
+                    changed = fields_overlap(fields, entry.filter_fields) or (
+                            contains_pets and fields_overlap(fields, entry.output_fields))
+                if changed:
+                    stale.append(key)
+
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
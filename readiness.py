@@ -0,0 +1,85 @@
+from typing import Optional
+
+# Health states in which a pet can be adopted
+READY_HEALTH = ["Healthy", "Minor Injury"]
+
+# The rule of a pet ready for adoption: field -> accepted values. Everything below is derived from it
+READINESS_RULE = {
+    "adoption.adopted": [False],
+    "medical.vaccinated": ["Yes"],
+    "medical.dewormed": ["Yes"],
+    "medical.sterilized": ["Yes"],
+    "medical.health": READY_HEALTH,
+}
+
+# Derived field stored on every pet (kept by the loader and all writes of the handlers)
+READY_FIELD = "readyForAdoption"
+
+# Pets ready for adoption, served by the partial 'ready_id' index
+READY_FOR_ADOPTION_QUERY = {READY_FIELD: True}
+
+# Fields whose change can change readiness
+READINESS_FIELDS = list(READINESS_RULE)
+
+# The rule as an aggregation expression
+READINESS_EXPRESSION = {"$and": [{"$in": [f"${field}", values]} for field, values in READINESS_RULE.items()]}
+
+# Last stage of every update pipeline touching the pets
+SET_READINESS_STAGE = {"$set": {READY_FIELD: READINESS_EXPRESSION}}
+
+
+def _value(doc: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def is_ready(pet: dict) -> bool:
+    """
+    Evaluates READINESS_RULE on a pet document (or on a dict of dotted columns, see readiness_column).
+    """
+    return all(_value(pet, field) in values for field, values in READINESS_RULE.items())
+
+
+def readiness_column(columns: dict) -> list:
+    """
+    Returns the readiness of every row of the loader columns (dotted path -> list of values).
+    """
+    values = [columns[field] for field in READINESS_FIELDS]
+    return [all(value in READINESS_RULE[field] for field, value in zip(READINESS_FIELDS, row))
+            for row in zip(*values)]
+
+
+def repair_update(pet_ids: list) -> tuple:
+    # update_many arguments fixing the flag of the given pets where it differs from the rule (or is missing)
+    return (
+        {"_id": {"$in": pet_ids}, "$expr": {"$ne": [f"${READY_FIELD}", READINESS_EXPRESSION]}},
+        [SET_READINESS_STAGE, {"$set": {"lastModified": "$$NOW"}}]
+    )
+
+
+def repair_batch_filter(last_id: Optional[int]) -> dict:
+    # Query of the next batch of a repair walking the _id index, after the last pet of the previous batch
+    return {} if last_id is None else {"_id": {"$gt": last_id}}
+
+
+def repair_readiness(collection, batch_size: int = 1000, start_after: Optional[int] = None) -> int:
+    """
+    Recomputes the readiness flag of all pets, e.g. after changes made outside the handlers.
+
+    Walks the _id index in batches of `batch_size` pets and rewrites only the pets whose flag differs
+    from the rule (or is missing), so a repeated run touches nothing. Returns the number of pets fixed.
+    """
+    fixed = 0
+    last_id = start_after
+    while True:
+        cursor = collection.find(repair_batch_filter(last_id), {"_id": 1}).sort("_id", 1).limit(batch_size)
+        ids = [doc["_id"] for doc in cursor]
+        if not ids:
+            return fixed
+
+        result = collection.update_many(*repair_update(ids))
+        fixed += result.modified_count
+        last_id = ids[-1]
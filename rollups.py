@@ -0,0 +1,160 @@
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional
+from pymongo import UpdateOne, IndexModel, ASCENDING
+
+# Daily numbers of adopted and rescued pets per location:
+# {"_id": {"day": datetime, "location": str}, "adopted": int, "rescued": int}
+ROLLUP_COLLECTION = "adoptionRollups"
+
+ROLLUP_INDEXES = [IndexModel([("_id.day", ASCENDING), ("_id.location", ASCENDING)], name="day_location")]
+
+# Marker stored in the rollups when a change of the pets could not be applied to them (see stale_marker_update).
+# Its _id has no day, so the rollup queries never see it, and a rebuild (backfill_rollups) removes it
+# together with the old collection
+STALE_MARKER = {"_id": "stale"}
+
+# Fields of a pet whose change moves it between rollup counts
+ROLLUP_FIELDS = ["location", "rescueDate", "adoption"]
+ROLLUP_PROJECTION = {field: 1 for field in ROLLUP_FIELDS}
+
+
+def _day(date: datetime) -> datetime:
+    return datetime(date.year, date.month, date.day)
+
+
+def backfill_pipelines(rollups_name: str = ROLLUP_COLLECTION) -> list:
+    # Aggregations of the pets that write the rescued and then the adopted counts into the rollups ($merge)
+    return [[
+        {"$match": {"rescueDate": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"day": {"$dateTrunc": {"date": "$rescueDate", "unit": "day"}}, "location": "$location"},
+            "rescued": {"$sum": 1}
+        }},
+        {"$set": {"adopted": 0}},
+        {"$merge": {"into": rollups_name, "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ], [
+        {"$match": {"adoption.adopted": True, "adoption.adoptionDate": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"day": {"$dateTrunc": {"date": "$adoption.adoptionDate", "unit": "day"}},
+                    "location": "$location"},
+            "adopted": {"$sum": 1}
+        }},
+        {"$set": {"rescued": 0}},
+        {"$merge": {
+            "into": rollups_name,
+            "whenMatched": [{"$set": {"adopted": "$$new.adopted"}}],
+            "whenNotMatched": "insert"
+        }}
+    ]]
+
+
+def rebuild_collection_name(rollups_name: str = ROLLUP_COLLECTION) -> str:
+    # Temporary collection a rebuild of the rollups is written into before it replaces them
+    return f"{rollups_name}.rebuild"
+
+
+def backfill_rollups(collection, rollups_name: str = ROLLUP_COLLECTION) -> int:
+    """
+    Rebuilds the rollup collection from the pets in `collection`, with one aggregation per count
+    written by $merge into a temporary collection, which then replaces the rollups in one rename.
+    Readers see the old counts until the rename, never an empty or half-built collection; changes
+    applied to the old rollups during the rebuild are lost with them. Returns the number of rollup documents.
+    """
+    db = collection.database
+    building = rebuild_collection_name(rollups_name)
+    db.drop_collection(building)
+    db.create_collection(building)
+    for pipeline in backfill_pipelines(building):
+        collection.aggregate(pipeline)
+
+    db[building].create_indexes(ROLLUP_INDEXES)
+    db[building].rename(rollups_name, dropTarget=True)
+    return db[rollups_name].estimated_document_count()
+
+
+def rollup_deltas(pets: Iterable[dict], sign: int = 1) -> Counter:
+    """
+    Returns the changes of the rollup counts caused by adding (sign=1) or removing (sign=-1) the given pets:
+    (day, location, "adopted" / "rescued") -> change.
+    """
+    deltas = Counter()
+    for pet in pets:
+        location = pet.get("location")
+        if isinstance(pet.get("rescueDate"), datetime):
+            deltas[(_day(pet["rescueDate"]), location, "rescued")] += sign
+        adoption = pet.get("adoption") or {}
+        if adoption.get("adopted") and isinstance(adoption.get("adoptionDate"), datetime):
+            deltas[(_day(adoption["adoptionDate"]), location, "adopted")] += sign
+    return deltas
+
+
+def rollup_updates(deltas: Counter) -> list:
+    # One $inc upsert per (day, location) with a non-zero change
+    increments = {}
+    for (day, location, field), change in deltas.items():
+        if change:
+            increments.setdefault((day, location), {})[field] = change
+    return [
+        UpdateOne({"_id": {"day": day, "location": location}}, {"$inc": inc}, upsert=True)
+        for (day, location), inc in increments.items()
+    ]
+
+
+def stale_marker_update(error: Exception) -> dict:
+    # Upsert of STALE_MARKER after a failed update of the rollups
+    return {"$set": {"error": str(error)}, "$currentDate": {"markedAt": True}}
+
+
+def rollup_changes(added: Iterable[dict] = (), removed: Iterable[dict] = ()) -> list:
+    # Rollup updates moving the counts along with a write: the pets after it (added) and before it (removed)
+    deltas = rollup_deltas(added)
+    deltas.update(rollup_deltas(removed, -1))  # update() keeps negative counts, + would drop them
+    return rollup_updates(deltas)
+
+
+def apply_rollup_deltas(rollups, deltas: Counter) -> int:
+    """
+    Applies the changes with one bulk write of $inc upserts, one per (day, location). Returns the number of
+    rollup documents touched.
+    """
+    updates = rollup_updates(deltas)
+    if updates:
+        rollups.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def rollup_pipeline(field: str, start: datetime, end: datetime, cities: Optional[list] = None,
+                    mode: str = "groupby", limit: int = 0, order: int = -1) -> list:
+    # Aggregation of the rollups behind rollup_counts
+    match = {"_id.day": {"$gte": start, "$lt": end}}
+    if cities is not None:
+        match["_id.location"] = {"$in": cities}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": None if mode == "sum" else "$_id.location", "count": {"$sum": f"${field}"}}},
+        {"$match": {"count": {"$gt": 0}}},
+    ]
+    if mode != "sum":
+        pipeline.append({"$sort": {"count": order}})
+        if limit > 0:
+            pipeline.append({"$limit": limit})
+    return pipeline
+
+
+def rollup_result(docs: list, mode: str = "groupby"):
+    # Result documents of rollup_pipeline -> total or {location: count}
+    if mode == "sum":
+        return docs[0]["count"] if docs else 0
+    return {doc["_id"]: doc["count"] for doc in docs}
+
+
+def rollup_counts(rollups, field: str, start: datetime, end: datetime, cities: Optional[list] = None,
+                  mode: str = "groupby", limit: int = 0, order: int = -1):
+    """
+    Returns the number of pets adopted / rescued (`field`) between start and end: the total (mode "sum")
+    or per location, sorted by the count. The cost depends on the number of days and locations only.
+    """
+    pipeline = rollup_pipeline(field, start, end, cities, mode, limit, order)
+    return rollup_result(list(rollups.aggregate(pipeline)), mode)
@@ -0,0 +1,105 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Python types accepted for every BSON type used in the schema
+BSON_TYPES = {
+    "string": (str,),
+    "int": (int,),
+    "bool": (bool,),
+    "date": (datetime, pd.Timestamp),
+    "null": (type(None),),
+    "object": (dict,),
+    "array": (list,),
+}
+
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+
+def _compile_checks(json_schema, prefix="", required=True):
+    """
+    Flattens a $jsonSchema into a list of checks, one per field, keyed by the dotted path of the field.
+    Every check is a dict with: path, required, types, enum, minimum, items (types of array items).
+    """
+    checks = []
+    required_fields = set(json_schema.get("required", []))
+
+    for name, spec in json_schema.get("properties", {}).items():
+        path = f"{prefix}{name}"
+        bson_types = spec.get("bsonType", [])
+        bson_types = [bson_types] if isinstance(bson_types, str) else bson_types
+        field_required = required and name in required_fields
+
+        if "properties" in spec:
+            # Sub-documents are built by the loader, only their fields are checked
+            checks.extend(_compile_checks(spec, f"{path}.", field_required))
+            continue
+
+        item_types = spec.get("items", {}).get("bsonType")
+        checks.append({
+            "path": path,
+            "required": field_required,
+            "types": tuple(t for bson_type in bson_types for t in BSON_TYPES[bson_type]),
+            "enum": spec.get("enum"),
+            "minimum": spec.get("minimum"),
+            "items": BSON_TYPES[item_types] if item_types else None,
+        })
+
+    return checks
+
+
+def _failures(check, values):
+    """
+    Returns a boolean numpy mask of the values failing the check, evaluated for the whole column at once.
+    """
+    values = pd.Series(values, dtype=object)
+    types = values.map(type)
+    integers = None
+    if int in check["types"] or check["minimum"] is not None:
+        integers = pd.to_numeric(values.where(types == int), errors="coerce")
+    failed = np.zeros(len(values), dtype=bool)
+
+    # None in a field that is not required means the field is left out of the document
+    present = values.notna().to_numpy() | check["required"]
+
+    if check["types"]:
+        failed |= ~types.isin(check["types"]).to_numpy()
+        if int in check["types"]:
+            failed |= ((integers < INT32_MIN) | (integers > INT32_MAX)).to_numpy()
+
+    if check["enum"] is not None:
+        failed |= ~values.isin(check["enum"]).to_numpy()
+
+    if check["minimum"] is not None:
+        failed |= (integers < check["minimum"]).to_numpy()
+
+    if check["items"] is not None:
+        item_types = check["items"]
+        failed |= np.fromiter(
+            (isinstance(items, list) and not all(type(item) in item_types for item in items) for items in values),
+            dtype=bool, count=len(values)
+        )
+
+    return failed & present
+
+
+def compile_validator(schema):
+    """
+    Compiles the collection schema (as returned by `return_schema()`) into a client-side validator.
+
+    The validator takes document columns keyed by their dotted path (the output of `frame_to_columns`)
+    and returns a dict mapping the position of every invalid row to the list of reasons it was rejected.
+    Fields without a column are not checked.
+    """
+    checks = _compile_checks(schema["validator"]["$jsonSchema"])
+
+    def validate(columns):
+        rejected = {}
+        for check in checks:
+            if check["path"] not in columns:
+                continue
+            for position in np.flatnonzero(_failures(check, columns[check["path"]])):
+                rejected.setdefault(int(position), []).append(f"invalid '{check['path']}'")
+        return rejected
+
+    return validate
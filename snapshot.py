@@ -0,0 +1,205 @@
+from datetime import timedelta
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from database_handler import stats_period
+
+# Columns of the snapshot (dotted paths of the document fields) and how they are stored
+CATEGORICAL_COLUMNS = ["type", "gender", "maturitySize", "furLength", "medical.vaccinated", "medical.dewormed",
+                       "medical.sterilized", "medical.health", "location", "breed.primary", "breed.secondary",
+                       "adoption.adoptionPeriod"]
+INTEGER_COLUMNS = ["age", "quantity", "fee", "adoption.daysInShelter"]
+DATE_COLUMNS = ["rescueDate", "adoption.adoptionDate", "lastModified"]
+SNAPSHOT_COLUMNS = ["name", *CATEGORICAL_COLUMNS, *INTEGER_COLUMNS, "adoption.adopted", *DATE_COLUMNS]
+
+SNAPSHOT_PROJECTION = {column: 1 for column in SNAPSHOT_COLUMNS}
+
+
+def _value(doc: dict, path: str):
+    for key in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(key)
+    return doc
+
+
+def documents_to_frame(docs: list) -> pd.DataFrame:
+    """
+    Turns a batch of pet documents into a columnar frame indexed by _id: categorical, nullable integer,
+    boolean and datetime columns instead of Python objects.
+    """
+    data = {}
+    for column in SNAPSHOT_COLUMNS:
+        values = [_value(doc, column) for doc in docs]
+        if column in CATEGORICAL_COLUMNS:
+            data[column] = pd.Categorical(values)
+        elif column in INTEGER_COLUMNS:
+            data[column] = pd.array(values, dtype="Int32")
+        elif column in DATE_COLUMNS:
+            data[column] = pd.to_datetime(pd.Series(values, dtype=object)).to_numpy(dtype="datetime64[ns]")
+        elif column == "adoption.adopted":
+            data[column] = np.fromiter((value is True for value in values), dtype=bool, count=len(values))
+        else:
+            data[column] = pd.array(values, dtype="string")
+    return pd.DataFrame(data, index=pd.Index(np.array([doc["_id"] for doc in docs], dtype="int64"), name="_id"))
+
+
+def concat_frames(frames: list) -> pd.DataFrame:
+    # pd.concat would turn categoricals with different categories into objects; unite the categories instead
+    frames = [frame for frame in frames if len(frame)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    data = {}
+    for column in SNAPSHOT_COLUMNS:
+        parts = [frame[column] for frame in frames]
+        if column in CATEGORICAL_COLUMNS:
+            data[column] = union_categoricals(parts)
+        else:
+            data[column] = pd.concat(parts).array
+    index = pd.Index(np.concatenate([frame.index.to_numpy() for frame in frames]), name="_id")
+    return pd.DataFrame(data, index=index)
+
+
+class PetSnapshot:
+    """
+    In-memory columnar copy of the pets collection (without free text), for local analytics.
+
+    The collection is streamed in batches of `batch_size`, each batch converted to columns right away,
+    so no list of all documents is ever built. `refresh` fetches only the pets with a new _id or a newer
+    'lastModified' marker, and drops the deleted ones.
+    """
+
+    def __init__(self, collection, batch_size: int = 10000, overlap: timedelta = timedelta(minutes=1)):
+        self.collection = collection
+        self.batch_size = batch_size
+        # Markers of inserts come from the client clocks; changes that far back are fetched again
+        self.overlap = overlap
+
+        self.frame = documents_to_frame([])
+        self.max_id = 0
+        self.last_modified = None
+        self.collection_uuid = None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _collection_uuid(self):
+        # Changes when the collection is dropped and loaded again
+        for info in self.collection.database.list_collections(filter={"name": self.collection.name}):
+            return info.get("info", {}).get("uuid")
+        return None
+
+    def _fetch(self, query: dict) -> pd.DataFrame:
+        frames, batch = [], []
+        with self.collection.find(query, SNAPSHOT_PROJECTION, batch_size=self.batch_size) as cursor:
+            for doc in cursor:
+                batch.append(doc)
+                if len(batch) == self.batch_size:
+                    frames.append(documents_to_frame(batch))
+                    batch = []
+        frames.append(documents_to_frame(batch))
+        return concat_frames(frames)
+
+    def _update_markers(self):
+        self.max_id = int(self.frame.index.max()) if len(self.frame) else 0
+        last_modified = self.frame["lastModified"].max()
+        self.last_modified = None if pd.isna(last_modified) else last_modified.to_pydatetime()
+
+    def load(self) -> "PetSnapshot":
+        """
+        (Re)loads the whole collection.
+        """
+        self.collection_uuid = self._collection_uuid()
+        self.frame = self._fetch({})
+        self._update_markers()
+        return self
+
+    def refresh(self, detect_deletions: bool = True) -> dict:
+        """
+        Brings the snapshot up to date with the pets created or changed since the last load / refresh.
+
+        Args:
+            detect_deletions (bool): Also drop the pets deleted in the meantime (reads all ids from the _id index).
+
+        Returns:
+            dict: {"changed": rows fetched, "deleted": rows dropped, "reloaded": True after a full reload}.
+        """
+        if self.collection_uuid is None or self._collection_uuid() != self.collection_uuid:
+            self.load()
+            return {"changed": len(self.frame), "deleted": 0, "reloaded": True}
+
+        conditions = [{"_id": {"$gt": self.max_id}}]
+        if self.last_modified is not None:
+            conditions.append({"lastModified": {"$gte": self.last_modified - self.overlap}})
+        else:
+            conditions.append({"lastModified": {"$exists": True}})
+        changed = self._fetch({"$or": conditions})
+
+        deleted = 0
+        frame = self.frame
+        if detect_deletions:
+            cursor = self.collection.find({}, {"_id": 1}, batch_size=100000).hint([("_id", 1)])
+            ids = np.fromiter((doc["_id"] for doc in cursor), dtype="int64")
+            alive = frame.index.isin(ids)
+            deleted = int((~alive).sum())
+            frame = frame[alive]
+
+        frame = frame[~frame.index.isin(changed.index)]
+        self.frame = concat_frames([frame, changed])
+        self._update_markers()
+        return {"changed": len(changed), "deleted": deleted, "reloaded": False}
+
+    def memory_usage(self) -> int:
+        """
+        Returns the size of the snapshot in bytes.
+        """
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def adoption_rescue_stats(
+            self,
+            adopted: bool = True,
+            rescued: bool = False,
+            city='all',
+            month: int = 0,
+            year: int = 0,
+            mode: str = "groupby",
+            limit: int = 0,
+            order: int = -1
+    ) -> Optional[dict]:
+        """
+        Same statistics as PetAdoptionDatabase.adoption_rescue_stats, computed from the snapshot
+        without querying the server.
+        """
+        period = stats_period(month, year)
+        if period is None:
+            print("When month specified, year should be also specified!")
+            return None
+        start, end = (np.datetime64(date) for date in period)
+
+        frame = self.frame
+        if not (isinstance(city, str) and city.lower() == 'all'):
+            frame = frame[frame["location"].isin(city if isinstance(city, list) else [city])]
+
+        results = {}
+        selections = {}
+        if adopted:
+            adoption_dates = frame["adoption.adoptionDate"]
+            selections["adopted"] = frame[frame["adoption.adopted"]
+                                          & (adoption_dates >= start) & (adoption_dates < end)]
+        if rescued:
+            selections["rescued"] = frame[(frame["rescueDate"] >= start) & (frame["rescueDate"] < end)]
+
+        for name, selected in selections.items():
+            if mode == "sum":
+                results[name] = len(selected)
+                continue
+            counts = selected.groupby("location", observed=True).size()
+            counts = counts[counts > 0].sort_values(ascending=order == 1, kind="stable")
+            if limit > 0:
+                counts = counts.head(limit)
+            results[name] = {location: int(count) for location, count in counts.items()}
+
+        return results
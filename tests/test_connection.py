@@ -0,0 +1,82 @@
+import asyncio
+import inspect
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+from async_database_handler import AsyncPetAdoptionDatabase
+from connection import close_async_clients, requires_connection
+from database_handler import PetAdoptionDatabase
+
+
+class Handler:
+    def is_connected(self):
+        return True
+
+    @requires_connection(list)
+    def find(self):
+        raise ServerSelectionTimeoutError("no servers")
+
+    @requires_connection(lambda: iter(()))
+    def stream(self):
+        yield 1
+        raise ServerSelectionTimeoutError("no servers")
+
+
+def test_unreachable_server_returns_the_default():
+    assert Handler().find() == []
+
+
+def test_unreachable_server_ends_a_stream():
+    assert list(Handler().stream()) == [1]
+
+
+def test_handler_with_a_server_that_is_down():
+    handler = PetAdoptionDatabase("mongodb://localhost:1", server_selection_timeout_ms=100)
+
+    assert handler.is_connected()
+    assert handler.pets_ready_for_adoption() == []
+    assert handler.is_ready_for_adoption(1) is None
+
+
+def test_async_handlers_share_a_client_per_event_loop():
+    async def handlers():
+        first = AsyncPetAdoptionDatabase("mongodb://localhost:1", max_pool_size=5)
+        second = AsyncPetAdoptionDatabase("mongodb://localhost:1", max_pool_size=5)
+        other = AsyncPetAdoptionDatabase("mongodb://localhost:1", max_pool_size=6)
+        assert first.client is second.client
+        assert first.client is not other.client
+        await first.close()
+        assert AsyncPetAdoptionDatabase("mongodb://localhost:1", max_pool_size=5).client is not second.client
+        await close_async_clients()
+        return first.client
+
+    assert asyncio.run(handlers()) is not asyncio.run(handlers())
+
+
+def test_async_create_pet_has_the_signature_of_create_pet():
+    assert inspect.signature(AsyncPetAdoptionDatabase.create_pet) == inspect.signature(PetAdoptionDatabase.create_pet)
+
+
+def test_description_search_with_a_server_that_is_down():
+    handler = PetAdoptionDatabase("mongodb://localhost:1", server_selection_timeout_ms=100)
+
+    assert handler.find_pets_by_description(["playful"]) == []
+    assert list(handler.iter_pets_by_description(["playful"])) == []
+    assert handler.search_pets("playful") == []
+    assert handler.description_index() is None
+
+
+def test_async_handler_with_a_server_that_is_down():
+    async def calls():
+        handler = AsyncPetAdoptionDatabase("mongodb://localhost:1", server_selection_timeout_ms=100)
+        try:
+            return (await handler.adoption_rescue_stats(),
+                    await handler.update_pet({"_id": 1}, {"fee": 10}),
+                    await handler.readiness_of([1]),
+                    await handler.page_pets(),
+                    [pet async for pet in handler.find_pets_for_adoption()],
+                    [pet async for pet in handler.search_pets("playful")])
+        finally:
+            await close_async_clients()
+
+    assert asyncio.run(calls()) == (None, None, {}, ([], None), [], [])
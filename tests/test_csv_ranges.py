@@ -0,0 +1,48 @@
+import pandas as pd
+
+from create_database import _partition_hashes, csv_byte_ranges, iter_csv_partitions, key_hashes, read_partition
+
+ROWS = [
+    'Type,Name,Breed1,Breed2,Gender,Color1,Color2,Color3,RescuerID,RescueDate,Description',
+    '1,Nibble,299,0,1,1,7,0,r1,2025-01-02,"Friendly, calm"',
+    '2,Kiki,265,0,2,1,2,0,r2,2025-01-03,"Line one\nline two ""quoted"""',
+    '',
+    '1,Nibble,299,0,1,1,7,0,r1,2025-01-02,Same pet again',
+    '\r',
+    '2,Bobo,307,0,1,2,0,0,r3,2025-01-04,',
+    '1,Nibble,299,0,1,1,7,0,r1,2025-01-02,"And again\r\n"',
+    '2,Misia,266,0,2,3,0,0,r4,2025-01-05,Last row without a line break',
+]
+
+
+def _write(tmp_path, line_break="\n"):
+    path = tmp_path / "pets.csv"
+    path.write_bytes(line_break.join(ROWS).encode())
+    return str(path)
+
+
+def _ranged_partitions(path, chunk_size, block_size):
+    header, ranges = csv_byte_ranges(path, chunk_size, block_size)
+    occurrences = {}
+    return [read_partition(path, header, start, end, first_index, occurrences) for first_index, start, end in ranges]
+
+
+def test_byte_ranges_give_the_partitions_of_a_sequential_read(tmp_path):
+    for line_break in ("\n", "\r\n"):
+        path = _write(tmp_path, line_break)
+        for chunk_size in (1, 2, 4, 10):
+            expected = [chunk for _, chunk in iter_csv_partitions(path, chunk_size)]
+            for block_size in (7, 64, 2 ** 20):
+                partitions = _ranged_partitions(path, chunk_size, block_size)
+                assert len(partitions) == len(expected)
+                for partition, chunk in zip(partitions, expected):
+                    pd.testing.assert_frame_equal(partition.reset_index(drop=True), chunk.reset_index(drop=True))
+
+
+def test_partition_hashes_parse_only_the_key_columns(tmp_path):
+    path = _write(tmp_path)
+    header, ranges = csv_byte_ranges(path, 3)
+
+    hashes = [_partition_hashes(path, header, start, end)[0] for _, start, end in ranges]
+
+    assert hashes == [key_hashes(chunk) for _, chunk in iter_csv_partitions(path, 3)]
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from text_search import DescriptionIndex
+
+
+def test_refresh_filter_follows_the_pets_read_into_the_index():
+    index = DescriptionIndex(overlap=timedelta(minutes=1))
+    assert index.refresh_filter() == {"$or": [{"_id": {"$gt": 0}}, {"lastModified": {"$exists": True}}]}
+
+    index.add_pets([
+        {"_id": 1, "description": "Playful puppy", "adoption": {"adopted": False}},
+        {"_id": 7, "description": "Calm cat", "adoption": {"adopted": True},
+         "lastModified": datetime(2025, 6, 6, 12, 0)},
+    ])
+
+    assert index.refresh_filter() == {"$or": [{"_id": {"$gt": 7}},
+                                              {"lastModified": {"$gte": datetime(2025, 6, 6, 11, 59)}}]}
+    assert [pet_id for pet_id, _ in index.search("puppy cat")] == [1]
+
+
+def test_changed_pets_replace_their_entries():
+    index = DescriptionIndex()
+    index.add_pets([{"_id": 1, "description": "Playful puppy", "adoption": {"adopted": False}}])
+    index.add_pets([{"_id": 1, "description": "Quiet dog", "adoption": {"adopted": False},
+                     "lastModified": datetime(2025, 6, 6)}])
+
+    assert index.search("puppy") == []
+    assert [pet_id for pet_id, _ in index.search("quiet")] == [1]
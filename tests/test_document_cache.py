@@ -0,0 +1,45 @@
+import os
+
+from create_database import return_schema
+from document_cache import cached_report_path, evict, restore_report, schema_fingerprint, write_through
+
+
+def test_schema_is_part_of_the_key():
+    schema = return_schema()
+    changed = return_schema()
+    changed["validator"]["$jsonSchema"]["properties"]["fee"]["minimum"] = 10
+
+    assert schema_fingerprint(schema) == schema_fingerprint(return_schema())
+    assert schema_fingerprint(schema) != schema_fingerprint(changed)
+
+
+def test_rejection_report_is_replayed_with_the_entry(tmp_path):
+    entry = str(tmp_path / "cache" / "entry.bson")
+    report = tmp_path / "rejected_rows.csv"
+
+    def batches():
+        yield [{"_id": 1}]
+        report.write_text("petIndex,rejectReason\n2,invalid 'fee'\n")
+
+    assert list(write_through(batches(), entry, str(report))) == [[{"_id": 1}]]
+    report.unlink()
+
+    assert restore_report(entry, str(report))
+    assert report.read_text() == "petIndex,rejectReason\n2,invalid 'fee'\n"
+
+
+def test_entry_without_rejections_has_no_report(tmp_path):
+    entry = str(tmp_path / "entry.bson")
+    list(write_through(iter([[{"_id": 1}]]), entry, str(tmp_path / "missing.csv")))
+
+    assert not restore_report(entry, str(tmp_path / "rejected_rows.csv"))
+
+
+def test_evict_removes_the_report_with_its_entry(tmp_path):
+    entry = str(tmp_path / "entry.bson")
+    report = tmp_path / "rejected_rows.csv"
+    report.write_text("petIndex,rejectReason\n")
+    list(write_through(iter([[{"_id": 1}]]), entry, str(report)))
+
+    assert evict(str(tmp_path), 0) == [entry]
+    assert not os.path.exists(cached_report_path(entry))
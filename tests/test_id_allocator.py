@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from id_allocator import IdBlockAllocator
+
+
+class Counters:
+    # The counters collection: $inc upserts applied atomically, like on the server
+    def __init__(self, seq=None):
+        self.docs = {} if seq is None else {"petID": seq}
+        self.reservations = 0
+        self._lock = threading.Lock()
+
+    def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        with self._lock:
+            self.reservations += 1
+            name = query["_id"]
+            self.docs[name] = self.docs.get(name, 0) + update["$inc"]["seq"]
+            return {"_id": name, "seq": self.docs[name]}
+
+
+def _take(allocator, count, out):
+    out.extend(allocator.next_id() for _ in range(count))
+
+
+def test_ids_from_many_threads_are_unique_and_increasing_per_thread():
+    counters = Counters()
+    allocator = IdBlockAllocator(counters, block_size=7)
+    taken = [[] for _ in range(8)]
+    threads = [threading.Thread(target=_take, args=(allocator, 200, ids)) for ids in taken]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [pet_id for ids in taken for pet_id in ids]
+    assert len(set(all_ids)) == 1600
+    assert all(ids == sorted(ids) for ids in taken)
+    assert min(all_ids) == 1 and max(all_ids) <= counters.docs["petID"]
+    # One round trip per block, not per id
+    assert counters.reservations <= 1600 // 7 + 2
+
+
+def test_allocators_sharing_the_counter_never_hand_out_the_same_id():
+    counters = Counters()
+    first, second = IdBlockAllocator(counters, block_size=5), IdBlockAllocator(counters, block_size=3)
+
+    ids = [allocator.next_id() for _ in range(40) for allocator in (first, second)]
+
+    assert len(set(ids)) == len(ids)
+
+
+def test_ids_continue_after_the_largest_loaded_id():
+    # The loader sets the counter to the largest _id of the CSV
+    allocator = IdBlockAllocator(Counters(seq=14993), block_size=20)
+
+    assert [allocator.next_id() for _ in range(25)] == list(range(14994, 15019))
+    assert allocator.reserve(3) == range(15034, 15037)
+
+
+def test_block_size_must_be_positive():
+    with pytest.raises(ValueError):
+        IdBlockAllocator(Counters(), block_size=0)
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from create_database import insert_batches
+from document_cache import write_through
+
+
+class FailingCollection:
+    def __init__(self, fail_after):
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def insert_many(self, batch, **kwargs):
+        self.calls += 1
+        if self.calls > self.fail_after:
+            raise RuntimeError("insert failed")
+
+
+def _batches(count, closed):
+    try:
+        for number in range(count):
+            yield [{"_id": number}]
+    finally:
+        closed.append(True)
+
+
+def test_failed_insert_stops_the_producer_and_closes_the_batches():
+    closed = []
+
+    with pytest.raises(RuntimeError, match="insert failed"):
+        insert_batches(FailingCollection(fail_after=1), _batches(50, closed), prefetch=1)
+
+    assert closed == [True]
+
+
+def test_failed_insert_leaves_no_partial_cache_file(tmp_path):
+    path = str(tmp_path / "entry.bson")
+    batches = write_through(_batches(50, []), path)
+
+    with pytest.raises(RuntimeError):
+        insert_batches(FailingCollection(fail_after=2), batches, prefetch=1)
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_all_batches_are_inserted():
+    collection = FailingCollection(fail_after=100)
+
+    assert insert_batches(collection, _batches(10, []), prefetch=2) == 10
+    assert collection.calls == 10
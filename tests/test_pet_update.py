@@ -0,0 +1,49 @@
+import pytest
+
+from database_handler import applied_update, changed_filter, pet_update
+from readiness import SET_READINESS_STAGE
+
+
+def test_plain_fields_use_a_classic_set():
+    update = pet_update({"fee": 50, "colors.0": "Black"})
+
+    assert update == {"$set": {"fee": 50, "colors.0": "Black"}, "$currentDate": {"lastModified": True}}
+
+
+def test_readiness_fields_recompute_the_flag():
+    update = pet_update({"medical.vaccinated": "Yes", "name": "$ave"})
+
+    assert isinstance(update, list)
+    assert update[0]["$set"]["name"] == {"$literal": "$ave"}
+    assert update[-1] == SET_READINESS_STAGE
+    assert isinstance(pet_update({"medical": {"vaccinated": "Yes"}}), list)
+
+
+def test_array_index_paths_are_refused_with_readiness_fields():
+    with pytest.raises(ValueError, match="colors.0"):
+        pet_update({"colors.0": "Black", "adoption.adopted": True})
+
+
+def test_changed_filter_skips_pets_that_already_have_the_values():
+    assert changed_filter({"_id": 3}, {"fee": 50, "colors": ["Black"]}) == {
+        "$and": [{"_id": 3}, {"$expr": {"$or": [{"$ne": ["$fee", {"$literal": 50}]},
+                                                {"$ne": ["$colors", {"$literal": ["Black"]}]}]}}]
+    }
+
+
+def test_changed_filter_applies_array_index_updates_always():
+    assert changed_filter({"_id": 3}, {"colors.0": "Black", "fee": 50}) == {"_id": 3}
+
+
+def test_applied_update_matches_the_server_side_update():
+    old = {"_id": 3, "location": "Lębork", "colors": ["Black", "White"],
+           "medical": {"vaccinated": "No", "dewormed": "Yes", "sterilized": "Yes", "health": "Healthy"},
+           "adoption": {"adopted": False}, "readyForAdoption": False}
+
+    new = applied_update(old, {"location": "Gdańsk", "medical.vaccinated": "Yes"})
+
+    assert new["location"] == "Gdańsk"
+    assert new["readyForAdoption"] is True
+    assert applied_update(old, {"colors.1": "Brown"})["colors"] == ["Black", "Brown"]
+    assert "lastModified" in new
+    assert old["colors"] == ["Black", "White"] and old["readyForAdoption"] is False
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from database_handler import PetAdoptionDatabase
+
+
+class RacingCollection:
+    # Pet 2 is adopted by someone else between the read and the update; pet 3 does not exist
+    def __init__(self):
+        self.adopted = set()
+
+    def find(self, query, projection=None):
+        return [{"_id": pet_id, "adoption": {"adopted": pet_id in self.adopted}}
+                for pet_id in query["_id"]["$in"] if pet_id != 3]
+
+    def update_many(self, query, update):
+        self.adopted.add(2)
+        return SimpleNamespace(matched_count=1)
+
+
+def test_pets_adopted_before_the_update_are_not_reported_as_prepared():
+    handler = PetAdoptionDatabase("mongodb://localhost:1")
+    handler.collection = RacingCollection()
+
+    assert handler.prepare_pets_for_adoption([1, 2, 3]) == {
+        1: "prepared", 2: "already_adopted", 3: "missing"
+    }
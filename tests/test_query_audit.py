@@ -0,0 +1,15 @@
+from database_handler import PetAdoptionDatabase
+from query_audit import capture_queries
+
+
+def test_pet_of_the_day_records_the_seek_after_the_largest_id():
+    handler = PetAdoptionDatabase("mongodb://localhost:1")
+
+    shapes = [shape for _, shape in capture_queries(handler, "get_pet_of_the_day", {"unadopted_only": True}, {})]
+
+    assert shapes[0] == {"filter": {}, "projection": {"_id": 1}, "sort": [("_id", -1)], "limit": 1}
+    seek = shapes[1]
+    assert seek["filter"]["adoption.adopted"] is False
+    assert 1 <= seek["filter"]["_id"]["$gte"] <= 1000
+    assert seek["sort"] == [("_id", 1)] and seek["limit"] == 1
+    assert shapes[2]["filter"] == {"adoption.adopted": False}
@@ -0,0 +1,95 @@
+from datetime import datetime
+
+from database_handler import PetAdoptionDatabase, location_filter, stats_matches
+from query_cache import QueryCache, make_key, may_match, projected_fields, query_fields
+from readiness import READY_FOR_ADOPTION_QUERY
+
+MAY = (datetime(2025, 5, 1), datetime(2025, 6, 1))
+
+
+def _handler() -> PetAdoptionDatabase:
+    # Offline handler: only the cache bookkeeping of the writes is exercised
+    return PetAdoptionDatabase("mongodb://localhost:1", cache=QueryCache())
+
+
+def _fill(handler: PetAdoptionDatabase):
+    # Entries stored the way the read methods store them
+    search = PetAdoptionDatabase.adoption_search_query("Cat", max_age=12, location="Lębork")
+    handler.cache.put(make_key("search"), [{"_id": 1, "name": "Mruczek"}], query_fields(search),
+                      projected_fields({"name": 1}), [1], search)
+
+    matches = stats_matches(True, True, location_filter("Gdańsk"), *MAY)
+    handler.cache.put(make_key("stats"), {"adopted": 1, "rescued": 2}, ["location", "adoption", "rescueDate"],
+                      query={"$or": list(matches.values())})
+
+    lookup = {"_id": {"$in": [2, 3]}}
+    handler.cache.put(make_key("lookup"), [{"_id": 2, "fee": 10}, {"_id": 3, "fee": 0}], query_fields(lookup),
+                      projected_fields(None), [2, 3], lookup)
+
+    ready = {**READY_FOR_ADOPTION_QUERY, "_id": {"$in": [4]}}
+    handler.cache.put(make_key("ready"), [{"_id": 4}], query_fields(ready), projected_fields({"_id": 1}), [4], ready)
+
+
+def _cached(handler: PetAdoptionDatabase) -> set:
+    return {name for name in ("search", "stats", "lookup", "ready") if handler.cache.get(make_key(name))[0]}
+
+
+def _new_pet(**attributes) -> dict:
+    return PetAdoptionDatabase._build_pet_document(100, **attributes)
+
+
+def test_new_pet_drops_only_the_entries_it_can_join():
+    handler = _handler()
+    _fill(handler)
+
+    handler._invalidate(inserted=[_new_pet(type="Dog", location="Lębork")])
+    assert _cached(handler) == {"search", "stats", "lookup", "ready"}
+
+    handler._invalidate(inserted=[_new_pet(type="Cat", age=6, location="Lębork")])
+    assert _cached(handler) == {"stats", "lookup", "ready"}
+
+    handler._invalidate(inserted=[_new_pet(location="Gdańsk", rescue_date=datetime(2025, 5, 10))])
+    assert _cached(handler) == {"lookup", "ready"}
+
+
+def test_update_drops_filters_on_the_field_and_results_returning_it():
+    handler = _handler()
+    _fill(handler)
+
+    handler._invalidate(["fee"], [2])
+    assert _cached(handler) == {"search", "stats", "ready"}
+
+    handler._invalidate(["name"], [7])
+    assert _cached(handler) == {"search", "stats", "ready"}
+
+    handler._invalidate(["medical.vaccinated"], [9])
+    assert _cached(handler) == {"search", "stats"}
+
+
+def test_adoption_keeps_only_the_results_without_the_pet():
+    handler = _handler()
+    _fill(handler)
+
+    handler._invalidate(["adoption"], [1])
+
+    assert _cached(handler) == {"lookup"}
+
+
+def test_delete_drops_the_aggregations_and_the_results_with_the_pet():
+    handler = _handler()
+    _fill(handler)
+
+    handler._invalidate(pet_ids=[3])
+
+    assert _cached(handler) == {"search", "ready"}
+
+
+def test_may_match_is_exact_only_where_it_is_sure():
+    pet = {"type": "Cat", "age": 6, "colors": ["Black"], "adoption": {"adopted": False}}
+
+    assert not may_match({"age": {"$gt": 6}}, pet)
+    assert not may_match({"adoption.adoptionDate": {"$exists": True}}, pet)
+    assert may_match({"adoption.adoptionDate": None, "type": {"$in": ["Cat", "Dog"]}}, pet)
+    assert may_match({"colors": "White"}, pet)
+    assert may_match({"age": {"$lte": datetime(2025, 1, 1)}}, pet)
+    assert may_match({"description": {"$regex": "calm"}}, pet)
@@ -0,0 +1,30 @@
+from database_handler import PetAdoptionDatabase
+
+
+class Pets:
+    # Pet 1 is ready, pet 2 is not, pet 3 does not exist; remembers the queries
+    def __init__(self):
+        self.queries = []
+
+    def find_one(self, query, projection=None):
+        self.queries.append((query, projection))
+        if query.get("readyForAdoption"):
+            return {"_id": 1} if query["_id"] == 1 else None
+        return {"_id": query["_id"]} if query["_id"] in (1, 2) else None
+
+
+def test_ready_pet_is_checked_with_the_covered_query_only():
+    handler = PetAdoptionDatabase("mongodb://localhost:1")
+    handler.collection = Pets()
+
+    assert handler.is_ready_for_adoption(1) is True
+    assert handler.collection.queries == [({"readyForAdoption": True, "_id": 1}, {"_id": 1})]
+
+
+def test_the_id_lookup_tells_not_ready_from_missing():
+    handler = PetAdoptionDatabase("mongodb://localhost:1")
+    handler.collection = Pets()
+
+    assert handler.is_ready_for_adoption(2) is False
+    assert handler.is_ready_for_adoption(3) is None
+    assert handler.collection.queries[1] == ({"_id": 2}, {"_id": 1})
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import database_handler
+from database_handler import PetAdoptionDatabase
+from rollups import STALE_MARKER
+
+PET = {"_id": 1, "location": "Lębork", "rescueDate": datetime(2025, 5, 3), "adoption": {"adopted": False}}
+
+
+class Rollups:
+    def __init__(self, fail_bulk=False, fail_marker=False):
+        self.fail_bulk = fail_bulk
+        self.fail_marker = fail_marker
+        self.docs = {}
+
+    def bulk_write(self, updates, ordered=True):
+        if self.fail_bulk:
+            raise RuntimeError("write failed")
+
+    def update_one(self, query, update, upsert=False):
+        if self.fail_marker:
+            raise RuntimeError("write failed")
+        self.docs[query["_id"]] = update
+
+    def find_one(self, query, projection=None):
+        return {"_id": query["_id"]} if query["_id"] in self.docs else None
+
+
+def _handler(rollups, monkeypatch) -> tuple:
+    handler = PetAdoptionDatabase("mongodb://localhost:1")
+    handler.rollups = rollups
+    rebuilds = []
+    monkeypatch.setattr(database_handler, "backfill_rollups", lambda collection: rebuilds.append(collection) or 0)
+    return handler, rebuilds
+
+
+def test_failed_update_marks_the_rollups_for_a_rebuild(monkeypatch):
+    rollups = Rollups(fail_bulk=True)
+    handler, rebuilds = _handler(rollups, monkeypatch)
+
+    assert handler._update_rollups([PET]) is False
+    assert STALE_MARKER["_id"] in rollups.docs
+
+    # Another handler reading the stats sees the marker
+    other, rebuilds = _handler(rollups, monkeypatch)
+    other._ensure_current_rollups()
+    assert len(rebuilds) == 1
+
+
+def test_handler_remembers_the_failure_when_the_marker_cannot_be_written(monkeypatch):
+    handler, rebuilds = _handler(Rollups(fail_bulk=True, fail_marker=True), monkeypatch)
+
+    assert handler._update_rollups([PET]) is False
+    handler._ensure_current_rollups()
+    handler._ensure_current_rollups()
+
+    assert len(rebuilds) == 1
+
+
+def test_successful_update_needs_no_rebuild(monkeypatch):
+    handler, rebuilds = _handler(Rollups(), monkeypatch)
+
+    assert handler._update_rollups([PET]) is True
+    handler._ensure_current_rollups()
+
+    assert rebuilds == []
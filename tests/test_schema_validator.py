@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate_pets import generate_frame
+from create_database import frame_to_columns, number_rows, partition_documents, return_schema
+from schema_validator import compile_validator
+
+
+def _chunk(rows=8, seed=0):
+    chunk = generate_frame(rows, np.random.default_rng(seed)).astype(str)
+    number_rows(chunk, 1, {})
+    return chunk
+
+
+def test_validator_rejects_nulls_wrong_types_and_out_of_range_values():
+    validate = compile_validator(return_schema())
+    columns = {
+        "_id": [1, 2, 3, 4, 5],
+        "fee": [0, None, -10, 2 ** 31, 50],
+        "rescueDate": [datetime(2024, 5, 1), datetime(2024, 5, 2), None, datetime(2024, 5, 4), "2024-05-05"],
+        "gender": ["Male", "Female", "Mixed", "Unknown", "Dragon"],
+        "age": [3, None, 5, 6, 7],
+    }
+
+    rejected = validate(columns)
+
+    assert 0 not in rejected
+    assert rejected[1] == ["invalid 'fee'"]
+    assert set(rejected[2]) == {"invalid 'fee'", "invalid 'rescueDate'"}
+    assert rejected[3] == ["invalid 'fee'"]
+    assert set(rejected[4]) == {"invalid 'rescueDate'", "invalid 'gender'"}
+
+
+def test_validator_skips_fields_without_columns():
+    assert compile_validator(return_schema())({"_id": [1, 2]}) == {}
+
+
+def test_bad_numbers_and_dates_are_rejected_instead_of_aborting_the_load():
+    chunk = _chunk()
+    chunk.loc[1, "Fee"] = np.nan
+    chunk.loc[2, "Quantity"] = "0"
+    chunk.loc[3, "RescueDate"] = "not a date"
+    chunk.loc[4, "Age"] = np.nan  # age may be null
+    chunk.loc[5, "Fee"] = "12.5"
+
+    columns = frame_to_columns(chunk, seed=0)
+    rejected = compile_validator(return_schema())(columns)
+
+    assert sorted(rejected) == [1, 2, 3, 5]
+    assert "invalid 'rescueDate'" in rejected[3]
+    assert columns["age"][4] is None
+    assert columns["rescueDate"][3] is None
+
+
+def test_partition_documents_reports_rejected_rows():
+    chunk = _chunk()
+    chunk.loc[6, "Fee"] = "free"
+
+    docs, rejected_rows = partition_documents(chunk, seed=1, validator=compile_validator(return_schema()))
+
+    assert [doc["_id"] for doc in docs] == [1, 2, 3, 4, 5, 6, 8]
+    assert isinstance(rejected_rows, pd.DataFrame)
+    assert rejected_rows["petIndex"].tolist() == [7]
+    assert rejected_rows["rejectReason"].tolist() == ["invalid 'fee'"]
@@ -0,0 +1,96 @@
+import copy
+from collections import Counter
+from datetime import datetime
+
+from database_handler import PetAdoptionDatabase
+from query_cache import may_match
+from snapshot import PetSnapshot
+
+
+def _pet(pet_id, location, rescued, adopted=None, days=None, period="null"):
+    pet = PetAdoptionDatabase._build_pet_document(
+        pet_id, name=f"Pet {pet_id}", location=location, rescue_date=rescued, adopted=adopted is not None,
+        adoption_date=adopted, days_in_shelter=days, adoption_period=period
+    )
+    # The server returns naive UTC dates
+    pet["lastModified"] = datetime(2025, 4, pet_id, 12, 0)
+    return pet
+
+
+PETS = [
+    _pet(1, "Gdańsk", datetime(2025, 4, 2), datetime(2025, 5, 3), 31, "31-90 Days"),
+    _pet(2, "Gdańsk", datetime(2025, 5, 1), datetime(2025, 5, 1), 0, "Same Day"),
+    _pet(3, "Gdańsk", datetime(2025, 5, 20)),
+    _pet(4, "Lębork", datetime(2025, 5, 2), datetime(2025, 5, 9), 7, "1-7 Days"),
+    _pet(5, "Lębork", datetime(2025, 3, 10), datetime(2025, 6, 2), 84, "31-90 Days"),
+    _pet(6, "Sopot", datetime(2025, 5, 31)),
+    _pet(7, "Sopot", datetime(2025, 1, 5), datetime(2025, 5, 30), 145, "Over 90 Days"),
+]
+
+
+class _Cursor(list):
+    def hint(self, index):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class Pets:
+    # The pets collection, with the queries of PetSnapshot evaluated by query_cache.may_match
+    name = "petsInformation"
+
+    def __init__(self, pets):
+        self.pets = {pet["_id"]: copy.deepcopy(pet) for pet in pets}
+        self.database = self
+
+    def list_collections(self, filter=None):
+        return [{"name": self.name, "info": {"uuid": "uuid-1"}}]
+
+    def find(self, query, projection=None, batch_size=0):
+        return _Cursor(pet for pet in self.pets.values() if may_match(query, pet))
+
+
+def _expected_stats(pets, start, end, mode="groupby"):
+    # adoption_rescue_stats computed document by document
+    adopted = Counter(pet["location"] for pet in pets
+                      if pet["adoption"]["adopted"] and start <= pet["adoption"]["adoptionDate"] < end)
+    rescued = Counter(pet["location"] for pet in pets if start <= pet["rescueDate"] < end)
+    if mode == "sum":
+        return {"adopted": sum(adopted.values()), "rescued": sum(rescued.values())}
+    return {"adopted": dict(adopted), "rescued": dict(rescued)}
+
+
+def test_snapshot_stats_match_the_documents():
+    snapshot = PetSnapshot(Pets(PETS), batch_size=3).load()
+    may = (datetime(2025, 5, 1), datetime(2025, 6, 1))
+
+    assert len(snapshot) == len(PETS)
+    assert snapshot.adoption_rescue_stats(True, True, month=5, year=2025) == _expected_stats(PETS, *may)
+    assert snapshot.adoption_rescue_stats(True, True, month=5, year=2025, mode="sum") == \
+        _expected_stats(PETS, *may, mode="sum")
+    assert snapshot.adoption_rescue_stats(True, False, city=["Lębork", "Sopot"], year=2025) == {
+        "adopted": {"Lębork": 2, "Sopot": 1}
+    }
+    assert list(snapshot.adoption_rescue_stats(False, True, month=5, year=2025, limit=1)["rescued"]) == ["Gdańsk"]
+
+
+def test_refresh_applies_changes_and_deletions():
+    pets = Pets(PETS)
+    snapshot = PetSnapshot(pets).load()
+
+    pets.pets[3]["adoption"] = {"adopted": True, "adoptionDate": datetime(2025, 5, 25), "daysInShelter": 5,
+                                "adoptionPeriod": "1-7 Days"}
+    pets.pets[3]["lastModified"] = datetime(2025, 6, 2)
+    del pets.pets[6]
+    pets.pets[8] = _pet(8, "Sopot", datetime(2025, 5, 4))
+    pets.pets[8]["lastModified"] = datetime(2025, 6, 2)
+
+    # Pet 7, changed last before the load, is fetched again within the overlap
+    assert snapshot.refresh() == {"changed": 3, "deleted": 1, "reloaded": False}
+    assert sorted(snapshot.frame.index) == [1, 2, 3, 4, 5, 7, 8]
+    assert snapshot.adoption_rescue_stats(True, True, month=5, year=2025) == \
+        _expected_stats(pets.pets.values(), datetime(2025, 5, 1), datetime(2025, 6, 1))
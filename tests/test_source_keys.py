@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate_pets import generate_frame
+from create_database import frame_to_documents, number_rows, row_draws
+
+
+def _frame(rows=20, seed=0):
+    return generate_frame(rows, np.random.default_rng(seed)).astype(str)
+
+
+def test_source_keys_do_not_depend_on_the_position_of_the_row():
+    frame = _frame()
+    number_rows(frame, 1, {})
+
+    shifted = pd.concat([_frame(1, seed=7), _frame()], ignore_index=True).drop(index=5).reset_index(drop=True)
+    number_rows(shifted, 1, {})
+
+    expected = frame["sourceKey"].drop(index=4).tolist()
+    assert shifted["sourceKey"].iloc[1:].tolist() == expected
+
+
+def test_identical_rows_get_different_keys_also_across_chunks():
+    frame = pd.concat([_frame(1)] * 3, ignore_index=True)
+    occurrences = {}
+    first, second = frame.iloc[:2].copy(), frame.iloc[2:].copy()
+    number_rows(first, 1, occurrences)
+    number_rows(second, 3, occurrences)
+
+    keys = first["sourceKey"].tolist() + second["sourceKey"].tolist()
+    assert len(set(keys)) == 3
+
+
+def test_a_row_gets_the_same_document_in_a_full_and_a_partial_load():
+    frame = _frame(50)
+    number_rows(frame, 1, {})
+
+    full = frame_to_documents(frame, seed=3)
+    partial = frame_to_documents(frame.iloc[[7, 31]], seed=3)
+
+    assert partial == [full[7], full[31]]
+
+
+def test_row_draws_are_uniform_numbers():
+    keys = [format(key, "016x") for key in range(1000)]
+    draws = row_draws(keys, seed=1)
+
+    assert draws.shape == (1000, 5)
+    assert ((draws >= 0) & (draws < 1)).all()
+    assert np.array_equal(draws, row_draws(keys, seed=1))
+    assert not np.array_equal(draws, row_draws(keys, seed=2))
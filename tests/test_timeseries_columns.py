@@ -0,0 +1,59 @@
+from collections import Counter
+from datetime import datetime
+from statistics import median
+
+from database_handler import ADOPTION_PERIODS, timeseries_columns
+from snapshot import PetSnapshot
+from test_snapshot import PETS, Pets, _expected_stats
+
+
+def _month(date):
+    return datetime(date.year, date.month, 1)
+
+
+def _facets(pets):
+    # Output of the $facet stage of timeseries_pipeline with granularity="month" for the whole range
+    adopted = [pet for pet in pets if pet["adoption"]["adopted"]]
+    by_month = {}
+    for pet in adopted:
+        by_month.setdefault((_month(pet["adoption"]["adoptionDate"]), pet["location"]), []).append(pet)
+    periods = Counter((_month(pet["adoption"]["adoptionDate"]), pet["location"], pet["adoption"]["adoptionPeriod"])
+                      for pet in adopted)
+    rescued = Counter((_month(pet["rescueDate"]), pet["location"]) for pet in pets)
+    return {
+        "adopted": [{"_id": {"period": period, "location": location}, "count": len(group),
+                     "medianDays": median(pet["adoption"]["daysInShelter"] for pet in group)}
+                    for (period, location), group in by_month.items()],
+        "adoptionPeriods": [{"_id": {"period": period, "location": location, "adoptionPeriod": name}, "count": count}
+                            for (period, location, name), count in periods.items()],
+        "rescued": [{"_id": {"period": period, "location": location}, "count": count}
+                    for (period, location), count in rescued.items()],
+    }
+
+
+def test_timeseries_columns_match_the_per_document_counts():
+    columns = timeseries_columns(_facets(PETS))
+
+    rows = list(zip(columns["period"], columns["location"]))
+    assert rows == sorted(rows)
+    assert all(len(values) == len(rows) for values in columns.values())
+
+    may = {location: row for row, (period, location) in enumerate(rows) if period == datetime(2025, 5, 1)}
+    assert {location: columns["adopted"][row] for location, row in may.items() if columns["adopted"][row]} == \
+        _expected_stats(PETS, datetime(2025, 5, 1), datetime(2025, 6, 1))["adopted"]
+    assert {location: columns["rescued"][row] for location, row in may.items() if columns["rescued"][row]} == \
+        _expected_stats(PETS, datetime(2025, 5, 1), datetime(2025, 6, 1))["rescued"]
+    assert columns["medianDaysInShelter"][may["Gdańsk"]] == 15.5
+    assert columns["Same Day"][may["Gdańsk"]] == 1 and columns["31-90 Days"][may["Gdańsk"]] == 1
+    assert sum(sum(columns[name]) for name in ADOPTION_PERIODS) == sum(columns["adopted"])
+
+
+def test_timeseries_totals_match_the_snapshot():
+    columns = timeseries_columns(_facets(PETS))
+    snapshot = PetSnapshot(Pets(PETS)).load()
+
+    for month in range(1, 7):
+        rows = [row for row, period in enumerate(columns["period"]) if period == datetime(2025, month, 1)]
+        stats = snapshot.adoption_rescue_stats(True, True, month=month, year=2025, mode="sum")
+        assert sum(columns["adopted"][row] for row in rows) == stats["adopted"]
+        assert sum(columns["rescued"][row] for row in rows) == stats["rescued"]
@@ -0,0 +1,195 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import timedelta
+from typing import Iterable, Optional
+
+# Letters that do not decompose into a base letter and a combining mark
+_EXTRA_FOLDS = str.maketrans({"ł": "l", "Ł": "l", "ø": "o", "Ø": "o", "ß": "ss"})
+_TOKEN = re.compile(r"\w+")
+# "a phrase", prefix* or word
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Fields of a pet read into the index
+INDEX_PROJECTION = {"description": 1, "adoption.adopted": 1, "lastModified": 1}
+
+
+def normalize(text: str) -> str:
+    """
+    Lower-cases the text and removes diacritics, so that e.g. "Łódź" and "lodz" are the same word.
+    """
+    text = unicodedata.normalize("NFKD", text.translate(_EXTRA_FOLDS).lower())
+    return "".join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text: Optional[str]) -> list:
+    return _TOKEN.findall(normalize(text)) if text else []
+
+
+def parse_query(query: str) -> list:
+    """
+    Splits a search query into parts: ("phrase", [words]), ("prefix", word) for `word*` and ("word", word).
+    """
+    parts = []
+    for phrase, word in _QUERY_PART.findall(query):
+        if phrase:
+            words = tokenize(phrase)
+            if len(words) == 1:
+                parts.append(("word", words[0]))
+            elif words:
+                parts.append(("phrase", words))
+        elif word.endswith("*") and tokenize(word):
+            parts.append(("prefix", tokenize(word)[0]))
+        else:
+            parts.extend(("word", token) for token in tokenize(word))
+    return parts
+
+
+class DescriptionIndex:
+    """
+    In-memory inverted index of pet descriptions with BM25 ranking.
+
+    Supports words, "exact phrases" and prefix* terms; matching ignores case and diacritics.
+    The index is kept up to date by calling `add` / `remove` / `set_available` after every change.
+    Changes made elsewhere (e.g. by other processes) are picked up by reading the pets matched by
+    `refresh_filter` - those with a new _id or a newer 'lastModified' marker - into `add_pets`.
+    """
+
+    def __init__(self, overlap: timedelta = timedelta(minutes=1)):
+        self.postings = defaultdict(dict)  # term -> {pet id: [positions]}
+        self.doc_tokens = {}  # pet id -> tokens of its description
+        self.available = set()  # ids of pets not adopted yet
+        self.total_length = 0
+        self._vocabulary = None  # sorted terms for prefix search, rebuilt after changes
+
+        # Markers of the newest pet read from the collection; inserts are stamped with the client clocks,
+        # so changes up to `overlap` before the last marker are read again
+        self.max_id = 0
+        self.last_modified = None
+        self.overlap = overlap
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    def add(self, pet_id, description: Optional[str], available: bool = True):
+        # Adding a pet that is already indexed replaces its entry
+        self.remove(pet_id)
+        tokens = tokenize(description)
+        self.doc_tokens[pet_id] = tokens
+        self.total_length += len(tokens)
+        for position, token in enumerate(tokens):
+            self.postings[token].setdefault(pet_id, []).append(position)
+        self.set_available(pet_id, available)
+        if tokens:
+            self._vocabulary = None
+
+    def remove(self, pet_id):
+        tokens = self.doc_tokens.pop(pet_id, None)
+        self.available.discard(pet_id)
+        if tokens is None:
+            return
+        self.total_length -= len(tokens)
+        for token in set(tokens):
+            postings = self.postings[token]
+            postings.pop(pet_id, None)
+            if not postings:
+                del self.postings[token]
+                self._vocabulary = None
+
+    def refresh_filter(self) -> dict:
+        # Pets created or changed since the last pets were read into the index
+        conditions = [{"_id": {"$gt": self.max_id}}]
+        if self.last_modified is not None:
+            conditions.append({"lastModified": {"$gte": self.last_modified - self.overlap}})
+        else:
+            conditions.append({"lastModified": {"$exists": True}})
+        return {"$or": conditions}
+
+    def add_pets(self, pets: Iterable[dict]) -> int:
+        """
+        Indexes pets read from the collection with INDEX_PROJECTION and moves the markers. Returns their number.
+        """
+        added = 0
+        for pet in pets:
+            self.add(pet["_id"], pet.get("description"), not (pet.get("adoption") or {}).get("adopted"))
+            if isinstance(pet["_id"], int) and pet["_id"] > self.max_id:
+                self.max_id = pet["_id"]
+            modified = pet.get("lastModified")
+            if modified is not None and (self.last_modified is None or modified > self.last_modified):
+                self.last_modified = modified
+            added += 1
+        return added
+
+    def set_available(self, pet_id, available: bool):
+        if available:
+            self.available.add(pet_id)
+        else:
+            self.available.discard(pet_id)
+
+    def _expand_prefix(self, prefix: str) -> list:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _phrase_matches(self, words: list) -> dict:
+        # pet id -> number of occurrences of the phrase
+        candidates = None
+        for word in words:
+            ids = self.postings.get(word, {}).keys()
+            candidates = set(ids) if candidates is None else candidates & ids
+        matches = {}
+        for pet_id in candidates or ():
+            starts = set(self.postings[words[0]][pet_id])
+            for offset, word in enumerate(words[1:], 1):
+                starts &= {position - offset for position in self.postings[word][pet_id]}
+            if starts:
+                matches[pet_id] = len(starts)
+        return matches
+
+    def _bm25(self, frequencies: dict, scores: dict):
+        # Adds the BM25 score of one term (pet id -> term frequency) to `scores`
+        documents = len(self.doc_tokens)
+        average_length = self.total_length / documents if documents else 0
+        idf = math.log(1 + (documents - len(frequencies) + 0.5) / (len(frequencies) + 0.5))
+        for pet_id, frequency in frequencies.items():
+            length_ratio = len(self.doc_tokens[pet_id]) / average_length if average_length else 0
+            scores[pet_id] += idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * length_ratio))
+
+    def search(self, query, limit: Optional[int] = None, available_only: bool = True) -> list:
+        """
+        Returns (pet id, score) pairs of the pets matching any part of the query, best matches first.
+
+        Args:
+            query (str or list): Query string (words, "phrases", prefix*) or a list of already parsed parts.
+            limit (int, optional): Maximum number of results.
+            available_only (bool): Only pets that are not adopted.
+        """
+        parts = parse_query(query) if isinstance(query, str) else query
+        scores = defaultdict(float)
+        for kind, value in parts:
+            if kind == "word":
+                self._bm25({pet_id: len(positions) for pet_id, positions in self.postings.get(value, {}).items()},
+                           scores)
+            elif kind == "prefix":
+                for term in self._expand_prefix(value):
+                    self._bm25({pet_id: len(positions) for pet_id, positions in self.postings[term].items()},
+                               scores)
+            else:
+                self._bm25(self._phrase_matches(value), scores)
+
+        results = [(pet_id, score) for pet_id, score in scores.items()
+                   if not available_only or pet_id in self.available]
+        results.sort(key=lambda result: (-result[1], result[0]))
+        return results[:limit] if limit else results